@@ -0,0 +1,186 @@
+"""
+Age ranges of the provider sources as numeric intervals, and their Salesforce age buckets.
+
+    python 03_scripts/age_ranges.py             # parsed ranges, buckets and unparsed values
+    python 03_scripts/age_ranges.py --age 14    # providers who see a 14-year-old
+
+The sources write ages in several shapes, all parsed by parse_age_range() into a closed
+interval (lo, hi) of whole years, with AGE_MAX as the end of open ranges:
+
+    'Middle Age (26-64)', 'Seniors 65+'      Pulse BHI / Counseling, LOMG grid   (26, 64), (65, 120)
+    'Ages 4-24', 'Ages 5 -25', '18+'         guidebook                           (4, 24), (5, 25), (18, 120)
+    'Adolescents', 'Older Adults'            legacy 'Ages Seen' (NAMED_AGE_GROUPS) (12, 17), (65, 120)
+    'Dec-65', '25-Nov'                       pulse_mm: Excel read '12-65' and '11-25' as dates
+                                             and wrote back month names          (12, 65), (11, 25)
+
+Multi-valued cells are split with multi_value.MultiValueColumn and each distinct item is
+parsed once. AgeBuckets keeps the Salesforce buckets (02_salesforce_picklist/salesforce_ages.csv,
+parsed the same way) in an interval_index.IntervalIndex, so an interval maps to every bucket
+it overlaps: 'Ages 4-24' -> 0 to 5, 6 to 11, 12 to 17, 18 to 35.
+"""
+import argparse
+import re
+
+from interval_index import IntervalIndex
+from picklist_crosswalk import FIELD_SOURCE_COLUMNS, PICKLIST_DIR, load_picklist
+
+AGE_MAX = 120 # End of open ranges ('65+')
+
+# Excel turns '12-65' into a date and writes it back as 'Dec-65' (and '11-25' as '25-Nov')
+MONTH_NUMBERS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+_MONTH = '|'.join(sorted(MONTH_NUMBERS, key=len, reverse=True))
+MONTH_MANGLED_RANGE = re.compile(rf"^(?:({_MONTH})-(\d{{1,3}})|(\d{{1,3}})-({_MONTH}))$", re.IGNORECASE)
+# A bound is a whole number of years: never part of a decimal or a longer number ('2.5+' is not 5+)
+_WHOLE_YEARS = r"(?<![\d.])(\d{1,3})(?!\.?\d)"
+CLOSED_RANGE = re.compile(rf"{_WHOLE_YEARS}\s*(?:-|–|to)\s*{_WHOLE_YEARS}", re.IGNORECASE)
+OPEN_RANGE = re.compile(rf"{_WHOLE_YEARS}\s*\+")
+
+# Age groups the legacy export names without numbers. 'Adults' also appears alone, for
+# adults in general, so it spans the Young Adults and Middle Age ranges of the Pulse labels.
+NAMED_AGE_GROUPS = {
+    'peds': (0, 17),
+    'children': (0, 11),
+    'adolescents': (12, 17),
+    'young adults': (18, 25),
+    'adults': (18, 64),
+    'older adults': (65, AGE_MAX),
+}
+
+
+def parse_age_range(text):
+    """
+    (lo, hi) interval of one age-range item, or None if it has no recognizable range. Several
+    ranges in one item ('5+ (in-person) / 9+ (telehealth)') give the interval covering them all.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None
+    text = text.strip()
+    mangled = MONTH_MANGLED_RANGE.match(text)
+    if mangled:
+        month, number = (mangled.group(1), mangled.group(2)) if mangled.group(1) else (mangled.group(4), mangled.group(3))
+        bounds = sorted((MONTH_NUMBERS[month.lower()], int(number)))
+        return bounds[0], min(bounds[1], AGE_MAX)
+    intervals = [(int(lo), int(hi)) for lo, hi in CLOSED_RANGE.findall(text)]
+    intervals.extend((int(lo), AGE_MAX) for lo in OPEN_RANGE.findall(text))
+    if intervals:
+        lo = min(min(bounds) for bounds in intervals)
+        hi = max(max(bounds) for bounds in intervals)
+        return lo, min(hi, AGE_MAX)
+    return NAMED_AGE_GROUPS.get(' '.join(text.split()).casefold())
+
+def parse_age_ranges(values):
+    """{value: (lo, hi) or None} for distinct `values`."""
+    return {value: parse_age_range(value) for value in values}
+
+
+class AgeBuckets:
+    """The Salesforce age buckets in an interval index, in picklist order."""
+
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self._order = {label: position for position, label in enumerate(self.labels)}
+        intervals = []
+        for label in self.labels:
+            interval = parse_age_range(label)
+            if interval is None:
+                raise ValueError(f"Age bucket '{label}' is not an age range.")
+            intervals.append((*interval, label))
+        self.index = IntervalIndex(intervals)
+
+    @classmethod
+    def load(cls, picklist_dir=PICKLIST_DIR):
+        return cls(load_picklist('age', picklist_dir))
+
+    def buckets_for(self, interval):
+        """Labels of the buckets overlapping `interval` (none for None), in picklist order."""
+        if interval is None:
+            return []
+        return sorted(self.index.overlapping(*interval), key=self._order.__getitem__)
+
+    def map_values(self, values):
+        """{value: [bucket labels]} for distinct raw age-range `values` ([] if unparsed)."""
+        return {value: self.buckets_for(interval) for value, interval in parse_age_ranges(values).items()}
+
+    def map_column(self, column):
+        """multi_value.MultiValueColumn of the buckets each row's age ranges overlap."""
+        return column.expand(self.map_values(column.vocabulary))
+
+
+def load_age_columns():
+    """[(source key, column, MultiValueColumn of its age ranges, provider names)] for the age columns that exist."""
+    from multi_value import MultiValueColumn
+    from source_registry import get_source, read_source, uses_split_name_columns
+
+    loaded = []
+    for source_key, column in FIELD_SOURCE_COLUMNS['age']:
+        source = get_source(source_key)
+        try:
+            df = read_source(source_key, roles=('names',), columns=[column])
+        except FileNotFoundError:
+            print(f"  {source_key}: file not found. Skipping.")
+            continue
+        if column not in df.columns:
+            print(f"  {source_key}: no '{column}' column. Skipping.")
+            continue
+        if uses_split_name_columns(source, df.columns):
+            names = (df[source['first_col']].fillna('') + ' ' + df[source['last_col']].fillna('')).str.strip()
+        else:
+            names = df[source['full_name_col']].fillna('').str.strip()
+        separator = source['multi_value_separators'].get(column)
+        loaded.append((source_key, column, MultiValueColumn.from_series(df[column], separators=[separator] if separator else []),
+                       names.tolist()))
+    return loaded
+
+def build_provider_age_index(age_columns):
+    """IntervalIndex of every (source label, provider name, age-range item) by the item's interval."""
+    from source_registry import get_source
+
+    intervals = []
+    for source_key, _, ages, names in age_columns:
+        label = get_source(source_key)['label']
+        parsed = [parse_age_range(item) for item in ages.vocabulary]
+        for row_id, code in zip(ages.row_ids.tolist(), ages.codes.tolist()):
+            if parsed[code] is not None and names[row_id]:
+                intervals.append((*parsed[code], (label, names[row_id], ages.vocabulary[code])))
+    return IntervalIndex(intervals)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse the source age ranges and map them to the Salesforce age buckets.")
+    parser.add_argument('--age', type=int, action='append', default=[],
+                        help="List the providers whose age ranges include this age (repeatable).")
+    args = parser.parse_args(argv)
+
+    age_columns = load_age_columns()
+    if args.age:
+        index = build_provider_age_index(age_columns)
+        print(f"Indexed {len(index)} provider age ranges.")
+        for age in args.age:
+            # One line per provider and source, however many of its ranges include the age
+            matches = {}
+            for label, name, item in index.stab(age):
+                matches.setdefault((label, name), []).append(item)
+            print(f"\nProviders who see age {age}: {len(matches)}")
+            for (label, name), items in sorted(matches.items()):
+                print(f"  {name} ({label}): {', '.join(dict.fromkeys(items))}")
+        return
+
+    buckets = AgeBuckets.load()
+    print(f"--- Age ranges -> Salesforce age buckets ({', '.join(buckets.labels)}) ---")
+    for source_key, column, ages, _ in age_columns:
+        intervals = parse_age_ranges(ages.vocabulary)
+        bucket_column = buckets.map_column(ages)
+        counts = bucket_column.counts()
+        print(f"\n{source_key} '{column}': {len(ages.vocabulary)} distinct values, "
+              f"{sum(interval is None for interval in intervals.values())} unparsed")
+        for value, interval in sorted(intervals.items(), key=lambda item: (item[1] is None, item[1] or (0, 0), item[0])):
+            if interval is None:
+                print(f"  {value!r}: not an age range")
+            else:
+                print(f"  {value!r}: {interval[0]}-{interval[1]} -> {', '.join(buckets.buckets_for(interval))}")
+        print("  Providers per bucket: " + ', '.join(f"{label} {int(counts.get(label, 0))}" for label in buckets.labels))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Aho-Corasick automaton: every occurrence of many patterns in one left-to-right scan.
+
+Patterns are sequences of symbols - characters of a string, or words of a tokenized text -
+each with a value. Matching walks the text once, following failure links on a mismatch,
+so the cost is linear in the text plus the number of matches, however many patterns there
+are (credential_tokens scans characters, treatment_modalities scans words):
+
+    automaton = AhoCorasick([('lcsw', 'LCSW'), ('pmhnp-bc', 'PMHNP')])
+    automaton.matches('lcsw, pmhnp-bc')        # [(0, 4, 'LCSW'), (6, 14, 'PMHNP')]
+"""
+
+
+class AhoCorasick:
+    """Trie of the patterns with failure links; built once, scanned many times."""
+
+    def __init__(self, patterns=()):
+        self._goto = [{}]      # state -> {symbol: next state}
+        self._fail = [0]       # state -> state of the longest proper suffix that is a trie path
+        self._outputs = [[]]   # state -> [(pattern length, value)] of patterns ending here
+        self._size = 0
+        for pattern, value in patterns:
+            if len(pattern):
+                self._add(pattern, value)
+        self._link()
+
+    def __len__(self):
+        return self._size
+
+    def _add(self, pattern, value):
+        state = 0
+        for symbol in pattern:
+            if symbol not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[state][symbol] = len(self._goto) - 1
+            state = self._goto[state][symbol]
+        self._outputs[state].append((len(pattern), value))
+        self._size += 1
+
+    def _link(self):
+        """Failure links breadth-first; each state also reports the patterns of its suffix states."""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for symbol, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and symbol not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(symbol, 0)
+                self._fail[child] = target if target != child else 0
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+                queue.append(child)
+
+    def matches(self, sequence):
+        """(start, end, value) of every pattern occurrence in `sequence`, by end position."""
+        found = []
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for position, symbol in enumerate(sequence):
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            for length, value in outputs[state]:
+                found.append((position + 1 - length, position + 1, value))
+        return found
+
+
+def leftmost_longest(matches, accept=None):
+    """
+    Non-overlapping matches, choosing the leftmost and then the longest, in text order.
+    `accept(start, end, value)` can reject a match (e.g. one inside a word) before it is chosen.
+    """
+    chosen = []
+    covered_to = 0
+    for start, end, value in sorted(matches, key=lambda match: (match[0], -match[1])):
+        if start < covered_to or (accept is not None and not accept(start, end, value)):
+            continue
+        chosen.append((start, end, value))
+        covered_to = end
+    return chosen
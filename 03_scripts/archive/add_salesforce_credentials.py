@@ -1,14 +1,24 @@
 import pandas as pd
 import numpy as np
+import os
 import re
+import sys
+
+# Shared helpers live one level up in 03_scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from credential_tokens import CredentialExtractor
+from name_cleaning import clean_and_split_full_name_series
+from name_normalization import EMPTY_NAME_KEY, create_name_key, create_name_key_series
+from npi_validation import INVALID_NPI_KEY, npi_key_series
+from picklist_crosswalk import PICKLIST_DIR, PICKLIST_FIELDS, PicklistCrosswalk
+from source_registry import get_source, read_source, uses_split_name_columns
 
 # --- Configuration ---
 TRUTH_FILE = "01_processed_data/new_provider_truth_file.csv"
-SALESFORCE_CREDS_FILE = "02_salesforce_picklist/salesforce_credentials.csv"
-PULSE_BHI_FILE = "00_source_data/pulse_data/pulse_bhi/pulse_bhi.csv"
-PULSE_COUNSELING_FILE = "00_source_data/pulse_data/pulse_counseling/pulse_counseling.csv"
-PULSE_MM_FILE = "00_source_data/pulse_data/pulse_mm/pulse_mm.csv"
-LEGACY_AIRTABLE_FILE = "00_source_data/airtable_monolithic/Providers-All Providers.csv"
+SALESFORCE_CREDS_FILE = os.path.join(PICKLIST_DIR, PICKLIST_FIELDS['credential']['file'])
+# Sources of raw credentials (keys of source_registry.SOURCES, which declares their name, NPI and credential columns)
+CREDENTIAL_SOURCE_KEYS = ['pulse_bhi', 'pulse_counseling', 'pulse_mm', 'legacy_airtable']
 OUTPUT_FILE = "01_processed_data/new_provider_truth_file.csv" # Overwrite
 
 # --- Column Names ---
@@ -16,84 +26,17 @@ OUTPUT_FILE = "01_processed_data/new_provider_truth_file.csv" # Overwrite
 COL_TRUTH_FIRST = "First Name"
 COL_TRUTH_LAST = "Last Name"
 COL_TRUTH_NPI = "NPI Number"
-COL_SF_CREDENTIAL_OUT = "Salesforce Credential"
-
-# Salesforce Credentials File
-COL_SF_CRED = "salesforce_credentials" # Header of the single column
-
-# Pulse Files
-COL_PULSE_PROVIDER_NAME = "Provider Name"
-COL_PULSE_CREDENTIALS = "Credentials"
-
-# Legacy Airtable File
-COL_LEGACY_FIRST = "First Name"
-COL_LEGACY_LAST = "Last Name"
-COL_LEGACY_NPI = "National Provider Identifier (NPI)"
-COL_LEGACY_CREDENTIALS = "Credentials"
+COL_SF_CREDENTIAL_OUT = "Salesforce Credential" # The provider's first credential
+COL_SF_CREDENTIALS_OUT = "Salesforce Credentials" # All of them, ';'-joined (Salesforce multi-select format)
+SF_CREDENTIALS_SEPARATOR = ";"
 
+# Delimiters between the credentials of a source cell: ',', ';', '/', '&', '#' and ' and '
+CREDENTIAL_DELIMITERS = re.compile(r"\s+and\s+|[,;/&#]", re.IGNORECASE)
 
-# --- Helper Functions (copied/adapted from previous scripts) ---
-def normalize_name_part(name_part):
-    if pd.isna(name_part):
-        return ""
-    normalized = str(name_part).lower().strip()
-    normalized = normalized.replace('-', ' ').replace('.', ' ').replace(',', ' ')
-    return ' '.join(normalized.split())
 
-def create_name_key(first_name, last_name):
-    return f"{normalize_name_part(first_name)}_{normalize_name_part(last_name)}"
-
-def clean_and_split_full_name(full_name_str):
-    if pd.isna(full_name_str):
-        return "", ""
-    name = str(full_name_str)
-    # More comprehensive list of credentials/suffixes to remove for name splitting
-    credentials_suffixes = [
-        r",\s*PhD", r",\s*MD", r",\s*LCSW", r",\s*LCPC", r",\s*PsyD", r",\s*PMHNP-BC",
-        r",\s*APN", r",\s*PA-C", r",\s*PA", r",\s*DO", r",\s*FNP-BC", r",\s*DNP", r",\s*APRN",
-        r",\s*LSW", r",\s*LPC", r",\s*CADC", r",\s*BCBA", r",\s*QIDP", r",\s*LMFT", r",\s*RN",
-        r",\s*MA", r",\s*MS", r",\s*MBA", r",\s*MEd", r",\s*MSW", r",\s*MPH",
-        r"\s+\(.*\)", # Content in parentheses
-        # Common standalone credentials (ensure space prefixed)
-        r"\s+PhD", r"\s+MD", r"\s+LCSW", r"\s+LCPC", r"\s+PsyD", r"\s+PMHNP-BC",
-        r"\s+APN", r"\s+PA-C", r"\s+PA", r"\s+DO", r"\s+FNP-BC", r"\s+DNP", r"\s+APRN",
-        r"\s+LSW", r"\s+LPC", r"\s+CADC", r"\s+BCBA", r"\s+QIDP", r"\s+LMFT", r"\s+RN",
-        r"\s+MA", r"\s+MS", r"\s+MBA", r"\s+MEd", r"\s+MSW", r"\s+MPH"
-    ]
-    for pattern in credentials_suffixes:
-        name = re.sub(pattern, "", name, flags=re.IGNORECASE)
-    
-    # Remove bracketed content e.g. [Trial Staff]
-    name = re.sub(r"\s*\[.*\]", "", name)
-    name = name.strip()
-    
-    parts = name.split(',')
-    if len(parts) == 2: # Likely "Last, First"
-        last_name = parts[0].strip()
-        first_name = parts[1].strip()
-    else: # Assume "First Last" or "First Middle Last"
-        name_parts = name.split()
-        if not name_parts:
-            return "", ""
-        first_name = name_parts[0]
-        last_name = " ".join(name_parts[1:])
-        
-    return first_name.strip(), last_name.strip()
-
-def parse_credentials(cred_str):
-    """Parses a raw credential string into a list of individual credentials."""
-    if pd.isna(cred_str):
-        return []
-    # Delimiters: ',', ';', '/', '&', ' and ' (with spaces), '#'
-    # Removed: cred_str_spaced = re.sub(r"([a-zA-Z])([A-Z])", r"\1 \2", str(cred_str))
-    
-    # Replace multiple delimiters with a single common one (e.g., '|')
-    # Normalize ' and ' to a delimiter as well.
-    normalized_str = re.sub(r'\s+and\s+', '|', str(cred_str), flags=re.IGNORECASE)
-    normalized_str = re.sub(r'[,;/&#]', '|', normalized_str)
-    
-    creds = [c.strip().upper().replace(".", "") for c in normalized_str.split('|') if c.strip()]
-    return creds
+def credential_pieces(cred_str):
+    """The delimiter-separated pieces of a raw credentials cell (for the crosswalk fallback)."""
+    return [piece.strip() for piece in CREDENTIAL_DELIMITERS.split(str(cred_str)) if piece.strip()]
 
 # --- Load Data ---
 def load_data():
@@ -110,61 +53,90 @@ def load_data():
         return None
 
     try:
-        df_sf_creds = pd.read_csv(SALESFORCE_CREDS_FILE)
-        # Store original values for assignment, and cleaned values for matching
-        data['salesforce_creds_original'] = df_sf_creds[COL_SF_CRED].dropna().unique().tolist()
-        data['salesforce_creds_set'] = {str(cred).strip().upper().replace(".", "") for cred in data['salesforce_creds_original']}
-        print(f"Successfully loaded Salesforce credentials: {SALESFORCE_CREDS_FILE} ({len(data['salesforce_creds_set'])} unique)")
-    except FileNotFoundError:
-        print(f"ERROR: Salesforce credentials file not found: {SALESFORCE_CREDS_FILE}")
+        # Every spelling of the Salesforce credentials (picklist plus crosswalk aliases) in one automaton
+        crosswalk = PicklistCrosswalk.load()
+        extractor = CredentialExtractor.load(crosswalk)
+        data['crosswalk'] = crosswalk
+        print(f"Successfully loaded Salesforce credentials: {SALESFORCE_CREDS_FILE}")
+    except FileNotFoundError as e:
+        print(f"ERROR: Salesforce picklist file not found: {e.filename}")
         return None
     except Exception as e:
-        print(f"Error loading Salesforce credentials {SALESFORCE_CREDS_FILE}: {e}")
+        print(f"Error loading Salesforce picklists: {e}")
         return None
 
-    source_files_config = {
-        'bhi': {'path': PULSE_BHI_FILE, 'name_col': COL_PULSE_PROVIDER_NAME, 'cred_col': COL_PULSE_CREDENTIALS, 'npi_col': None},
-        'counseling': {'path': PULSE_COUNSELING_FILE, 'name_col': COL_PULSE_PROVIDER_NAME, 'cred_col': COL_PULSE_CREDENTIALS, 'npi_col': None},
-        'mm': {'path': PULSE_MM_FILE, 'name_col': COL_PULSE_PROVIDER_NAME, 'cred_col': COL_PULSE_CREDENTIALS, 'npi_col': None},
-        'legacy': {'path': LEGACY_AIRTABLE_FILE, 'first_col': COL_LEGACY_FIRST, 'last_col': COL_LEGACY_LAST, 'cred_col': COL_LEGACY_CREDENTIALS, 'npi_col': COL_LEGACY_NPI}
-    }
-
     data['source_creds_by_name'] = {}
     data['source_creds_by_npi'] = {}
 
-    for key, config in source_files_config.items():
+    for key in CREDENTIAL_SOURCE_KEYS:
+        config = get_source(key)
         try:
-            df_source = pd.read_csv(config['path'], dtype={config.get('npi_col'): str} if config.get('npi_col') else None)
+            # Only the name, NPI and credential columns are loaded
+            df_source = read_source(key, roles=('names', 'npi', 'credential'))
             print(f"Loaded {key} data from {config['path']}")
+
+            # Split first/last columns when the file has them; otherwise one free-form name column,
+            # cleaned and keyed in one batch pass
+            use_split_names = uses_split_name_columns(config, df_source.columns)
+            name_keys_from_full_name = None
+            if not use_split_names and config['full_name_col'] in df_source.columns:
+                first_names, last_names = clean_and_split_full_name_series(df_source[config['full_name_col']])
+                name_keys_from_full_name = create_name_key_series(first_names, last_names)
+            # Integer-packed NPI keys for the whole column (INVALID_NPI_KEY where blank or failing the check digit)
+            npi_keys = None
+            if config['npi_col'] and config['npi_col'] in df_source.columns:
+                npi_keys = npi_key_series(df_source[config['npi_col']])
+            # Salesforce credentials of every cell, each distinct cell scanned once; free-form
+            # names can carry credentials too ("Jane Smith, LCSW")
+            creds_by_row = extractor.extract_series(df_source[config['credential_col']])
+            # Cells with no known spelling: their pieces go through the crosswalk's fuzzy fallback
+            # (cached on save()); a new match is compiled into the extractor, which scans the column again
+            unmatched_cells = df_source[config['credential_col']][creds_by_row.map(len) == 0].dropna().unique()
+            pieces_by_cell = {cell: credential_pieces(cell) for cell in unmatched_cells}
+            fuzzy_matches_before = crosswalk.stats['credential']['fuzzy']
+            sf_cred_by_piece = crosswalk.map_values('credential', {piece for pieces in pieces_by_cell.values() for piece in pieces})
+            fallback_creds_by_cell = {
+                cell: list(dict.fromkeys(sf_cred_by_piece[piece] for piece in pieces if sf_cred_by_piece[piece]))
+                for cell, pieces in pieces_by_cell.items()
+            }
+            if crosswalk.stats['credential']['fuzzy'] > fuzzy_matches_before:
+                extractor = CredentialExtractor.load(crosswalk)
+                creds_by_row = extractor.extract_series(df_source[config['credential_col']])
+            name_creds_by_row = None
+            if name_keys_from_full_name is not None:
+                name_creds_by_row = extractor.extract_series(df_source[config['full_name_col']], in_name=True)
             
-            for _, row in df_source.iterrows():
-                creds_raw = row.get(config['cred_col'])
+            for index, row in df_source.iterrows():
+                creds_raw = row.get(config['credential_col'])
+                creds = creds_by_row.at[index] or fallback_creds_by_cell.get(creds_raw, [])
+                if name_creds_by_row is not None and name_creds_by_row.at[index]:
+                    creds = list(dict.fromkeys(creds + name_creds_by_row.at[index]))
+                    if pd.isna(creds_raw):
+                        creds_raw = row.get(config['full_name_col'])
                 if pd.isna(creds_raw):
                     continue
+                entry = (creds_raw, tuple(creds)) # Raw text (for the debug output) and its credentials
 
-                npi = None
-                if config.get('npi_col') and pd.notna(row.get(config['npi_col'])):
-                    npi = str(row.get(config['npi_col'])).strip().replace('.0', '')
-                    if npi:
+                if npi_keys is not None:
+                    npi = npi_keys.at[index]
+                    if npi != INVALID_NPI_KEY:
                         if npi not in data['source_creds_by_npi']:
                             data['source_creds_by_npi'][npi] = []
-                        data['source_creds_by_npi'][npi].append(creds_raw)
+                        data['source_creds_by_npi'][npi].append(entry)
                 
                 name_key_source = None
-                if config.get('name_col'): # Pulse files with "Provider Name"
-                    first, last = clean_and_split_full_name(row.get(config['name_col']))
-                    if first or last: # Ensure at least one part of the name is present
-                         name_key_source = create_name_key(first, last)
-                elif config.get('first_col') and config.get('last_col'): # Legacy file
+                if name_keys_from_full_name is not None:
+                    name_key_source = name_keys_from_full_name.at[index]
+                elif use_split_names:
                     first = row.get(config['first_col'])
                     last = row.get(config['last_col'])
                     if pd.notna(first) or pd.notna(last):
                         name_key_source = create_name_key(first, last)
                 
-                if name_key_source and name_key_source != "_":
+                if name_key_source and name_key_source != EMPTY_NAME_KEY:
                     if name_key_source not in data['source_creds_by_name']:
                         data['source_creds_by_name'][name_key_source] = []
-                    data['source_creds_by_name'][name_key_source].append(creds_raw)
+                    data['source_creds_by_name'][name_key_source].append(entry)
 
         except FileNotFoundError:
             print(f"Warning: Source file not found: {config['path']}. Skipping.")
@@ -181,21 +153,20 @@ def main():
         return
 
     df_truth = loaded_data['truth']
-    sf_creds_set = loaded_data['salesforce_creds_set']
-    # Create a lookup from cleaned sf_cred to original sf_cred
-    sf_creds_original_map = {str(cred).strip().upper().replace(".", ""): cred for cred in loaded_data['salesforce_creds_original']}
-    
+    crosswalk = loaded_data['crosswalk']
     source_creds_by_name = loaded_data['source_creds_by_name']
     source_creds_by_npi = loaded_data['source_creds_by_npi']
 
     df_truth[COL_SF_CREDENTIAL_OUT] = ""
-    df_truth['name_key_truth'] = df_truth.apply(lambda row: create_name_key(row[COL_TRUTH_FIRST], row[COL_TRUTH_LAST]), axis=1)
+    df_truth[COL_SF_CREDENTIALS_OUT] = ""
+    df_truth['name_key_truth'] = create_name_key_series(df_truth[COL_TRUTH_FIRST], df_truth[COL_TRUTH_LAST])
+    df_truth['npi_key_truth'] = npi_key_series(df_truth[COL_TRUTH_NPI])
     
     credentials_added_count = 0
     processed_aaron_huth_debug = False # Debug flag
 
     for index, row_truth in df_truth.iterrows():
-        truth_npi = str(row_truth[COL_TRUTH_NPI]).strip()
+        truth_npi = row_truth['npi_key_truth']
         truth_first_name = row_truth[COL_TRUTH_FIRST]
         truth_last_name = row_truth[COL_TRUTH_LAST]
         truth_name_key = row_truth['name_key_truth']
@@ -206,30 +177,30 @@ def main():
             print(f"--- DEBUG START: Aaron Huth ---")
             print(f"Truth NPI: '{truth_npi}', Truth Name Key: '{truth_name_key}'")
 
-        found_sf_cred = None
+        found_sf_creds = []
         
         # Gather all potential credential strings for this provider
         all_raw_creds_for_provider = []
         
-        if truth_npi and truth_npi in source_creds_by_npi:
+        if truth_npi != INVALID_NPI_KEY and truth_npi in source_creds_by_npi:
             all_raw_creds_for_provider.extend(source_creds_by_npi[truth_npi])
             if is_aaron_huth and not processed_aaron_huth_debug:
-                print(f"  NPI '{truth_npi}' found in source_creds_by_npi. Creds: {source_creds_by_npi[truth_npi]}")
+                print(f"  NPI '{truth_npi}' found in source_creds_by_npi. Creds: {[raw for raw, _ in source_creds_by_npi[truth_npi]]}")
         elif is_aaron_huth and not processed_aaron_huth_debug:
             print(f"  NPI '{truth_npi}' NOT found in source_creds_by_npi.")
             
         if truth_name_key in source_creds_by_name:
             all_raw_creds_for_provider.extend(source_creds_by_name[truth_name_key])
             if is_aaron_huth and not processed_aaron_huth_debug:
-                print(f"  Name key '{truth_name_key}' found in source_creds_by_name. Creds: {source_creds_by_name[truth_name_key]}")
+                print(f"  Name key '{truth_name_key}' found in source_creds_by_name. Creds: {[raw for raw, _ in source_creds_by_name[truth_name_key]]}")
         elif is_aaron_huth and not processed_aaron_huth_debug:
              print(f"  Name key '{truth_name_key}' NOT found in source_creds_by_name.")
         
-        # Deduplicate raw credential strings to avoid parsing the same string multiple times
-        unique_raw_creds = list(set(all_raw_creds_for_provider))
+        # Deduplicate raw credential strings, keeping the order they were collected in (NPI matches first)
+        unique_raw_creds = list(dict.fromkeys(all_raw_creds_for_provider))
 
         if is_aaron_huth and not processed_aaron_huth_debug:
-            print(f"  Unique raw credentials collected: {unique_raw_creds}")
+            print(f"  Unique raw credentials collected: {[raw for raw, _ in unique_raw_creds]}")
 
         if not unique_raw_creds:
             # print(f"No source credentials found for {truth_name_key} / NPI {truth_npi}")
@@ -238,36 +209,22 @@ def main():
                 processed_aaron_huth_debug = True # Mark as processed for debug
             continue
 
-        for raw_cred_str in unique_raw_creds:
-            if is_aaron_huth and not processed_aaron_huth_debug:
-                print(f"  Processing raw_cred_str: '{raw_cred_str}'")
-            parsed_list = parse_credentials(raw_cred_str)
+        for raw_cred_str, sf_creds in unique_raw_creds:
             if is_aaron_huth and not processed_aaron_huth_debug:
-                print(f"    Parsed list: {parsed_list}")
-            for cred_candidate in parsed_list:
-                if is_aaron_huth and not processed_aaron_huth_debug:
-                    print(f"      Checking cred_candidate: '{cred_candidate}'")
-                # cred_candidate is already uppercased and stripped by parse_credentials
-                if cred_candidate in sf_creds_set:
-                    found_sf_cred = sf_creds_original_map[cred_candidate] # Get the original casing
-                    if is_aaron_huth and not processed_aaron_huth_debug:
-                        print(f"        MATCH FOUND! Salesforce original: '{found_sf_cred}'")
-                    break # Found a valid Salesforce credential for this source string
-                elif is_aaron_huth and not processed_aaron_huth_debug:
-                    print(f"        No match in sf_creds_set.")
-            if found_sf_cred:
-                break # Found a valid Salesforce credential for this provider
+                print(f"  '{raw_cred_str}' -> Salesforce: {list(sf_creds)}")
+            found_sf_creds.extend(cred for cred in sf_creds if cred not in found_sf_creds)
         
         if is_aaron_huth and not processed_aaron_huth_debug:
-            print(f"  Final found_sf_cred for Aaron Huth: {found_sf_cred}")
+            print(f"  Final found_sf_creds for Aaron Huth: {found_sf_creds}")
             processed_aaron_huth_debug = True # Mark as processed for debug
             print(f"--- DEBUG END: Aaron Huth ---")
 
 
-        if found_sf_cred:
-            df_truth.loc[index, COL_SF_CREDENTIAL_OUT] = found_sf_cred
+        if found_sf_creds:
+            df_truth.loc[index, COL_SF_CREDENTIAL_OUT] = found_sf_creds[0]
+            df_truth.loc[index, COL_SF_CREDENTIALS_OUT] = SF_CREDENTIALS_SEPARATOR.join(found_sf_creds)
             credentials_added_count += 1
-            # print(f"Assigned '{found_sf_cred}' to {truth_name_key} / NPI {truth_npi}")
+            # print(f"Assigned {found_sf_creds} to {truth_name_key} / NPI {truth_npi}")
         # else:
             # print(f"No Salesforce credential match for {truth_name_key} / NPI {truth_npi} from raw: {unique_raw_creds}")
 
@@ -275,9 +232,10 @@ def main():
     print(f"Enrichment complete. Added Salesforce credentials to {credentials_added_count} providers.")
 
     # --- Final Cleanup and Save ---
-    final_cols = [col for col in df_truth.columns if col != 'name_key_truth'] # Keep original columns + new one
-    if COL_SF_CREDENTIAL_OUT not in final_cols: # Should be there, but as a safeguard
-        final_cols.append(COL_SF_CREDENTIAL_OUT)
+    final_cols = [col for col in df_truth.columns if col not in ('name_key_truth', 'npi_key_truth')] # Keep original columns + new ones
+    for col in (COL_SF_CREDENTIAL_OUT, COL_SF_CREDENTIALS_OUT): # Should be there, but as a safeguard
+        if col not in final_cols:
+            final_cols.append(col)
         
     df_output = df_truth[final_cols]
 
@@ -286,6 +244,9 @@ def main():
         print(f"Successfully updated and saved truth file to: {OUTPUT_FILE}")
     except Exception as e:
         print(f"ERROR saving updated file: {e}")
+    stats = crosswalk.stats['credential']
+    crosswalk.save() # Cache the fallback results for source values seen for the first time
+    print(f"Saved the crosswalk to {crosswalk.path} ({stats['fuzzy']} new fuzzy matches, {stats['unmatched']} new unmatched values).")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
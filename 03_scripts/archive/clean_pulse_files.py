@@ -1,35 +1,24 @@
-import pandas as pd
-import re
+import argparse
 import os
+import re
+import sys
+
+import pandas as pd
+
+# Shared helpers live one level up in 03_scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def clean_multi_value_col(series, sep=';#', item_transform_func=None):
-    """Splits by separator, applies optional transform, trims, filters empty, rejoins."""
+from multi_value import MultiValueColumn
+from parallel_files import default_jobs, run_tasks
+from source_registry import get_source
+
+def clean_multi_value_col(series, sep=';#', item_transform_func=None, log=print):
+    """Splits by separator, applies optional transform, trims, filters empty, rejoins (None where no items remain)."""
     if series is None:
         return None
-        
-    def process_cell(cell):
-        if pd.isna(cell):
-            return None
-        items = str(cell).split(sep)
-        cleaned_items = []
-        for item in items:
-            stripped_item = item.strip()
-            if stripped_item: # Filter out empty strings resulting from separators
-                if item_transform_func:
-                    try:
-                        transformed_item = item_transform_func(stripped_item)
-                        if transformed_item: # Ensure transform didn't result in None/empty
-                             cleaned_items.append(str(transformed_item)) # Ensure back to string
-                    except Exception as e:
-                        # Handle potential errors during transformation, keep original
-                        print(f"  - Warning: Error transforming item '{stripped_item}': {e}. Keeping original.")
-                        cleaned_items.append(stripped_item)
-                else:
-                    cleaned_items.append(stripped_item)
-        # Return None if no valid items remain, otherwise rejoin
-        return sep.join(cleaned_items) if cleaned_items else None
-
-    return series.apply(process_cell)
+    # Parsed once for the whole column; the transform runs once per distinct item
+    column = MultiValueColumn.from_series(series, separators=[sep], transform=item_transform_func, log=log)
+    return column.to_series(sep)
 
 def clean_provider_name(name_series):
     """Removes quoted nicknames like ""Jim""."""
@@ -56,25 +45,22 @@ def clean_newlines_in_df(df):
 
 
 # --- Main Script ---
-file_paths = [
-    '00_source_data/pulse_data/pulse_mm/pulse_mm.csv',
-    '00_source_data/pulse_data/pulse_counseling/pulse_counseling.csv',
-    '00_source_data/pulse_data/pulse_bhi/pulse_bhi.csv'
-]
-
-# Columns known to potentially use ';#' separator
-multi_value_cols = ['Availability', 'Ages', 'Specialties', 'Do NOT Refer', 'Services Offered', 'Specialities/Preference'] # Combine potential names
-
-for filepath in file_paths:
-    print(f"--- Processing: {filepath} ---")
+# The Pulse exports (source_registry declares each one's path and ';#'-separated multi-value columns)
+source_keys = ['pulse_mm', 'pulse_counseling', 'pulse_bhi']
+
+def clean_pulse_file(source_key, shared, task_log):
+    """Pool worker: clean one Pulse file in place. Progress goes to task_log, printed by the parent in file order."""
+    source = get_source(source_key)
+    filepath = source['path']
+    task_log.write(f"--- Processing: {filepath} ---")
     if not os.path.exists(filepath):
-        print(f"ERROR: File not found: {filepath}. Skipping.")
-        continue
+        task_log.write(f"ERROR: File not found: {filepath}. Skipping.")
+        return
 
     try:
         # Read CSV, treating all as string initially
         df = pd.read_csv(filepath, dtype=str, skipinitialspace=True)
-        print(f"Read file. Shape: {df.shape}")
+        task_log.write(f"Read file. Shape: {df.shape}")
 
         # --- Apply Fixes ---
 
@@ -86,48 +72,48 @@ for filepath in file_paths:
         # 1. Standardize Provider Name Column
         if 'Therapist Name' in df.columns:
             df.rename(columns={'Therapist Name': 'Provider Name'}, inplace=True)
-            print("- Renamed 'Therapist Name' to 'Provider Name'.")
+            task_log.write("- Renamed 'Therapist Name' to 'Provider Name'.")
         if 'BHIC' in df.columns:
             df.rename(columns={'BHIC': 'Provider Name'}, inplace=True)
-            print("- Renamed 'BHIC' to 'Provider Name'.")
+            task_log.write("- Renamed 'BHIC' to 'Provider Name'.")
 
         # 2. Clean Embedded Quotes in Provider Name
         if 'Provider Name' in df.columns:
             original_names = df['Provider Name'].copy()
             df['Provider Name'] = clean_provider_name(df['Provider Name'])
             if not original_names.equals(df['Provider Name']):
-                 print("- Cleaned quoted nicknames from 'Provider Name'.")
+                 task_log.write("- Cleaned quoted nicknames from 'Provider Name'.")
 
         # 3. Replace Newlines Within Cells
         # Run this early before splitting columns that might contain newlines
-        print("- Replacing newlines within cells...")
+        task_log.write("- Replacing newlines within cells...")
         df = clean_newlines_in_df(df)
 
         # 4. Handle Multi-value Columns (Standardize splitting & trimming)
-        print("- Standardizing multi-value columns (splitting by ';#', trimming items)...")
-        for col_name in multi_value_cols:
+        task_log.write("- Standardizing multi-value columns (splitting by ';#', trimming items)...")
+        for col_name, separator in source['multi_value_separators'].items():
              if col_name in df.columns:
                  # Apply basic split/trim/rejoin first
-                 df[col_name] = clean_multi_value_col(df[col_name], sep=';#')
-                 print(f"  - Processed '{col_name}' for consistent splitting/trimming.")
+                 df[col_name] = clean_multi_value_col(df[col_name], sep=separator, log=task_log.write)
+                 task_log.write(f"  - Processed '{col_name}' for consistent splitting/trimming.")
 
         # 5. Standardize Case for 'Availability' (Lowercase)
         if 'Availability' in df.columns:
-             print("- Standardizing case for 'Availability' (lowercase & multi-value clean)...")
+             task_log.write("- Standardizing case for 'Availability' (lowercase & multi-value clean)...")
              # Apply transform *within* the multi-value cleaner
-             df['Availability'] = clean_multi_value_col(df['Availability'], sep=';#', item_transform_func=lambda x: x.lower())
+             df['Availability'] = clean_multi_value_col(df['Availability'], sep=';#', item_transform_func=lambda x: x.lower(), log=task_log.write)
 
 
         # 6. Standardize Case for 'Credentials' (Uppercase)
         if 'Credentials' in df.columns:
-             print("- Standardizing case for 'Credentials' (uppercase & multi-value clean)...")
+             task_log.write("- Standardizing case for 'Credentials' (uppercase & multi-value clean)...")
              # Apply transform *within* the multi-value cleaner
-             df['Credentials'] = clean_multi_value_col(df['Credentials'], sep=';#', item_transform_func=lambda x: x.upper())
+             df['Credentials'] = clean_multi_value_col(df['Credentials'], sep=';#', item_transform_func=lambda x: x.upper(), log=task_log.write)
 
 
         # 7. Standardize Case for 'Location' (Title Case)
         if 'Location' in df.columns:
-             print("- Standardizing case for 'Location' (title case)...")
+             task_log.write("- Standardizing case for 'Location' (title case)...")
              # Location is likely single value, but apply transform safely
              df['Location'] = df['Location'].str.title()
 
@@ -141,17 +127,30 @@ for filepath in file_paths:
         original_rows = df.shape[0]
         df.dropna(how='all', inplace=True)
         if df.shape[0] < original_rows:
-            print(f"- Removed {original_rows - df.shape[0]} fully blank rows.")
+            task_log.write(f"- Removed {original_rows - df.shape[0]} fully blank rows.")
 
 
         # Save cleaned file
         df.to_csv(filepath, index=False, encoding='utf-8')
-        print(f"Successfully cleaned and saved '{filepath}'. New shape: {df.shape}")
+        task_log.write(f"Successfully cleaned and saved '{filepath}'. New shape: {df.shape}")
 
     except Exception as e:
-        print(f"ERROR: Failed to process file {filepath}. Error: {e}")
+        task_log.write(f"ERROR: Failed to process file {filepath}. Error: {e}")
         # Optionally re-raise e if debugging: raise e
     
-    print("-" * (len(filepath) + 18)) # Separator for clarity
+    task_log.write("-" * (len(filepath) + 18)) # Separator for clarity
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the Pulse source files in place.")
+    parser.add_argument('--jobs', type=int, default=default_jobs(), help="Worker processes (default: one per core; 1 runs serially).")
+    args = parser.parse_args(argv)
+
+    # Each file is independent: clean them in parallel, then print each file's messages in order
+    for _, task_log in run_tasks(clean_pulse_file, source_keys, jobs=args.jobs):
+        for message in task_log.lines:
+            print(message)
+
+    print("--- All Pulse files processed. ---")
 
-print("--- All Pulse files processed. ---") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
 import pandas as pd
 import numpy as np
+import os
+import sys
+
+# Shared helpers live one level up in 03_scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from name_normalization import create_name_key_series
+from nppes_index import load_nppes_index
+from npi_validation import valid_npi_series, validate_npi_series
 
 # --- Configuration ---
 OUTPUT_FILE = "01_processed_data/new_provider_truth_file.csv"
@@ -8,6 +17,8 @@ PULSE_NAMES_FILE = "05_airtable_and_mapping/02_pulse/pulse_consolidated_names.cs
 NORTHSHORE_NAMES_FILE = "05_airtable_and_mapping/03_northshore/northshore_names.csv"
 UNMATCHED_FILE = "05_airtable_and_mapping/04_not_in_pulse_or_northshore/unmatched_providers.csv"
 OLD_TRUTH_FOR_NPI_LOOKUP = "05_airtable_and_mapping/01_name_npi_airtable/provider_ids_for_mapping.csv"
+NPPES_INDEX_DIR = "00_source_data/nppes_index" # Built by 03_scripts/nppes_index.py; backfill is skipped if absent
+NPPES_PRACTICE_STATE = "IL" # Every roster is Illinois-based; NPPES names are matched within this practice state
 
 # --- Column Names ---
 COL_UIUD = "uiud"
@@ -19,20 +30,36 @@ COL_LABEL = "Internal Label"
 COL_PULSE_LABEL = "Pulse Label" # From pulse_consolidated_names.csv
 COL_NPI_IN = "National Provider Identifier (NPI)" # From unmatched_providers.csv and old truth file
 
-def normalize_name_part(name_part):
-    """Normalize a single part of a name (first or last)."""
-    if pd.isna(name_part):
-        return ""
-    # Lowercase, strip, replace hyphens/periods/commas with space, then condense multiple spaces
-    normalized = str(name_part).lower().strip()
-    normalized = normalized.replace('-', ' ').replace('.', ' ').replace(',', ' ')
-    return ' '.join(normalized.split())
-
 def create_name_key(df):
     """Create a consistent search key from first and last name columns."""
-    first = df[COL_FIRST].apply(normalize_name_part)
-    last = df[COL_LAST].apply(normalize_name_part)
-    return first + "_" + last
+    return create_name_key_series(df[COL_FIRST], df[COL_LAST])
+
+def backfill_npis_from_nppes(df):
+    """
+    Fill still-missing NPIs from the offline NPPES index by (practice state, last, first).
+    Only unambiguous hits (exactly one NPI for the name) are used. Returns the number filled.
+    """
+    nppes_index = load_nppes_index(NPPES_INDEX_DIR)
+    if nppes_index is None:
+        print(f"NPPES index not found at {NPPES_INDEX_DIR}. Skipping NPPES backfill.")
+        return 0
+    missing_npi_mask = df[COL_NPI_OUT].fillna('') == ''
+    df_missing = df.loc[missing_npi_mask]
+    matches = nppes_index.lookup_names(
+        [NPPES_PRACTICE_STATE] * len(df_missing), df_missing[COL_LAST].tolist(), df_missing[COL_FIRST].tolist()
+    )
+    filled = 0
+    ambiguous = 0
+    for index, records in zip(df_missing.index, matches):
+        npis = {record['npi'] for record in records}
+        if len(npis) == 1:
+            df.at[index, COL_NPI_OUT] = npis.pop()
+            filled += 1
+        elif len(npis) > 1:
+            ambiguous += 1
+    print(f"NPPES backfill: {filled} of {len(df_missing)} missing NPIs filled from {len(nppes_index)} indexed providers "
+          f"({ambiguous} names matched several NPIs and were left blank).")
+    return filled
 
 # --- Load Data --- 
 def load_data():
@@ -64,7 +91,7 @@ def main():
     df_old_truth = loaded_data['old_truth']
 
     # --- Prepare NPI Lookup from Old Truth --- 
-    df_old_truth[COL_NPI_IN] = df_old_truth[COL_NPI_IN].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+    df_old_truth[COL_NPI_IN] = valid_npi_series(df_old_truth[COL_NPI_IN]) # '' where blank or failing the check digit
     df_old_truth['name_key'] = create_name_key(df_old_truth)
     npi_lookup = df_old_truth.set_index('name_key')[COL_NPI_IN].to_dict()
     print(f"Created NPI lookup dictionary from {len(npi_lookup)} unique names in old truth file.")
@@ -86,7 +113,12 @@ def main():
     df_unmatched[COL_LABEL] = 'Legacy/Unmatched'
     # Rename NPI column for consistency before merging
     df_unmatched.rename(columns={COL_NPI_IN: COL_NPI_OUT}, inplace=True)
-    df_unmatched[COL_NPI_OUT] = df_unmatched[COL_NPI_OUT].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+    unmatched_npis, unmatched_npi_valid = validate_npi_series(df_unmatched[COL_NPI_OUT])
+    invalid_npis = unmatched_npis[~unmatched_npi_valid & (unmatched_npis != '')]
+    if not invalid_npis.empty:
+        print(f"Warning: Dropping {len(invalid_npis)} NPIs that fail the check digit: {invalid_npis.tolist()}")
+    # Invalid or blank NPIs become NaN so the old-truth lookup below can still fill them
+    df_unmatched[COL_NPI_OUT] = unmatched_npis.where(unmatched_npi_valid, np.nan)
     df_unmatched = df_unmatched[[COL_FIRST, COL_LAST, COL_NPI_OUT, COL_LABEL]].copy()
     df_unmatched['source_priority'] = 3
 
@@ -102,6 +134,7 @@ def main():
     missing_npi_mask = df_combined[COL_NPI_OUT].isna()
     df_combined.loc[missing_npi_mask, COL_NPI_OUT] = df_combined.loc[missing_npi_mask, 'name_key'].map(npi_lookup)
     print(f"Attempted NPI lookup. {missing_npi_mask.sum()} entries had NPI looked up.")
+    backfill_npis_from_nppes(df_combined)
 
     # --- Deduplicate --- 
     # Sort by priority (Pulse > Northshore > Unmatched), then drop duplicates based on name_key
@@ -1,11 +1,21 @@
 import pandas as pd
 import numpy as np
 import re
+import os
+import sys
+
+# Shared helpers live one level up in 03_scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from name_cleaning import clean_and_split_full_name_series
+from name_normalization import EMPTY_NAME_KEY, create_name_key_series
+from npi_validation import INVALID_NPI_KEY, npi_key_series
+from source_registry import get_source, read_source
 
 # --- Configuration ---
 TRUTH_FILE = "01_processed_data/new_provider_truth_file.csv"
-BHI_FILE = "00_source_data/pulse_data/pulse_bhi/pulse_bhi.csv"
-LEGACY_AIRTABLE_FILE = "00_source_data/airtable_monolithic/Providers-All Providers.csv"
+BHI_FILE = get_source('pulse_bhi')['path']
+LEGACY_AIRTABLE_FILE = get_source('legacy_airtable')['path']
 OUTPUT_FILE = "01_processed_data/new_provider_truth_file.csv" # Overwrite the existing file
 
 # --- Column Names --- 
@@ -20,54 +30,16 @@ COL_PHONE = "Phone Number"
 COL_WEB = "Web Address"
 
 # BHI File Columns
-BHI_PROVIDER_NAME = "Provider Name"
+BHI_PROVIDER_NAME = get_source('pulse_bhi')['full_name_col']
 BHI_PHONE = "Patient Facing Number"
 
 # Legacy File Columns
-LEGACY_FIRST = "First Name"
-LEGACY_LAST = "Last Name"
-LEGACY_NPI = "National Provider Identifier (NPI)"
+LEGACY_FIRST = get_source('legacy_airtable')['first_col']
+LEGACY_LAST = get_source('legacy_airtable')['last_col']
+LEGACY_NPI = get_source('legacy_airtable')['npi_col']
 LEGACY_WEB = "Profile Link - Legacy Site"
 
 # --- Helper Functions --- 
-def normalize_name_part(name_part):
-    """Normalize a single part of a name (first or last)."""
-    if pd.isna(name_part):
-        return ""
-    normalized = str(name_part).lower().strip()
-    normalized = normalized.replace('-', ' ').replace('.', ' ').replace(',', ' ')
-    return ' '.join(normalized.split())
-
-def create_name_key(first_name, last_name):
-    """Create a consistent search key from first and last name."""
-    return f"{normalize_name_part(first_name)}_{normalize_name_part(last_name)}"
-
-def clean_and_split_full_name(full_name_str):
-    """(Copied/adapted from name_consistency_analyzer.py) Cleans and splits a full name string."""
-    if pd.isna(full_name_str):
-        return "", ""
-    name = str(full_name_str)
-    credentials_suffixes = [
-        r",\s*PhD", r",\s*MD", r",\s*LCSW", r",\s*LCPC", r",\s*PsyD", r",\s*PMHNP-BC",
-        r",\s*APN", r",\s*PA-C", r",\s*PA", r",\s*DO", r",\s*FNP-BC", r",\s*DNP", r",\s*APRN",
-        r",\s*LSW", r",\s*LPC", r",\s*CADC", r",\s*BCBA", r",\s*QIDP", r",\s*LMFT",
-        r"\s+\(.*\)", r"\s+PhD", r"\s+MD", r"\s+LCSW", r"\s+LCPC", r"\s+PsyD", r"\s+PMHNP-BC",
-        r"\s+APN", r"\s+PA-C", r"\s+PA", r"\s+DO", r"\s+FNP-BC", r"\s+DNP", r"\s+APRN",
-        r"\s+LSW", r"\s+LPC", r"\s+CADC", r"\s+BCBA", r"\s+QIDP", r"\s+LMFT"
-    ]
-    for pattern in credentials_suffixes:
-        name = re.sub(pattern, "", name, flags=re.IGNORECASE)
-    name = name.strip()
-    parts = name.split()
-    if not parts:
-        return "", ""
-    first_name = parts[0]
-    last_name = " ".join(parts[1:])
-    if ',' in name and len(parts) > 1 and parts[0].endswith(','):
-        last_name = parts[0].replace(',', '').strip()
-        first_name = " ".join(parts[1:]).strip()
-    return first_name.strip(), last_name.strip()
-
 def format_phone_number(number_str):
     """Cleans and formats a phone number string to (XXX) XXX-XXXX."""
     if pd.isna(number_str):
@@ -98,7 +70,7 @@ def main():
 
     print(f"Loading BHI file for phone numbers: {BHI_FILE}")
     try:
-        df_bhi = pd.read_csv(BHI_FILE)
+        df_bhi = read_source('pulse_bhi', columns=[BHI_PROVIDER_NAME, BHI_PHONE])
     except FileNotFoundError:
         print(f"ERROR: BHI file not found: {BHI_FILE}")
         return # Cannot proceed without phone source
@@ -108,8 +80,9 @@ def main():
         
     print(f"Loading Legacy Airtable file for web addresses: {LEGACY_AIRTABLE_FILE}")
     try:
-        df_legacy = pd.read_csv(LEGACY_AIRTABLE_FILE, dtype={LEGACY_NPI: str})
-        df_legacy[LEGACY_NPI] = df_legacy[LEGACY_NPI].astype(str).str.strip().str.replace(r'\.0$', '', regex=True).fillna('')
+        # Only the four columns used below are loaded (a missing one is reported further down)
+        df_legacy = read_source('legacy_airtable', columns=[LEGACY_FIRST, LEGACY_LAST, LEGACY_NPI, LEGACY_WEB])
+        df_legacy['npi_key'] = npi_key_series(df_legacy[LEGACY_NPI]) # Integer-packed; INVALID_NPI_KEY if blank/invalid
     except FileNotFoundError:
         print(f"Warning: Legacy Airtable file not found ({LEGACY_AIRTABLE_FILE}). Web addresses will not be populated.")
         df_legacy = pd.DataFrame() # Create empty df to avoid errors later
@@ -119,16 +92,16 @@ def main():
 
     # --- Create BHI Phone Lookup --- 
     bhi_phone_lookup = {}
-    if not df_bhi.empty:
+    if not df_bhi.empty and BHI_PROVIDER_NAME in df_bhi.columns:
+        bhi_first, bhi_last = clean_and_split_full_name_series(df_bhi[BHI_PROVIDER_NAME])
+        bhi_name_keys = create_name_key_series(bhi_first, bhi_last)
         for index, row in df_bhi.iterrows():
-            provider_name_raw = row.get(BHI_PROVIDER_NAME)
             phone_raw = row.get(BHI_PHONE)
             
-            first, last = clean_and_split_full_name(provider_name_raw)
-            name_key = create_name_key(first, last)
+            name_key = bhi_name_keys.at[index]
             formatted_phone = format_phone_number(phone_raw)
             
-            if name_key != "_" and formatted_phone: # Only add if valid name and phone
+            if name_key != EMPTY_NAME_KEY and formatted_phone: # Only add if valid name and phone
                 if name_key in bhi_phone_lookup:
                     # Handle potential duplicate names in BHI file - keep first found for simplicity
                     # print(f"Warning: Duplicate name key '{name_key}' found in BHI file. Keeping first phone number.")
@@ -141,11 +114,12 @@ def main():
     legacy_web_lookup_by_name = {}
     legacy_web_lookup_by_npi = {}
     if not df_legacy.empty and LEGACY_WEB in df_legacy.columns:
-        df_legacy_filtered = df_legacy[[LEGACY_FIRST, LEGACY_LAST, LEGACY_NPI, LEGACY_WEB]].dropna(subset=[LEGACY_WEB]).copy()
-        df_legacy_filtered['name_key'] = df_legacy_filtered.apply(lambda row: create_name_key(row[LEGACY_FIRST], row[LEGACY_LAST]), axis=1)
+        df_legacy_filtered = df_legacy[[LEGACY_FIRST, LEGACY_LAST, 'npi_key', LEGACY_WEB]].dropna(subset=[LEGACY_WEB]).copy()
+        df_legacy_filtered['name_key'] = create_name_key_series(df_legacy_filtered[LEGACY_FIRST], df_legacy_filtered[LEGACY_LAST])
         
-        # NPI lookup (more reliable) - keep first NPI match if duplicates exist
-        legacy_web_lookup_by_npi = df_legacy_filtered.drop_duplicates(subset=[LEGACY_NPI], keep='first').set_index(LEGACY_NPI)[LEGACY_WEB].to_dict()
+        # NPI lookup (more reliable) - keep first NPI match if duplicates exist; only valid NPIs are keys
+        df_legacy_by_npi = df_legacy_filtered[df_legacy_filtered['npi_key'] != INVALID_NPI_KEY]
+        legacy_web_lookup_by_npi = df_legacy_by_npi.drop_duplicates(subset=['npi_key'], keep='first').set_index('npi_key')[LEGACY_WEB].to_dict()
         
         # Name lookup (fallback)
         legacy_web_lookup_by_name = df_legacy_filtered.drop_duplicates(subset=['name_key'], keep='first').set_index('name_key')[LEGACY_WEB].to_dict()
@@ -156,7 +130,8 @@ def main():
     # --- Enrich Truth DataFrame --- 
     df_truth[COL_PHONE] = ""
     df_truth[COL_WEB] = ""
-    df_truth['name_key'] = df_truth.apply(lambda row: create_name_key(row[COL_FIRST], row[COL_LAST]), axis=1)
+    df_truth['name_key'] = create_name_key_series(df_truth[COL_FIRST], df_truth[COL_LAST])
+    df_truth['npi_key'] = npi_key_series(df_truth[COL_NPI])
 
     phone_added_count = 0
     web_added_by_npi_count = 0
@@ -164,7 +139,7 @@ def main():
 
     for index, row in df_truth.iterrows():
         name_key = row['name_key']
-        npi = row[COL_NPI]
+        npi = row['npi_key']
         label = row.get(COL_LABEL, '')
 
         # Add Phone Number (only for BHI)
@@ -177,7 +152,7 @@ def main():
 
         # Add Web Address (prioritize NPI match)
         web_address = None
-        if npi and npi in legacy_web_lookup_by_npi:
+        if npi != INVALID_NPI_KEY and npi in legacy_web_lookup_by_npi:
             web_address = legacy_web_lookup_by_npi[npi]
             df_truth.loc[index, COL_WEB] = web_address
             web_added_by_npi_count += 1
@@ -2,33 +2,22 @@
 import pandas as pd
 import re
 import os
+import sys
 
-filepath = '00_source_data/pulse_data/pulse_counseling/pulse_counseling.csv'
+# Shared helpers live one level up in 03_scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multi_value import MultiValueColumn
+from source_registry import get_source
+
+filepath = get_source('pulse_counseling')['path']
 
 def clean_credentials_specifically(series):
-    """Handles both comma and ;# separation, uppercases, removes duplicates."""
+    """Handles both comma and ;# separation, uppercases, removes quotes and duplicates (sorted, ;#-joined)."""
     if series is None:
         return None
-    
-    processed_cells = []
-    for cell in series.fillna(''): # Fill NaN to allow processing
-        items_final = set() # Use a set to handle duplicates
-        if isinstance(cell, str) and cell.strip():
-            # Split by comma first, then by ;# within each part
-            parts = str(cell).split(',')
-            for part in parts:
-                sub_parts = part.split(';#')
-                for sub_part in sub_parts:
-                    cleaned = sub_part.strip().upper()
-                    if cleaned:
-                        # Further clean potential leftover quotes if needed
-                        cleaned = cleaned.replace('"', '') 
-                        if cleaned:
-                           items_final.add(cleaned)
-        
-        processed_cells.append(';#'.join(sorted(list(items_final))) if items_final else None)
-        
-    return pd.Series(processed_cells, index=series.index)
+    credentials = MultiValueColumn.from_series(series, separators=[',', ';#'], transform=lambda item: item.upper().replace('"', ''))
+    return credentials.to_series(';#', unique=True, sort=True)
 
 def enhance_name_cleaning(name_series):
     """Removes quoted nicknames and common suffixes."""
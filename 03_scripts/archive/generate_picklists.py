@@ -1,15 +1,49 @@
-import pandas as pd
 import os
+import sys
+
+# Shared helpers live one level up in 03_scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source_registry import get_source, read_source
 
 # Define output directory
 output_base_dir = 'picklists_generated'
 # Ensure this base directory is created by a separate terminal command
 
-# Load the CSV
+columns_to_process = [
+    # Provider Demographics and Attributes
+    {'col': 'Legacy Region', 'subdir': 'Provider_Attributes', 'file': 'legacy_region.txt'},
+    {'col': 'Gender', 'subdir': 'Provider_Attributes', 'file': 'gender.txt'},
+    {'col': 'Languages', 'subdir': 'Provider_Attributes', 'file': 'languages.txt'},
+    {'col': 'Ages Seen', 'subdir': 'Provider_Attributes', 'file': 'ages_seen.txt'},
+
+    # Clinical Information
+    {'col': 'Web Specialty', 'subdir': 'Clinical_Information', 'file': 'web_specialty.txt'},
+    {'col': 'Provider Type', 'subdir': 'Clinical_Information', 'file': 'provider_type.txt'},
+    {'col': 'Level(s) of Care - BHSL List', 'subdir': 'Clinical_Information', 'file': 'levels_of_care_bhsl.txt'},
+    {'col': 'Clinical Interests - Legacy Sites', 'subdir': 'Clinical_Information', 'file': 'clinical_interests_legacy.txt'},
+    {'col': 'Clinical Focus', 'subdir': 'Clinical_Information', 'file': 'clinical_focus.txt'},
+    {'col': 'Conditions Treated', 'subdir': 'Clinical_Information', 'file': 'conditions_treated.txt'},
+    {'col': 'Treatment Modalities', 'subdir': 'Clinical_Information', 'file': 'treatment_modalities.txt'},
+    {'col': 'Board Specialties', 'subdir': 'Clinical_Information', 'file': 'board_specialties.txt'},
+
+    # LOMG Grid Options
+    {'col': 'LOMG Grid - Label', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_label.txt'},
+    {'col': 'LOMG Grid - Location', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_location.txt'},
+    {'col': 'LOMG Grid - Availability', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_availability.txt'},
+    {'col': 'LOMG Grid - Ages Treated', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_ages_treated.txt'},
+    {'col': 'LOMG Grid - Specialties', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_specialties.txt'},
+    {'col': 'LOMG Grid - Do NOT Refer', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_do_not_refer.txt'},
+    {'col': 'LOMG Grid - Insurance Restrictions', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_insurance_restrictions.txt'},
+    {'col': 'LOMG Grid - Other Considerations', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_other_considerations.txt'},
+]
+
+# Load the legacy Airtable export (only the picklist columns; generate_picklist warns about any that are missing)
+legacy_source = get_source('legacy_airtable')
 try:
-    df = pd.read_csv('airtable/Providers-All Providers.csv', low_memory=False)
+    df = read_source('legacy_airtable', columns=[config['col'] for config in columns_to_process])
 except FileNotFoundError:
-    print("Error: 'airtable/Providers-All Providers.csv' not found. Make sure the file exists in the 'airtable' directory.")
+    print(f"Error: '{legacy_source['path']}' not found. Make sure the legacy Airtable export exists.")
     exit()
 
 def generate_picklist(column_name, output_subdir, output_filename):
@@ -50,34 +84,6 @@ def generate_picklist(column_name, output_subdir, output_filename):
         print(f"Error writing picklist for '{column_name}' to '{output_file_path}': {e}")
 
 
-columns_to_process = [
-    # Provider Demographics and Attributes
-    {'col': 'Legacy Region', 'subdir': 'Provider_Attributes', 'file': 'legacy_region.txt'},
-    {'col': 'Gender', 'subdir': 'Provider_Attributes', 'file': 'gender.txt'},
-    {'col': 'Languages', 'subdir': 'Provider_Attributes', 'file': 'languages.txt'},
-    {'col': 'Ages Seen', 'subdir': 'Provider_Attributes', 'file': 'ages_seen.txt'},
-
-    # Clinical Information
-    {'col': 'Web Specialty', 'subdir': 'Clinical_Information', 'file': 'web_specialty.txt'},
-    {'col': 'Provider Type', 'subdir': 'Clinical_Information', 'file': 'provider_type.txt'},
-    {'col': 'Level(s) of Care - BHSL List', 'subdir': 'Clinical_Information', 'file': 'levels_of_care_bhsl.txt'},
-    {'col': 'Clinical Interests - Legacy Sites', 'subdir': 'Clinical_Information', 'file': 'clinical_interests_legacy.txt'},
-    {'col': 'Clinical Focus', 'subdir': 'Clinical_Information', 'file': 'clinical_focus.txt'},
-    {'col': 'Conditions Treated', 'subdir': 'Clinical_Information', 'file': 'conditions_treated.txt'},
-    {'col': 'Treatment Modalities', 'subdir': 'Clinical_Information', 'file': 'treatment_modalities.txt'},
-    {'col': 'Board Specialties', 'subdir': 'Clinical_Information', 'file': 'board_specialties.txt'},
-
-    # LOMG Grid Options
-    {'col': 'LOMG Grid - Label', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_label.txt'},
-    {'col': 'LOMG Grid - Location', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_location.txt'},
-    {'col': 'LOMG Grid - Availability', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_availability.txt'},
-    {'col': 'LOMG Grid - Ages Treated', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_ages_treated.txt'},
-    {'col': 'LOMG Grid - Specialties', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_specialties.txt'},
-    {'col': 'LOMG Grid - Do NOT Refer', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_do_not_refer.txt'},
-    {'col': 'LOMG Grid - Insurance Restrictions', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_insurance_restrictions.txt'},
-    {'col': 'LOMG Grid - Other Considerations', 'subdir': 'LOMG_Grid_Options', 'file': 'lomg_grid_other_considerations.txt'},
-]
-
 # This script assumes that the base directory 'picklists_generated' and its subdirectories
 # 'Provider_Attributes', 'Clinical_Information', and 'LOMG_Grid_Options'
 # have already been created in the workspace root.
@@ -1,5 +1,17 @@
 import pandas as pd
-import re
+import os
+import sys
+
+# Shared helpers live one level up in 03_scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzzy_matching import TrigramIndex, jaro_winkler_similarity
+from name_cleaning import clean_and_split_full_name
+from name_normalization import EMPTY_NAME_KEY, create_name_key, create_name_key_series
+from nickname_aliases import load_nickname_index
+from npi_validation import canonicalize_npi, npi_check_digit_ok, npi_key_series, validate_npi_series
+from source_registry import get_source, read_source, uses_split_name_columns
+from phonetic_index import build_phonetic_index
 
 # Define the source of truth file and its columns
 TRUTH_FILE = "05_airtable_and_mapping/01_name_npi_airtable/provider_ids_for_mapping.csv"
@@ -7,107 +19,13 @@ TRUTH_NPI_COL = "National Provider Identifier (NPI)"
 TRUTH_FIRST_NAME_COL = "First Name"
 TRUTH_LAST_NAME_COL = "Last Name"
 
-# Define other files to check and their relevant columns
-FILES_TO_CHECK = {
-    "northshore_names": {
-        "path": "05_airtable_and_mapping/03_northshore/northshore_names.csv",
-        "npi_col": None,  # No NPI in this file as per current structure
-        "first_name_col": "First Name",
-        "last_name_col": "Last Name",
-        "full_name_col": None,
-    },
-    "providers_with_uids": {
-        "path": "01_processed_data/main_provider_table/01_providers_with_uids.csv",
-        "npi_col": "National Provider Identifier (NPI)",
-        "first_name_col": "First Name",
-        "last_name_col": "Last Name",
-        "full_name_col": "Provider Full Name",
-    },
-    "pulse_mm": {
-        "path": "00_source_data/pulse_data/pulse_mm/pulse_mm.csv",
-        "npi_col": None, # NPI not directly available, would need lookup if strict matching is required
-        "first_name_col": None, # To be extracted from Provider Name
-        "last_name_col": None,  # To be extracted from Provider Name
-        "full_name_col": "Provider Name",
-    },
-    "pulse_bhi": {
-        "path": "00_source_data/pulse_data/pulse_bhi/pulse_bhi.csv",
-        "npi_col": None, # NPI not directly available
-        "first_name_col": None, # To be extracted from Provider Name
-        "last_name_col": None,  # To be extracted from Provider Name
-        "full_name_col": "Provider Name",
-    },
-    "pulse_counseling": {
-        "path": "00_source_data/pulse_data/pulse_counseling/pulse_counseling.csv",
-        "npi_col": None, # NPI not directly available
-        "first_name_col": None, # To be extracted from Therapist Name
-        "last_name_col": None,  # To be extracted from Therapist Name
-        "full_name_col": "Therapist Name",
-    },
-}
-
-def normalize_name_part(name_part):
-    """Normalize a single part of a name (first or last)."""
-    if pd.isna(name_part):
-        return ""
-    return str(name_part).lower().strip().replace('-', ' ').replace('.', '').replace(',', '')
-
-def create_search_key(first_name, last_name):
-    """Create a consistent search key from first and last name."""
-    return f"{normalize_name_part(first_name)}_{normalize_name_part(last_name)}"
-
-def clean_and_split_full_name(full_name_str):
-    """
-    Cleans and splits a full name string into first and last names.
-    Attempts to remove credentials and handles common patterns.
-    """
-    if pd.isna(full_name_str):
-        return "", ""
-
-    name = str(full_name_str)
-    # Remove common credentials and suffixes - this list can be expanded
-    credentials_suffixes = [
-        r",\s*PhD", r",\s*MD", r",\s*LCSW", r",\s*LCPC", r",\s*PsyD", r",\s*PMHNP-BC",
-        r",\s*APN", r",\s*PA-C", r",\s*PA", r",\s*DO", r",\s*FNP-BC", r",\s*DNP", r",\s*APRN",
-        r",\s*LSW", r",\s*LPC", r",\s*CADC", r",\s*BCBA", r",\s*QIDP", r",\s*LMFT",
-        r"\s+\(.*\)", # content in parentheses
-        r"\s+PhD", r"\s+MD", r"\s+LCSW", r"\s+LCPC", r"\s+PsyD", r"\s+PMHNP-BC",
-        r"\s+APN", r"\s+PA-C", r"\s+PA", r"\s+DO", r"\s+FNP-BC", r"\s+DNP", r"\s+APRN",
-        r"\s+LSW", r"\s+LPC", r"\s+CADC", r"\s+BCBA", r"\s+QIDP", r"\s+LMFT"
-    ]
-    for pattern in credentials_suffixes:
-        name = re.sub(pattern, "", name, flags=re.IGNORECASE)
-    
-    name = name.strip()
-    parts = name.split()
-    
-    if not parts:
-        return "", ""
-    
-    first_name = parts[0]
-    last_name = " ".join(parts[1:])
-    
-    # Handle cases like "Lastname, Firstname"
-    if ',' in name and len(parts) > 1 and parts[0].endswith(','):
-        last_name = parts[0].replace(',', '').strip()
-        first_name = " ".join(parts[1:]).strip()
-
-    # Simple heuristic for multi-part last names if a comma wasn't the primary separator
-    # This will need refinement based on actual data patterns.
-    # For now, assume the first word is first name, rest is last.
-    # If last name appears to be a single initial (e.g. "Smith J"), try to flip.
-    if len(parts) > 1 and len(parts[-1]) == 1 and parts[-1].isalpha() and len(parts[0]) > 1 :
-         # Check if the part before the initial could be a first name
-         if len(parts) > 2 and len(parts[-2]) > 1: # e.g. Van Der Meer J
-            pass # Keep as is
-         elif len(parts) == 2 : # e.g. Smith J
-            # This is tricky, could be "J Smith" or "Smith J."
-            # For now, we assume it's Last, First Initial.
-            # A more robust solution needs NPI linking or more rules.
-             pass
-
+# Fuzzy fallback for names with no exact key match
+FUZZY_TOP_K = 3
+FUZZY_MIN_SCORE = 0.85 # Candidates below this are not reported at all
+FUZZY_ACCEPT_SCORE = 0.93 # Best candidate at/above this is reported as a likely variant of a truth name
 
-    return first_name.strip(), last_name.strip()
+# Other files to check (keys of source_registry.SOURCES, which declares their NPI and name columns)
+FILES_TO_CHECK = ['northshore_names', 'providers_with_uids', 'pulse_mm', 'pulse_bhi', 'pulse_counseling']
 
 def load_truth_data():
     """Loads and prepares the source of truth data."""
@@ -117,27 +35,42 @@ def load_truth_data():
         print(f"ERROR: Source of truth file not found: {TRUTH_FILE}")
         return None
 
-    df_truth[TRUTH_NPI_COL] = df_truth[TRUTH_NPI_COL].astype(str).str.strip().str.replace(r'\\.0$', '', regex=True)
-    df_truth['search_key_name'] = df_truth.apply(
-        lambda row: create_search_key(row[TRUTH_FIRST_NAME_COL], row[TRUTH_LAST_NAME_COL]), axis=1
-    )
-    df_truth['search_key_npi'] = df_truth[TRUTH_NPI_COL].fillna('').astype(str).str.lower().str.strip()
-    # Create a dictionary for quick NPI to name lookup
-    truth_npi_to_name = df_truth.set_index('search_key_npi')['search_key_name'].to_dict()
-    truth_name_to_npi = df_truth.set_index('search_key_name')['search_key_npi'].to_dict()
+    # Canonical 10-digit strings; NPIs failing the check digit are reported and never used as keys
+    df_truth[TRUTH_NPI_COL], truth_npi_valid = validate_npi_series(df_truth[TRUTH_NPI_COL])
+    invalid_truth_npis = df_truth.loc[~truth_npi_valid & (df_truth[TRUTH_NPI_COL] != ''), TRUTH_NPI_COL]
+    if not invalid_truth_npis.empty:
+        print(f"WARNING: {len(invalid_truth_npis)} NPIs in the truth file fail the check digit: {invalid_truth_npis.tolist()}")
+    df_truth['search_key_name'] = create_name_key_series(df_truth[TRUTH_FIRST_NAME_COL], df_truth[TRUTH_LAST_NAME_COL])
+    df_truth['search_key_npi'] = npi_key_series(df_truth[TRUTH_NPI_COL])
+    df_truth_valid_npi = df_truth[truth_npi_valid]
+    # Create a dictionary for quick NPI to name lookup (integer-packed NPI keys)
+    truth_npi_to_name = df_truth_valid_npi.set_index('search_key_npi')['search_key_name'].to_dict()
+    truth_name_to_npi = df_truth.set_index('search_key_name')[TRUTH_NPI_COL].to_dict()
     
-    # For faster lookups
-    truth_by_npi = df_truth.set_index('search_key_npi').to_dict('index')
-    truth_by_name_key = df_truth.set_index('search_key_name').to_dict('index')
+    # For faster lookups (a repeated NPI or name keeps its last row, like the dicts above)
+    truth_by_npi = df_truth_valid_npi.drop_duplicates('search_key_npi', keep='last').set_index('search_key_npi').to_dict('index')
+    truth_by_name_key = df_truth.drop_duplicates('search_key_name', keep='last').set_index('search_key_name').to_dict('index')
+
+    # Trigram index over truth name keys for the fuzzy fallback
+    truth_name_index = TrigramIndex()
+    for name_key in truth_by_name_key:
+        if name_key != EMPTY_NAME_KEY:
+            truth_name_index.add(name_key)
+
+    # Phonetic blocks (NYSIIS of first/last name) for sound-alike spellings, checked before the fuzzy index
+    truth_phonetic_index = build_phonetic_index(
+        df_truth[TRUTH_FIRST_NAME_COL], df_truth[TRUTH_LAST_NAME_COL], df_truth['search_key_name']
+    )
     
-    return df_truth, truth_by_npi, truth_by_name_key, truth_npi_to_name, truth_name_to_npi
+    return df_truth, truth_by_npi, truth_by_name_key, truth_npi_to_name, truth_name_to_npi, truth_name_index, truth_phonetic_index
 
-def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to_name, truth_name_to_npi):
+def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to_name, truth_name_to_npi, truth_name_index, truth_phonetic_index):
     """Analyzes a single file against the source of truth."""
     print(f"\\n--- Analyzing File: {file_key} ({config['path']}) ---")
     
     try:
-        df_check = pd.read_csv(config['path'], on_bad_lines='skip') # Skip bad lines for robustness
+        # Skip bad lines for robustness; only the NPI and name columns are loaded
+        df_check = read_source(file_key, roles=('names', 'npi'), on_bad_lines='skip')
     except FileNotFoundError:
         print(f"ERROR: File not found: {config['path']}")
         return []
@@ -146,23 +79,24 @@ def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to
         return []
 
     discrepancies = []
+    nickname_index = load_nickname_index() # Cached after the first file
+    use_split_names = uses_split_name_columns(config, df_check.columns) # Else clean and split the full-name column
 
     for index, row_check in df_check.iterrows():
         npi_check_raw = row_check.get(config['npi_col']) if config['npi_col'] else None
         
-        npi_check = None
-        if pd.notna(npi_check_raw):
-            npi_check_str = str(npi_check_raw).strip()
-            # Remove trailing '.0' if NPI was incorrectly read as float
-            npi_check_str = re.sub(r'\\.0$', '', npi_check_str)
-            npi_check = npi_check_str.lower()
+        # Canonical 10-digit NPI (handles float-read values); fails the check digit -> flagged, not joined on
+        npi_check = canonicalize_npi(npi_check_raw) or None
+        npi_invalid = bool(npi_check) and not npi_check_digit_ok(npi_check)
+        if npi_invalid:
+            npi_check = None
         
 
         first_name_check, last_name_check = "", ""
 
-        if config['first_name_col'] and config['last_name_col']:
-            first_name_check = row_check.get(config['first_name_col'], "")
-            last_name_check = row_check.get(config['last_name_col'], "")
+        if use_split_names:
+            first_name_check = row_check.get(config['first_col'], "")
+            last_name_check = row_check.get(config['last_col'], "")
         elif config['full_name_col']:
             full_name_raw = row_check.get(config['full_name_col'])
             if pd.notna(full_name_raw):
@@ -171,13 +105,13 @@ def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to
                  first_name_check, last_name_check = "", ""
 
 
-        if not first_name_check and not last_name_check and not npi_check:
+        if not first_name_check and not last_name_check and not npi_check and not npi_invalid:
             # print(f"Skipping row {index+2} in {file_key} due to insufficient data (no name or NPI).")
             continue
 
-        name_key_check = create_search_key(first_name_check, last_name_check)
+        name_key_check = create_name_key(first_name_check, last_name_check)
         
-        truth_entry_by_npi = truth_by_npi.get(npi_check) if npi_check else None
+        truth_entry_by_npi = truth_by_npi.get(int(npi_check)) if npi_check else None
         truth_entry_by_name = truth_by_name_key.get(name_key_check) if name_key_check else None
 
         # Provider details from the file being checked
@@ -190,18 +124,16 @@ def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to
             "full_name_in_file": row_check.get(config['full_name_col'], "N/A")
         }
         
-        # Standardization: Convert truth NPI to string for comparison if it's a number
-        if truth_entry_by_npi and isinstance(truth_entry_by_npi.get(TRUTH_NPI_COL), (int, float)):
-            truth_entry_by_npi[TRUTH_NPI_COL] = str(int(truth_entry_by_npi[TRUTH_NPI_COL]))
-            
-        if truth_entry_by_name and isinstance(truth_entry_by_name.get(TRUTH_NPI_COL), (int, float)):
-             truth_entry_by_name[TRUTH_NPI_COL] = str(int(truth_entry_by_name[TRUTH_NPI_COL]))
-
+        if npi_invalid:
+            discrepancies.append({
+                **current_file_details,
+                "issue": "Invalid NPI in File (Fails Check Digit)",
+            })
 
         if npi_check and truth_entry_by_npi: # Match by NPI
             truth_first = truth_entry_by_npi.get(TRUTH_FIRST_NAME_COL)
             truth_last = truth_entry_by_npi.get(TRUTH_LAST_NAME_COL)
-            truth_name_key = create_search_key(truth_first, truth_last)
+            truth_name_key = create_name_key(truth_first, truth_last)
 
             if name_key_check != truth_name_key:
                 discrepancies.append({
@@ -213,7 +145,7 @@ def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to
                 })
         elif name_key_check and truth_entry_by_name: # Match by Name
             truth_npi = truth_entry_by_name.get(TRUTH_NPI_COL)
-            if npi_check and str(npi_check).lower() != str(truth_npi).lower():
+            if npi_check and npi_check != truth_npi:
                 discrepancies.append({
                     **current_file_details,
                     "issue": "Name Match, NPI Mismatch",
@@ -221,7 +153,7 @@ def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to
                     "truth_first_name": truth_entry_by_name.get(TRUTH_FIRST_NAME_COL),
                     "truth_last_name": truth_entry_by_name.get(TRUTH_LAST_NAME_COL),
                 })
-            elif not npi_check and pd.notna(truth_npi) and str(truth_npi).strip() != "": # NPI missing in current file but exists in truth
+            elif not npi_check and not npi_invalid and truth_npi: # NPI missing in current file but exists in truth
                 discrepancies.append({
                     **current_file_details,
                     "issue": "Name Match, NPI Missing in File (Present in Truth)",
@@ -234,11 +166,52 @@ def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to
                 **current_file_details,
                 "issue": "NPI in File Not Found in Truth File",
             })
-        elif name_key_check and name_key_check != "_": # Name in file but not found in truth (and not an empty name key)
-             discrepancies.append({
-                **current_file_details,
-                "issue": "Name in File Not Found in Truth File",
-            })
+        elif name_key_check and name_key_check != EMPTY_NAME_KEY: # Name in file but not found in truth (and not an empty name key)
+            nickname_key = nickname_index.find_variant_key(first_name_check, last_name_check, create_name_key, truth_by_name_key)
+            phonetic_candidates = truth_phonetic_index.lookup(first_name_check, last_name_check) if not nickname_key else []
+            # The trigram search only runs when neither a nickname nor a phonetic match was found
+            fuzzy_candidates = truth_name_index.search(name_key_check, k=FUZZY_TOP_K, min_score=FUZZY_MIN_SCORE) if not nickname_key and not phonetic_candidates else []
+            if nickname_key:
+                # First name is a nickname of the truth first name (Mike -> Michael)
+                nickname_truth_entry = truth_by_name_key[nickname_key]
+                discrepancies.append({
+                    **current_file_details,
+                    "issue": "Name Nickname Match (First Name Variant of Truth Name)",
+                    "truth_npi": nickname_truth_entry.get(TRUTH_NPI_COL),
+                    "truth_first_name": nickname_truth_entry.get(TRUTH_FIRST_NAME_COL),
+                    "truth_last_name": nickname_truth_entry.get(TRUTH_LAST_NAME_COL),
+                })
+            elif phonetic_candidates:
+                # Same-sounding first and last name: report the closest spelling among the block
+                ranked_phonetic = sorted(
+                    ((key, jaro_winkler_similarity(name_key_check, key)) for key in phonetic_candidates),
+                    key=lambda item: item[1], reverse=True,
+                )
+                best_truth_entry = truth_by_name_key[ranked_phonetic[0][0]]
+                discrepancies.append({
+                    **current_file_details,
+                    "issue": "Name Phonetic Match (Likely Variant of Truth Name)",
+                    "truth_npi": best_truth_entry.get(TRUTH_NPI_COL),
+                    "truth_first_name": best_truth_entry.get(TRUTH_FIRST_NAME_COL),
+                    "truth_last_name": best_truth_entry.get(TRUTH_LAST_NAME_COL),
+                    "fuzzy_candidates": ranked_phonetic[:FUZZY_TOP_K],
+                })
+            elif fuzzy_candidates and fuzzy_candidates[0][1] >= FUZZY_ACCEPT_SCORE:
+                best_truth_entry = truth_by_name_key[fuzzy_candidates[0][0]]
+                discrepancies.append({
+                    **current_file_details,
+                    "issue": "Name Fuzzy Match (Likely Variant of Truth Name)",
+                    "truth_npi": best_truth_entry.get(TRUTH_NPI_COL),
+                    "truth_first_name": best_truth_entry.get(TRUTH_FIRST_NAME_COL),
+                    "truth_last_name": best_truth_entry.get(TRUTH_LAST_NAME_COL),
+                    "fuzzy_candidates": fuzzy_candidates,
+                })
+            else:
+                discrepancies.append({
+                    **current_file_details,
+                    "issue": "Name in File Not Found in Truth File",
+                    "fuzzy_candidates": fuzzy_candidates,
+                })
         # else: No NPI and no valid name in current file, or no match at all - already handled by continue or no action
 
     if discrepancies:
@@ -250,6 +223,9 @@ def analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to
             print(f"    Details in File: NPI='{d.get('npi_in_file', 'N/A')}', Name='{d.get('first_name_in_file')} {d.get('last_name_in_file')}' (Full: '{d.get('full_name_in_file', 'N/A')}')")
             if "truth_npi" in d:
                 print(f"    Details in Truth:  NPI='{d['truth_npi']}', Name='{d['truth_first_name']} {d['truth_last_name']}'")
+            if d.get("fuzzy_candidates"):
+                candidates_str = ", ".join(f"'{key}' ({score:.2f})" for key, score in d["fuzzy_candidates"])
+                print(f"    Closest Truth Names: {candidates_str}")
     else:
         print(f"No discrepancies found in {file_key} based on NPI or exact name match after normalization.")
     return discrepancies
@@ -261,12 +237,13 @@ def main():
     if load_result is None:
         return
     
-    df_truth, truth_by_npi, truth_by_name_key, truth_npi_to_name, truth_name_to_npi = load_result
+    df_truth, truth_by_npi, truth_by_name_key, truth_npi_to_name, truth_name_to_npi, truth_name_index, truth_phonetic_index = load_result
     
     all_discrepancies = []
 
-    for file_key, config in FILES_TO_CHECK.items():
-        file_discrepancies = analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to_name, truth_name_to_npi)
+    for file_key in FILES_TO_CHECK:
+        config = get_source(file_key)
+        file_discrepancies = analyze_file(file_key, config, truth_by_npi, truth_by_name_key, truth_npi_to_name, truth_name_to_npi, truth_name_index, truth_phonetic_index)
         all_discrepancies.extend(file_discrepancies)
 
     print("\\n--- Summary of Analysis ---")
@@ -289,8 +266,8 @@ def main():
     print("\\nAnalysis Complete.")
     print(f"Source of Truth: {TRUTH_FILE}")
     print("Checked Files:")
-    for f_key, f_config in FILES_TO_CHECK.items():
-        print(f"  - {f_key}: {f_config['path']}")
+    for f_key in FILES_TO_CHECK:
+        print(f"  - {f_key}: {get_source(f_key)['path']}")
 
     # You can save 'all_discrepancies' to a CSV or JSON file for easier review
     # For example:
@@ -1,3 +1,5 @@
+import bisect
+
 import pandas as pd
 
 def normalize_name_parts(df, first_col, last_col):
@@ -14,6 +16,37 @@ def normalize_name_parts(df, first_col, last_col):
     df_copy['search_key'] = (df_copy['normalized_first'] + df_copy['normalized_last']).str.replace(' ', '', regex=False)
     return df_copy
 
+def build_key_index(keys):
+    """Map each search_key to the list of row positions that carry it, in row order."""
+    positions_by_key = {}
+    for pos, key in enumerate(keys):
+        positions_by_key.setdefault(key, []).append(pos)
+    return positions_by_key
+
+def first_unmatched_position(positions, matched_flags):
+    """Return the first position in `positions` not yet matched, dropping matched ones as we go."""
+    if not positions:
+        return None
+    while positions and matched_flags[positions[0]]:
+        positions.pop(0)
+    return positions[0] if positions else None
+
+def prefix_candidate_keys(key, positions_by_key, sorted_keys):
+    """Non-empty index keys that are a prefix of `key` or have `key` as a prefix."""
+    candidates = set()
+    # Index keys that are prefixes of `key`: probe each prefix in the hash index (O(len(key))).
+    for end in range(1, len(key) + 1):
+        if key[:end] in positions_by_key:
+            candidates.add(key[:end])
+    # Index keys that start with `key`: one contiguous range in sorted order (O(log m + k)).
+    start = bisect.bisect_left(sorted_keys, key)
+    for candidate in sorted_keys[start:]:
+        if not candidate.startswith(key):
+            break
+        candidates.add(candidate)
+    candidates.discard('')
+    return candidates
+
 # File paths
 northshore_file = '05_airtable_and_mapping/03_northshore/northshore_names.csv'
 provider_file = '05_airtable_and_mapping/01_name_npi_airtable/provider_ids_for_mapping.csv'
@@ -40,35 +73,47 @@ except KeyError as e:
     print(f"ERROR: Missing expected column in one of the CSVs. {e}")
     exit()
 
+# --- Build candidate indexes over the provider list ---
+# Exact phase: hash index from search_key to provider row positions (in file order).
+# Prefix phase: the same keys kept in sorted order, so every provider key that starts
+# with a Northshore key sits in one contiguous bisect range, and every provider key that
+# is itself a prefix of a Northshore key is found by probing the hash index.
+provider_keys = provider_df['search_key'].tolist()
+provider_positions_by_key = build_key_index(provider_keys)
+sorted_provider_keys = sorted(provider_positions_by_key)
+provider_matched = [False] * len(provider_keys)
+
+ns_keys = northshore_df['search_key'].tolist()
+ns_matched_names = [None] * len(ns_keys)
+ns_match_types = [None] * len(ns_keys)
 
-# Initialize match tracking
-northshore_df['matched_to_provider_name'] = None
-northshore_df['match_type'] = None
-provider_df['matched_from_northshore'] = False
+def claim_provider(p_pos, ns_pos, match_type):
+    provider_matched[p_pos] = True
+    ns_matched_names[ns_pos] = provider_df['original_full_name_p'].iat[p_pos]
+    ns_match_types[ns_pos] = match_type
 
 # --- Phase 1: Exact Matches ---
-for ns_idx, ns_row in northshore_df.iterrows():
-    for p_idx, p_row in provider_df.iterrows():
-        if not provider_df.at[p_idx, 'matched_from_northshore']: # Only match if provider is not already matched
-            if ns_row['search_key'] == p_row['search_key']:
-                northshore_df.at[ns_idx, 'matched_to_provider_name'] = p_row['original_full_name_p']
-                northshore_df.at[ns_idx, 'match_type'] = 'Exact'
-                provider_df.at[p_idx, 'matched_from_northshore'] = True
-                break # Move to next northshore name
+for ns_pos, ns_key in enumerate(ns_keys):
+    p_pos = first_unmatched_position(provider_positions_by_key.get(ns_key), provider_matched)
+    if p_pos is not None:
+        claim_provider(p_pos, ns_pos, 'Exact')
 
 # --- Phase 2: Substring Matches for remaining unmatched Northshore names ---
-for ns_idx, ns_row in northshore_df.iterrows():
-    if pd.isna(ns_row['match_type']): # If not already matched exactly
-        for p_idx, p_row in provider_df.iterrows():
-            if not provider_df.at[p_idx, 'matched_from_northshore']: # Only match if provider is not already matched
-                ns_key = ns_row['search_key']
-                p_key = p_row['search_key']
-                if ns_key and p_key: # Ensure keys are not empty
-                    if ns_key.startswith(p_key) or p_key.startswith(ns_key):
-                        northshore_df.at[ns_idx, 'matched_to_provider_name'] = p_row['original_full_name_p']
-                        northshore_df.at[ns_idx, 'match_type'] = 'Substring'
-                        provider_df.at[p_idx, 'matched_from_northshore'] = True
-                        break # Move to next northshore name
+for ns_pos, ns_key in enumerate(ns_keys):
+    if ns_match_types[ns_pos] is None and ns_key: # If not already matched exactly
+        candidate_keys = prefix_candidate_keys(ns_key, provider_positions_by_key, sorted_provider_keys)
+        # Pick the earliest unmatched provider row among all candidate keys, as the row-by-row scan did
+        best_pos = None
+        for candidate_key in candidate_keys:
+            p_pos = first_unmatched_position(provider_positions_by_key[candidate_key], provider_matched)
+            if p_pos is not None and (best_pos is None or p_pos < best_pos):
+                best_pos = p_pos
+        if best_pos is not None:
+            claim_provider(best_pos, ns_pos, 'Substring')
+
+northshore_df['matched_to_provider_name'] = ns_matched_names
+northshore_df['match_type'] = ns_match_types
+provider_df['matched_from_northshore'] = provider_matched
 
 print("--- Name Matching Report (First/Last Name Only) ---")
 
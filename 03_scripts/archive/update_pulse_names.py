@@ -1,13 +1,26 @@
+import argparse
 import csv
 import os
+import sys
+
+# Shared helpers live one level up in 03_scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from atomic_csv import AtomicCsvWriter
+from fuzzy_matching import TrigramIndex, jaro_winkler_similarity
+from nickname_aliases import load_nickname_index
+from parallel_files import chunk_rows, default_jobs, merge_counters, run_tasks
+from source_registry import PULSE_SOURCE_KEYS, get_source
 
 # Define file paths
 consolidated_names_file = os.path.join('05_airtable_and_mapping', '02_pulse', 'pulse_consolidated_names.csv')
-pulse_bhi_file = os.path.join('00_source_data', 'pulse_data', 'pulse_bhi', 'pulse_bhi.csv')
-pulse_counseling_file = os.path.join('00_source_data', 'pulse_data', 'pulse_counseling', 'pulse_counseling.csv')
-pulse_mm_file = os.path.join('00_source_data', 'pulse_data', 'pulse_mm', 'pulse_mm.csv')
 log_file_path = os.path.join('03_scripts', 'update_pulse_names_log.txt')
 
+# Minimum Jaro-Winkler score for the fuzzy fallback to accept a corrected name
+FUZZY_ACCEPT_SCORE = 0.93
+# ...and for the file's last name against the corrected last name ('Trujilo'/'Trujillo' scores 0.975)
+LAST_NAME_ACCEPT_SCORE = 0.96
+
 # Helper function to normalize names for matching
 def normalize_name(name_str):
     if name_str is None:
@@ -28,11 +41,25 @@ def log_message(message, log_file_handle):
     print(message)
     log_file_handle.write(message + '\n')
 
-with open(log_file_path, 'w', encoding='utf-8') as log_f:
-    log_message(f"Log file created at {log_file_path}", log_f)
+def last_name_agrees(original_name, corrected_last_name):
+    """Whether the trailing words of `original_name` equal, or nearly equal, the normalized corrected last name."""
+    tokens = original_name.replace('-', ' ').split()
+    for word_count in range(1, len(tokens)):
+        file_last_name = normalize_name(''.join(tokens[-word_count:]))
+        if file_last_name == corrected_last_name or jaro_winkler_similarity(file_last_name, corrected_last_name) >= LAST_NAME_ACCEPT_SCORE:
+            return True
+    return False
 
+def load_name_lookups(log_f):
+    """
+    Read-only lookups built from the consolidated names, shared with every pool worker:
+    corrected names, known variants, per-label fuzzy indexes and the nickname dictionary.
+    Returns None if the consolidated file cannot be used.
+    """
     corrected_names_lookup = {}
     known_variants_to_correct_key_map = {}
+    fuzzy_index_by_label = {} # pulse_label -> TrigramIndex over corrected normalized names
+    corrected_last_names = {} # (normalized name, pulse_label) -> normalized last name, checked before a fuzzy rewrite
 
     try:
         with open(consolidated_names_file, 'r', newline='', encoding='utf-8') as f_consolidated:
@@ -49,16 +76,13 @@ with open(log_file_path, 'w', encoding='utf-8') as log_f:
                 # This is the key we will use for matching. It's based on the *corrected* names.
                 normalized_key_name = normalize_name(f"{first_name}{last_name}") # Concatenate first and last, then normalize
                 corrected_names_lookup[(normalized_key_name, pulse_label)] = f"{first_name} {last_name}"
+                fuzzy_index_by_label.setdefault(pulse_label, TrigramIndex()).add(normalized_key_name)
+                corrected_last_names[(normalized_key_name, pulse_label)] = normalize_name(last_name)
 
                 # Populate the known_variants_to_correct_key_map for specific issues
                 if first_name == 'Martha' and last_name == 'Trujillo' and pulse_label == 'BHI':
                     known_variants_to_correct_key_map[(normalize_name("MarthaTrujilo"), 'BHI')] = normalized_key_name
-                if first_name == 'Martin' and last_name == 'Beirne' and pulse_label == 'Counseling':
-                    known_variants_to_correct_key_map[(normalize_name("MartyBeirne"), 'Counseling')] = normalized_key_name
-                if first_name == 'Michael' and last_name == 'Geraci' and pulse_label == 'Counseling':
-                    known_variants_to_correct_key_map[(normalize_name("MikeGeraci"), 'Counseling')] = normalized_key_name
-                if first_name == 'Kathryn' and last_name == 'Ordiway' and pulse_label == 'Counseling':
-                    known_variants_to_correct_key_map[(normalize_name("KathyOrdiway"), 'Counseling')] = normalized_key_name
+                # Nicknames (Marty Beirne, Mike Geraci, Kathy Ordiway) are handled by the shared nickname dictionary
                 if first_name == 'Sarah' and last_name == 'Mulligan' and pulse_label == 'Counseling': # Correct form
                     known_variants_to_correct_key_map[(normalize_name("SarahMulliganDenman"), 'Counseling')] = normalized_key_name
                 if first_name == 'Radostina' and last_name == 'Yakimova-Marfoe' and pulse_label == 'Counseling': # Correct form
@@ -68,144 +92,237 @@ with open(log_file_path, 'w', encoding='utf-8') as log_f:
 
     except FileNotFoundError:
         log_message(f"Error: Consolidated names file not found at {consolidated_names_file}", log_f)
-        exit()
+        return None
     except Exception as e:
         log_message(f"Error reading consolidated names file: {e}", log_f)
-        exit()
+        return None
 
     if not corrected_names_lookup:
         log_message("Error: No names loaded from consolidated file. Exiting.", log_f)
-        exit()
+        return None
 
     log_message(f"Loaded {len(corrected_names_lookup)} unique name entries from {consolidated_names_file}", log_f)
 
-    files_to_process = [
-        {'path': pulse_bhi_file, 'name_col_header': 'Provider Name', 'label': 'BHI'},
-        {'path': pulse_counseling_file, 'name_col_header': 'Therapist Name', 'label': 'Counseling'},
-        {'path': pulse_mm_file, 'name_col_header': 'Provider Name', 'label': 'MM'}
-    ]
-
-    for file_info in files_to_process:
-        input_file_path = file_info['path']
-        # output_file_path = input_file_path # Overwrite the original file
-        name_col_header = file_info['name_col_header']
-        current_pulse_label = file_info['label']
-        
-        log_message(f"\nProcessing file: {input_file_path} for label: {current_pulse_label}", log_f)
-        
-        updated_rows = []
-        names_updated_count = 0
-        names_not_found_count = 0
-        not_found_names_list = [] # Added to store not found names
-        
-        if not os.path.exists(input_file_path):
-            log_message(f"  Error: File not found at {input_file_path}. Skipping.", log_f)
+    nickname_index = load_nickname_index()
+    log_message(f"Loaded nickname dictionary with {len(nickname_index)} first names.", log_f)
+
+    return {
+        'corrected_names_lookup': corrected_names_lookup,
+        'known_variants_to_correct_key_map': known_variants_to_correct_key_map,
+        'fuzzy_index_by_label': fuzzy_index_by_label,
+        'corrected_last_names': corrected_last_names,
+        'nickname_index': nickname_index,
+    }
+
+def update_name_rows(task, lookups, task_log):
+    """
+    Pool worker: replace each name in one chunk of a Pulse file with its corrected form.
+    task = (path, Pulse label, name column index, chunk start, rows); returns (rows, not-found details).
+    """
+    input_file_path, current_pulse_label, name_col_idx, start, rows = task
+    corrected_names_lookup = lookups['corrected_names_lookup']
+    known_variants_to_correct_key_map = lookups['known_variants_to_correct_key_map']
+    fuzzy_index_by_label = lookups['fuzzy_index_by_label']
+    corrected_last_names = lookups['corrected_last_names']
+    nickname_index = lookups['nickname_index']
+
+    updated_rows = []
+    not_found_names_list = [] # Added to store not found names
+    for row_idx, row in enumerate(rows, start=start):
+        if name_col_idx >= len(row):
+            # print(f"  Warning: Row {row_idx+2} in {input_file_path} is shorter than expected, name column index out of bounds. Row: {row}")
+            updated_rows.append(row)
             continue
 
-        try:
-            with open(input_file_path, 'r', newline='', encoding='utf-8') as f_in:
-                reader = csv.reader(f_in)
-                header = next(reader)
-                updated_rows.append(header)
-                
-                if name_col_header not in header:
-                    log_message(f"  Error: Name column '{name_col_header}' not found in header of {input_file_path}. Header: {header}. Skipping this file.", log_f)
-                    continue
-                name_col_idx = header.index(name_col_header)
-
-                for row_idx, row in enumerate(reader):
-                    if name_col_idx >= len(row):
-                        # print(f"  Warning: Row {row_idx+2} in {input_file_path} is shorter than expected, name column index out of bounds. Row: {row}")
-                        updated_rows.append(row)
-                        continue
-
-                    original_name_in_file = row[name_col_idx]
-                    normalized_name_from_file = normalize_name(original_name_in_file)
-                    
-                    target_corrected_name_string = None
-                    lookup_key_to_check = (normalized_name_from_file, current_pulse_label)
-
-                    # ---- START DEBUG BLOCK FOR MARTHA TRUJILO ----
-                    if original_name_in_file == "Martha Trujilo" and current_pulse_label == "BHI":
-                        log_message(f"  DEBUG: Checking for Martha Trujilo (BHI) in {os.path.basename(input_file_path)}:", log_f)
-                        log_message(f"    DEBUG:   Original raw string from CSV: '{original_name_in_file}' (len {len(original_name_in_file)})", log_f)
-                        log_message(f"    DEBUG:   Normalized from CSV: '{normalized_name_from_file}'", log_f)
-                        log_message(f"    DEBUG:   Lookup key being checked: {lookup_key_to_check}", log_f)
-                        log_message(f"    DEBUG:   Is key in corrected_names_lookup? {lookup_key_to_check in corrected_names_lookup}", log_f)
-                        
-                        # Forcing what the key from consolidated *should* be for the corrected entry
-                        martha_trujillo_corrected_consolidated_key_name = normalize_name("MarthaTrujillo") # Note: No space
-                        martha_trujillo_corrected_consolidated_tuple_key = (martha_trujillo_corrected_consolidated_key_name, "BHI")
-                        log_message(f"    DEBUG:   Expected key from consolidated for CORRECT 'Martha Trujillo': {martha_trujillo_corrected_consolidated_tuple_key}", log_f)
-                        log_message(f"    DEBUG:   Is *expected* consolidated key in lookup? {martha_trujillo_corrected_consolidated_tuple_key in corrected_names_lookup}", log_f)
-                        if martha_trujillo_corrected_consolidated_tuple_key in corrected_names_lookup:
-                            log_message(f"    DEBUG:     Value for expected key '{martha_trujillo_corrected_consolidated_tuple_key}': '{corrected_names_lookup[martha_trujillo_corrected_consolidated_tuple_key]}'", log_f)
-                        else:
-                            log_message(f"    DEBUG:     Expected key '{martha_trujillo_corrected_consolidated_tuple_key}' NOT FOUND in lookup.", log_f)
-                    # ---- END DEBUG BLOCK FOR MARTHA TRUJILO ----
-
-                    actual_key_to_use_in_lookup = None
-
-                    # Attempt 1: Direct match of normalized name from file against keys in lookup
-                    if lookup_key_to_check in corrected_names_lookup:
-                        actual_key_to_use_in_lookup = lookup_key_to_check
-                    
-                    # Attempt 2: Check against known variants map
-                    elif lookup_key_to_check in known_variants_to_correct_key_map:
-                        corrected_entry_normalized_name = known_variants_to_correct_key_map[lookup_key_to_check]
-                        actual_key_to_use_in_lookup = (corrected_entry_normalized_name, current_pulse_label)
-                        log_message(f"  INFO: Matched '{original_name_in_file}' to corrected form via known_variants_map. Using key {actual_key_to_use_in_lookup} for lookup.", log_f)
-
-                    # Attempt 3: Lenient match (if other attempts failed)
-                    # This is less likely to be needed if known_variants map is comprehensive for these cases
-                    if not actual_key_to_use_in_lookup:
-                        name_parts_from_file = original_name_in_file.replace('-', ' ').split() # Basic split
-                        if len(name_parts_from_file) >= 2:
-                            potential_first = name_parts_from_file[0]
-                            potential_last = name_parts_from_file[-1]
-                            normalized_lenient_key_from_file = normalize_name(f"{potential_first}{potential_last}")
-                            
-                            lenient_lookup_key_to_check = (normalized_lenient_key_from_file, current_pulse_label)
-                            if lenient_lookup_key_to_check in corrected_names_lookup:
-                                actual_key_to_use_in_lookup = lenient_lookup_key_to_check
-                                log_message(f"  INFO: Matched '{original_name_in_file}' via lenient match. Using key {actual_key_to_use_in_lookup} for lookup.", log_f)
-                            elif lenient_lookup_key_to_check in known_variants_to_correct_key_map: # Lenient match against variant map
-                                corrected_entry_normalized_name = known_variants_to_correct_key_map[lenient_lookup_key_to_check]
-                                actual_key_to_use_in_lookup = (corrected_entry_normalized_name, current_pulse_label)
-                                log_message(f"  INFO: Matched '{original_name_in_file}' to corrected form via lenient known_variants_map. Using key {actual_key_to_use_in_lookup} for lookup.", log_f)
-
-                    if actual_key_to_use_in_lookup and actual_key_to_use_in_lookup in corrected_names_lookup:
-                        target_corrected_name_string = corrected_names_lookup[actual_key_to_use_in_lookup]
-                        if row[name_col_idx] != target_corrected_name_string:
-                            # print(f"  Updating Name in {os.path.basename(input_file_path)}: Row {row_idx+2} '{row[name_col_idx]}' -> '{target_corrected_name_string}'")
-                            row[name_col_idx] = target_corrected_name_string
-                            names_updated_count += 1
-                        else:
-                            # Name is already correct, no action needed, not counted as "updated"
-                            pass
-                    else:
-                        # print(f"  Warning: Name '{original_name_in_file}' (normalized: {normalized_name_from_file}) in {os.path.basename(input_file_path)} not found in consolidated list for label '{current_pulse_label}'. Keeping original.")
-                        names_not_found_count +=1
-                        # Log the original and normalized name that wasn't found
-                        not_found_detail = f"Original: '{original_name_in_file}', Normalized: '{normalized_name_from_file}'"
-                        not_found_names_list.append(not_found_detail)
-                            
-                    updated_rows.append(row)
-
-            # Write the updated rows back to the same file
-            with open(input_file_path, 'w', newline='', encoding='utf-8') as f_out:
-                writer = csv.writer(f_out)
-                writer.writerows(updated_rows)
-            
+        original_name_in_file = row[name_col_idx]
+        normalized_name_from_file = normalize_name(original_name_in_file)
+
+        target_corrected_name_string = None
+        lookup_key_to_check = (normalized_name_from_file, current_pulse_label)
+
+        # ---- START DEBUG BLOCK FOR MARTHA TRUJILO ----
+        if original_name_in_file == "Martha Trujilo" and current_pulse_label == "BHI":
+            task_log.write(f"  DEBUG: Checking for Martha Trujilo (BHI) in {os.path.basename(input_file_path)}:")
+            task_log.write(f"    DEBUG:   Original raw string from CSV: '{original_name_in_file}' (len {len(original_name_in_file)})")
+            task_log.write(f"    DEBUG:   Normalized from CSV: '{normalized_name_from_file}'")
+            task_log.write(f"    DEBUG:   Lookup key being checked: {lookup_key_to_check}")
+            task_log.write(f"    DEBUG:   Is key in corrected_names_lookup? {lookup_key_to_check in corrected_names_lookup}")
+
+            # Forcing what the key from consolidated *should* be for the corrected entry
+            martha_trujillo_corrected_consolidated_key_name = normalize_name("MarthaTrujillo") # Note: No space
+            martha_trujillo_corrected_consolidated_tuple_key = (martha_trujillo_corrected_consolidated_key_name, "BHI")
+            task_log.write(f"    DEBUG:   Expected key from consolidated for CORRECT 'Martha Trujillo': {martha_trujillo_corrected_consolidated_tuple_key}")
+            task_log.write(f"    DEBUG:   Is *expected* consolidated key in lookup? {martha_trujillo_corrected_consolidated_tuple_key in corrected_names_lookup}")
+            if martha_trujillo_corrected_consolidated_tuple_key in corrected_names_lookup:
+                task_log.write(f"    DEBUG:     Value for expected key '{martha_trujillo_corrected_consolidated_tuple_key}': '{corrected_names_lookup[martha_trujillo_corrected_consolidated_tuple_key]}'")
+            else:
+                task_log.write(f"    DEBUG:     Expected key '{martha_trujillo_corrected_consolidated_tuple_key}' NOT FOUND in lookup.")
+        # ---- END DEBUG BLOCK FOR MARTHA TRUJILO ----
+
+        actual_key_to_use_in_lookup = None
+
+        # Attempt 1: Direct match of normalized name from file against keys in lookup
+        if lookup_key_to_check in corrected_names_lookup:
+            actual_key_to_use_in_lookup = lookup_key_to_check
+
+        # Attempt 2: Check against known variants map
+        elif lookup_key_to_check in known_variants_to_correct_key_map:
+            corrected_entry_normalized_name = known_variants_to_correct_key_map[lookup_key_to_check]
+            actual_key_to_use_in_lookup = (corrected_entry_normalized_name, current_pulse_label)
+            task_log.write(f"  INFO: Matched '{original_name_in_file}' to corrected form via known_variants_map. Using key {actual_key_to_use_in_lookup} for lookup.")
+
+        # Attempt 2b: Swap the first name for its nickname equivalents (Mike -> Michael, Kathy -> Kathryn)
+        else:
+            name_parts_from_file = original_name_in_file.split()
+            if len(name_parts_from_file) >= 2:
+                for variant_key in nickname_index.variant_keys(
+                    name_parts_from_file[0], ''.join(name_parts_from_file[1:]),
+                    lambda first, rest: normalize_name(f"{first}{rest}"),
+                ):
+                    if (variant_key, current_pulse_label) in corrected_names_lookup:
+                        actual_key_to_use_in_lookup = (variant_key, current_pulse_label)
+                        task_log.write(f"  INFO: Matched '{original_name_in_file}' via nickname dictionary. Using key {actual_key_to_use_in_lookup} for lookup.")
+                        break
+
+        # Attempt 3: Lenient match (if other attempts failed)
+        # This is less likely to be needed if known_variants map is comprehensive for these cases
+        if not actual_key_to_use_in_lookup:
+            name_parts_from_file = original_name_in_file.replace('-', ' ').split() # Basic split
+            if len(name_parts_from_file) >= 2:
+                potential_first = name_parts_from_file[0]
+                potential_last = name_parts_from_file[-1]
+                normalized_lenient_key_from_file = normalize_name(f"{potential_first}{potential_last}")
+
+                lenient_lookup_key_to_check = (normalized_lenient_key_from_file, current_pulse_label)
+                if lenient_lookup_key_to_check in corrected_names_lookup:
+                    actual_key_to_use_in_lookup = lenient_lookup_key_to_check
+                    task_log.write(f"  INFO: Matched '{original_name_in_file}' via lenient match. Using key {actual_key_to_use_in_lookup} for lookup.")
+                elif lenient_lookup_key_to_check in known_variants_to_correct_key_map: # Lenient match against variant map
+                    corrected_entry_normalized_name = known_variants_to_correct_key_map[lenient_lookup_key_to_check]
+                    actual_key_to_use_in_lookup = (corrected_entry_normalized_name, current_pulse_label)
+                    task_log.write(f"  INFO: Matched '{original_name_in_file}' to corrected form via lenient known_variants_map. Using key {actual_key_to_use_in_lookup} for lookup.")
+
+        # Attempt 4: Fuzzy match against corrected names with the same label (catches typos like Trujilo).
+        # Only when the last names agree (exactly or nearly): a close full name can still be a different person.
+        if not actual_key_to_use_in_lookup and current_pulse_label in fuzzy_index_by_label:
+            fuzzy_matches = fuzzy_index_by_label[current_pulse_label].search(normalized_name_from_file, k=1, min_score=FUZZY_ACCEPT_SCORE)
+            if fuzzy_matches:
+                fuzzy_key_name, fuzzy_score = fuzzy_matches[0]
+                fuzzy_key = (fuzzy_key_name, current_pulse_label)
+                if last_name_agrees(original_name_in_file, corrected_last_names[fuzzy_key]):
+                    actual_key_to_use_in_lookup = fuzzy_key
+                    task_log.count('fuzzy_rewrites')
+                    task_log.write(f"  REVIEW: Rewrote '{original_name_in_file}' to '{corrected_names_lookup[fuzzy_key]}' via fuzzy match (score {fuzzy_score:.2f}) in {os.path.basename(input_file_path)} row {row_idx+2}.")
+                else:
+                    task_log.write(f"  INFO: Fuzzy match '{original_name_in_file}' -> '{corrected_names_lookup[fuzzy_key]}' (score {fuzzy_score:.2f}) rejected: last names differ.")
+
+        if actual_key_to_use_in_lookup and actual_key_to_use_in_lookup in corrected_names_lookup:
+            target_corrected_name_string = corrected_names_lookup[actual_key_to_use_in_lookup]
+            if row[name_col_idx] != target_corrected_name_string:
+                # print(f"  Updating Name in {os.path.basename(input_file_path)}: Row {row_idx+2} '{row[name_col_idx]}' -> '{target_corrected_name_string}'")
+                row[name_col_idx] = target_corrected_name_string
+                task_log.count('updated')
+            else:
+                # Name is already correct, no action needed, not counted as "updated"
+                pass
+        else:
+            # print(f"  Warning: Name '{original_name_in_file}' (normalized: {normalized_name_from_file}) in {os.path.basename(input_file_path)} not found in consolidated list for label '{current_pulse_label}'. Keeping original.")
+            task_log.count('not_found')
+            # Log the original and normalized name that wasn't found
+            not_found_detail = f"Original: '{original_name_in_file}', Normalized: '{normalized_name_from_file}'"
+            not_found_names_list.append(not_found_detail)
+
+        updated_rows.append(row)
+    return updated_rows, not_found_names_list
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replace Pulse provider names with their corrected consolidated forms.")
+    parser.add_argument('--jobs', type=int, default=default_jobs(), help="Worker processes (default: one per core; 1 runs serially).")
+    args = parser.parse_args(argv)
+
+    with open(log_file_path, 'w', encoding='utf-8') as log_f:
+        log_message(f"Log file created at {log_file_path}", log_f)
+
+        lookups = load_name_lookups(log_f)
+        if lookups is None:
+            return
+
+        files_to_process = [get_source(key) for key in PULSE_SOURCE_KEYS]
+
+        # Read each file and queue its rows (in chunks) for the worker pool
+        files_ready = [] # (file_info, header, [task indexes], skip reason)
+        tasks = []
+        for file_info in files_to_process:
+            input_file_path = file_info['path']
+            name_col_header = file_info['full_name_col']
+            current_pulse_label = file_info['pulse_label']
+
+            if not os.path.exists(input_file_path):
+                files_ready.append((file_info, None, [], f"  Error: File not found at {input_file_path}. Skipping."))
+                continue
+
+            try:
+                with open(input_file_path, 'r', newline='', encoding='utf-8') as f_in:
+                    reader = csv.reader(f_in)
+                    header = next(reader)
+                    rows = list(reader)
+            except Exception as e:
+                files_ready.append((file_info, None, [], f"  Error processing file {input_file_path}: {e}"))
+                continue
+
+            if name_col_header not in header:
+                files_ready.append((file_info, None, [], f"  Error: Name column '{name_col_header}' not found in header of {input_file_path}. Header: {header}. Skipping this file."))
+                continue
+            name_col_idx = header.index(name_col_header)
+
+            task_indexes = []
+            for start, chunk in chunk_rows(rows):
+                task_indexes.append(len(tasks))
+                tasks.append((input_file_path, current_pulse_label, name_col_idx, start, chunk))
+            files_ready.append((file_info, header, task_indexes, None))
+
+        task_results = run_tasks(update_name_rows, tasks, shared=lookups, jobs=args.jobs)
+
+        # Merge logs, counters and rows per file, in file and chunk order
+        for file_info, header, task_indexes, skip_reason in files_ready:
+            input_file_path = file_info['path']
+            log_message(f"\nProcessing file: {input_file_path} for label: {file_info['pulse_label']}", log_f)
+            if skip_reason:
+                log_message(skip_reason, log_f)
+                continue
+
+            updated_rows = [header]
+            not_found_names_list = []
+            for task_idx in task_indexes:
+                (chunk_rows_out, chunk_not_found), task_log = task_results[task_idx]
+                for message in task_log.lines:
+                    log_message(message, log_f)
+                updated_rows.extend(chunk_rows_out)
+                not_found_names_list.extend(chunk_not_found)
+            counters = merge_counters(task_results[task_idx][1] for task_idx in task_indexes)
+            names_updated_count = counters.get('updated', 0)
+            names_not_found_count = counters.get('not_found', 0)
+            fuzzy_rewrites_count = counters.get('fuzzy_rewrites', 0)
+
+            try:
+                # Write the updated rows back to the same file (temp file + atomic swap)
+                with AtomicCsvWriter(input_file_path) as writer:
+                    writer.writerows(updated_rows)
+            except Exception as e:
+                log_message(f"  Error processing file {input_file_path}: {e}", log_f)
+                continue
+
             log_message(f"  Finished processing {input_file_path}.", log_f)
             log_message(f"  Names updated: {names_updated_count}", log_f)
             log_message(f"  Names not found/kept original: {names_not_found_count}", log_f)
+            if fuzzy_rewrites_count:
+                log_message(f"  Names rewritten via fuzzy match (REVIEW lines above): {fuzzy_rewrites_count}", log_f)
             if not_found_names_list:
                 log_message(f"    Names not found in {os.path.basename(input_file_path)} (original string and its normalized form shown):", log_f)
                 for name_detail in not_found_names_list:
                     log_message(f"      - {name_detail}", log_f)
 
-        except Exception as e:
-            log_message(f"  Error processing file {input_file_path}: {e}", log_f)
+        log_message("\nScript finished.", log_f)
 
-    log_message("\nScript finished.", log_f) 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
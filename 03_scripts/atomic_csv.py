@@ -0,0 +1,122 @@
+"""
+Crash-safe, streaming CSV rewrites.
+
+Scripts used to rewrite a file by reopening the same path with mode 'w': a crash or a full
+disk mid-write left the source file truncated. AtomicCsvWriter writes to a temp file in the
+same directory (so the final rename never crosses filesystems), fsyncs it and swaps it in with
+os.replace(): readers see either the old file or the complete new one, never a partial one.
+Rows are handed to csv.writer in bounded batches, so writing never holds more than
+`buffer_rows` rows beyond what the caller itself keeps.
+
+    with AtomicCsvWriter(path) as writer:
+        writer.writerow(header)
+        writer.writerows(rows)          # any iterable, consumed lazily
+
+rewrite_csv_in_place() builds on it for row-by-row edits of an existing file: rows stream
+from the reader through a transform into the temp file, so memory stays constant whatever
+the file size.
+"""
+import csv
+import os
+import stat
+import tempfile
+
+DEFAULT_ENCODING = 'utf-8'
+
+# Rows held before they are passed on to csv.writer
+WRITE_BUFFER_ROWS = 1000
+
+
+def _default_file_mode():
+    """Permissions a plain open(path, 'w') would give a new file (0666 less the umask)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class AtomicCsvWriter:
+    """
+    Context manager writing CSV rows to a temp file beside `path`. On a clean exit the temp
+    file replaces `path` (keeping its permissions); on an exception it is deleted and `path`
+    is left untouched.
+    """
+
+    def __init__(self, path, encoding=DEFAULT_ENCODING, buffer_rows=WRITE_BUFFER_ROWS):
+        self.path = path
+        self.encoding = encoding
+        self.buffer_rows = max(1, buffer_rows)
+        self.rows_written = 0
+        self._temp_path = None
+        self._file = None
+        self._writer = None
+        self._buffer = []
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, self._temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.", suffix='.tmp', dir=directory)
+        self._file = os.fdopen(fd, 'w', newline='', encoding=self.encoding)
+        self._writer = csv.writer(self._file)
+        return self
+
+    def writerow(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.buffer_rows:
+            self._drain()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def _drain(self):
+        self._writer.writerows(self._buffer)
+        self.rows_written += len(self._buffer)
+        self._buffer.clear()
+
+    def _replace(self):
+        try:
+            mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        except FileNotFoundError:
+            mode = _default_file_mode()
+        os.chmod(self._temp_path, mode)
+        os.replace(self._temp_path, self.path)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        # The temp file never outlives a failure, whether in the caller's block or in the
+        # final drain, flush, fsync or swap (a csv.Error from a bad row, a full disk)
+        try:
+            try:
+                if exc_type is None:
+                    self._drain()
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+            finally:
+                self._file.close()
+            if exc_type is None:
+                self._replace()
+        except BaseException:
+            os.remove(self._temp_path)
+            raise
+        if exc_type is not None:
+            os.remove(self._temp_path)
+        return False
+
+
+def rewrite_csv_in_place(path, transform_rows, encoding=DEFAULT_ENCODING, buffer_rows=WRITE_BUFFER_ROWS):
+    """
+    Stream `path` through transform_rows(header, rows) -> (new header, new rows) and atomically
+    replace it with the result. `rows` is the live csv.reader (lists of str), so a generator
+    transform keeps memory constant. Raises FileNotFoundError if `path` is missing and
+    ValueError if it is empty; the original file is untouched on any error.
+    Returns the number of data rows written.
+    """
+    with AtomicCsvWriter(path, encoding=encoding, buffer_rows=buffer_rows) as writer:
+        # The reader is closed before the writer swaps the file in (required on Windows)
+        with open(path, 'r', newline='', encoding=encoding) as f_in:
+            reader = csv.reader(f_in)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f"{path} is empty (no header row).")
+            new_header, new_rows = transform_rows(header, reader)
+            writer.writerow(new_header)
+            writer.writerows(new_rows)
+    return writer.rows_written - 1
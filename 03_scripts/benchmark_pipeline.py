@@ -0,0 +1,168 @@
+"""
+Scaling benchmark: time each pipeline stage on synthetic rosters and compare with a stored baseline.
+
+    python 03_scripts/benchmark_pipeline.py                          # default sizes, compare with the baseline
+    python 03_scripts/benchmark_pipeline.py --providers 100000 1000000 --repeat 1
+    python 03_scripts/benchmark_pipeline.py --update-baseline        # after an intended speed change
+
+For every roster size, synthetic_roster.generate_roster() writes a fresh input tree into a
+temp directory and each stage in BENCHMARK_STAGES runs there as its own process (from the
+tree's root, exactly as the scripts are run by hand), in order, so later stages read what
+earlier ones wrote. The wall time of each stage (the fastest of --repeat runs, each on a
+newly generated tree) goes to benchmark_results.json, together with the phases of the
+stage's own *_metrics.json where it writes one.
+
+A stage is a regression when it is both REGRESSION_TOLERANCE slower than in
+benchmark_baseline.json and at least MIN_REGRESSION_SECONDS slower (so interpreter start-up
+noise on small rosters is not flagged); the script then exits with status 1. Timings only
+compare on similar machines: the baseline records the Python version, platform and core
+count, and a mismatch is reported.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from script_log import ScriptLog
+from stage_metrics import metrics_path_for
+from synthetic_roster import generate_roster
+
+scripts_dir = '03_scripts'
+baseline_file = os.path.join(scripts_dir, 'benchmark_baseline.json')
+results_file = os.path.join(scripts_dir, 'benchmark_results.json')
+log_file_path = os.path.join(scripts_dir, 'benchmark_pipeline_log.txt')
+
+DEFAULT_PROVIDER_COUNTS = [1000, 10000]
+DEFAULT_SEED = 7
+REGRESSION_TOLERANCE = 0.25 # 25% slower than the baseline
+MIN_REGRESSION_SECONDS = 0.5
+
+# Stages in run order, with the stage log that locates their *_metrics.json (if they write one)
+BENCHMARK_STAGES = [
+    {'name': 'name_splitting', 'script': 'split_pulse_names.py', 'log': 'split_pulse_names_log.txt'},
+    {'name': 'consistency_analysis', 'script': os.path.join('archive', 'name_consistency_analyzer.py'), 'log': None},
+    {'name': 'truth_file_creation', 'script': os.path.join('archive', 'create_new_truth_file.py'), 'log': None},
+    {'name': 'enrichment', 'script': os.path.join('archive', 'enrich_truth_file.py'), 'log': None},
+    {'name': 'entity_resolution', 'script': 'resolve_provider_entities.py', 'log': 'resolve_provider_entities_log.txt'},
+]
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def run_stage(stage, root, timeout=None):
+    """Run one stage script with `root` as its working directory. Returns (result dict, output text)."""
+    script_path = os.path.abspath(os.path.join(scripts_dir, stage['script']))
+    started = time.perf_counter()
+    try:
+        completed = subprocess.run([sys.executable, script_path], cwd=root, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'seconds': round(time.perf_counter() - started, 3), 'status': 'timeout'}, ''
+    result = {
+        'seconds': round(time.perf_counter() - started, 3),
+        'status': 'ok' if completed.returncode == 0 else f"exit {completed.returncode}",
+    }
+    if stage['log']:
+        metrics_path = metrics_path_for(os.path.join(root, scripts_dir, stage['log']))
+        if os.path.exists(metrics_path):
+            with open(metrics_path, 'r', encoding='utf-8') as f_metrics:
+                result['phases'] = {name: phase['seconds'] for name, phase in json.load(f_metrics)['phases'].items()}
+    return result, completed.stdout + completed.stderr
+
+def benchmark_size(providers, seed, repeat, log, timeout=None):
+    """Best-of-`repeat` result per stage for one roster size (each repetition on a freshly generated tree)."""
+    best = {}
+    for repetition in range(repeat):
+        with tempfile.TemporaryDirectory(prefix=f"roster_{providers}_") as root:
+            started = time.perf_counter()
+            counts = generate_roster(root, providers, seed)
+            log.info(f"  Generated {providers} providers ({sum(counts.values())} source rows) in {time.perf_counter() - started:.2f}s.")
+            for stage in BENCHMARK_STAGES:
+                result, output = run_stage(stage, root, timeout)
+                log.info(f"    {stage['name']}: {result['seconds']:.3f}s ({result['status']})")
+                if result['status'] != 'ok':
+                    log.warning(f"    {stage['name']} output:\n{output.rstrip()}")
+                if stage['name'] not in best or result['seconds'] < best[stage['name']]['seconds']:
+                    best[stage['name']] = result
+    return best
+
+def compare_with_baseline(results, baseline, log):
+    """Log each stage against the baseline. Returns the list of (size, stage) regressions."""
+    if baseline['environment'] != results['environment']:
+        log.warning(f"  Note: baseline environment {baseline['environment']} differs from this one "
+                    f"{results['environment']}; timings may not be comparable.")
+    regressions = []
+    for size, stages in results['results'].items():
+        baseline_stages = baseline['results'].get(size)
+        if baseline_stages is None:
+            log.info(f"  {size} providers: no baseline.")
+            continue
+        for name, result in stages.items():
+            base = baseline_stages.get(name)
+            if base is None:
+                log.info(f"  {size} providers, {name}: no baseline.")
+                continue
+            change = result['seconds'] / base['seconds'] - 1 if base['seconds'] else 0.0
+            regressed = (result['seconds'] > base['seconds'] * (1 + REGRESSION_TOLERANCE)
+                         and result['seconds'] - base['seconds'] >= MIN_REGRESSION_SECONDS)
+            if result['status'] != 'ok' and base['status'] == 'ok':
+                regressed = True
+            line = f"  {size} providers, {name}: {result['seconds']:.3f}s vs {base['seconds']:.3f}s ({change:+.0%})"
+            if regressed:
+                regressions.append((size, name))
+                log.warning(line + "  REGRESSION")
+            else:
+                log.info(line)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic rosters and compare with the baseline.")
+    parser.add_argument('--providers', type=int, nargs='+', default=DEFAULT_PROVIDER_COUNTS,
+                        help=f"Roster sizes to benchmark (default: {' '.join(map(str, DEFAULT_PROVIDER_COUNTS))}).")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f"Roster seed (default: {DEFAULT_SEED}).")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per size; the fastest counts (default: 3).")
+    parser.add_argument('--timeout', type=float, default=None, help="Seconds before a stage is stopped (default: none).")
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the new baseline.")
+    args = parser.parse_args(argv)
+
+    with ScriptLog(log_file_path) as log:
+        log.info("--- Running script: benchmark_pipeline.py ---")
+        results = {'environment': environment_info(), 'seed': args.seed, 'repeat': args.repeat, 'results': {}}
+        for providers in args.providers:
+            log.info(f"\nBenchmarking {providers} providers (seed {args.seed}, best of {args.repeat}):")
+            results['results'][str(providers)] = benchmark_size(providers, args.seed, max(1, args.repeat), log, args.timeout)
+
+        with open(results_file, 'w', encoding='utf-8') as f_results:
+            json.dump(results, f_results, indent=2)
+            f_results.write('\n')
+        log.info(f"\nWrote {results_file}")
+
+        regressions = []
+        if args.update_baseline:
+            with open(baseline_file, 'w', encoding='utf-8') as f_baseline:
+                json.dump(results, f_baseline, indent=2)
+                f_baseline.write('\n')
+            log.info(f"Stored these results as the baseline in {baseline_file}")
+        elif not os.path.exists(baseline_file):
+            log.info(f"No baseline at {baseline_file}; run with --update-baseline to store one.")
+        else:
+            with open(baseline_file, 'r', encoding='utf-8') as f_baseline:
+                baseline = json.load(f_baseline)
+            if baseline.get('seed') != args.seed:
+                log.warning(f"  Note: baseline seed {baseline.get('seed')} differs from {args.seed}; rosters are not the same.")
+            log.info("\n--- Comparison with the baseline ---")
+            regressions = compare_with_baseline(results, baseline, log)
+            log.info(f"\n{len(regressions)} regression(s).")
+        log.info("\n--- Script benchmark_pipeline.py finished ---")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,14 @@
-import csv
 import os
+import sys
+
+from provider_workspace import ProviderWorkspace
+from script_log import ScriptLog
+from stage_metrics import StageMetrics
 
 # Define file paths
 northshore_names_file = os.path.join('05_airtable_and_mapping', '03_northshore', 'northshore_names.csv')
 log_file_path = os.path.join('03_scripts', 'correct_northshore_names_log.txt')
 
-def write_log(message, handle):
-    print(message)
-    handle.write(message + '\n')
-
 # Define the corrections
 # Format: (Current LastName, Current FirstName_or_None_if_any, New FirstName, New LastName_or_None_if_no_change)
 corrections_map = {
@@ -21,74 +21,76 @@ corrections_map = {
     ('Lee-Elstein', 'Alexandra'): ('Alex', 'Elstein') # Special case: change both First and Last name based on current pair
 }
 
-with open(log_file_path, 'w', encoding='utf-8') as log_f:
-    write_log("--- Running script: correct_northshore_names.py ---", log_f)
-    write_log(f"Attempting to read and correct: {northshore_names_file}", log_f)
+def run(workspace):
+    """Apply the Northshore first/last name corrections to the workspace's northshore_names table."""
+    with ScriptLog(log_file_path) as log, StageMetrics('correct_northshore_names', log_file_path) as metrics:
+        log.info("--- Running script: correct_northshore_names.py ---")
+        log.info(f"Attempting to read and correct: {northshore_names_file}")
+
+        counts = {'corrections_applied': 0}
+
+        def correct_rows(fieldnames, rows):
+            if 'First Name' not in fieldnames or 'Last Name' not in fieldnames:
+                raise ValueError(f"{northshore_names_file} is missing 'First Name' or 'Last Name' columns.")
+
+            def corrected_rows():
+                for row_num, row in enumerate(rows):
+                    row_dict = dict(zip(fieldnames, row))
+                    current_first = row_dict.get('First Name', '').strip()
+                    current_last = row_dict.get('Last Name', '').strip()
 
-    rows = []
-    fieldnames = None
-    corrections_applied_count = 0
+                    # Check for specific full name change first (Lee-Elstein to Elstein)
+                    if (current_last, current_first) == ('Lee-Elstein', 'Alexandra'):
+                        new_first, new_last = corrections_map[('Lee-Elstein', 'Alexandra')]
+                        row_dict['First Name'] = new_first
+                        row_dict['Last Name'] = new_last
+                        log.info(f"  Corrected Row {row_num+2}: ('{current_first}', '{current_last}') -> ('{new_first}', '{new_last}')")
+                        counts['corrections_applied'] += 1
+                    else:
+                        # Check for other corrections based on LastName only
+                        for (match_last, match_first_optional), (new_first, new_last_optional) in corrections_map.items():
+                            if match_first_optional is None and current_last == match_last:
+                                if row_dict['First Name'] != new_first:
+                                    row_dict['First Name'] = new_first
+                                    log.info(f"  Corrected Row {row_num+2}: First Name for '{current_last}' from '{current_first}' -> '{new_first}'")
+                                    counts['corrections_applied'] += 1
+                                # No change to last name in these cases (new_last_optional is None)
+                                break
+                    yield [row_dict.get(field, '') for field in fieldnames]
 
-    try:
-        with open(northshore_names_file, 'r', newline='', encoding='utf-8') as f_in:
-            reader = csv.DictReader(f_in)
-            fieldnames = reader.fieldnames
-            if not fieldnames or 'First Name' not in fieldnames or 'Last Name' not in fieldnames:
-                write_log(f"  Error: {northshore_names_file} is missing 'First Name' or 'Last Name' columns.", log_f)
-                exit()
-            
-            for row_num, row_dict in enumerate(reader):
-                current_first = row_dict.get('First Name', '').strip()
-                current_last = row_dict.get('Last Name', '').strip()
-                original_row_tuple = (current_first, current_last)
-                updated = False
+            return fieldnames, corrected_rows()
 
-                # Check for specific full name change first (Lee-Elstein to Elstein)
-                if (current_last, current_first) == ('Lee-Elstein', 'Alexandra'):
-                    new_first, new_last = corrections_map[('Lee-Elstein', 'Alexandra')]
-                    row_dict['First Name'] = new_first
-                    row_dict['Last Name'] = new_last
-                    write_log(f"  Corrected Row {row_num+2}: ('{current_first}', '{current_last}') -> ('{new_first}', '{new_last}')", log_f)
-                    corrections_applied_count += 1
-                    updated = True
-                else:
-                    # Check for other corrections based on LastName only
-                    for (match_last, match_first_optional), (new_first, new_last_optional) in corrections_map.items():
-                        if match_first_optional is None and current_last == match_last:
-                            if row_dict['First Name'] != new_first:
-                                row_dict['First Name'] = new_first
-                                write_log(f"  Corrected Row {row_num+2}: First Name for '{current_last}' from '{current_first}' -> '{new_first}'", log_f)
-                                corrections_applied_count += 1
-                            # No change to last name in these cases (new_last_optional is None)
-                            updated = True # Mark as processed even if first name was already correct
-                            break 
-                rows.append(row_dict)
-        write_log(f"Successfully read {len(rows)} rows from {northshore_names_file}.", log_f)
+        # Rows stream from the file through the corrections into a temp file (or through the
+        # workspace's copy if an earlier stage holds it); the file is untouched on any error
+        try:
+            with metrics.phase('match'):
+                rows_written = workspace.rewrite_table(northshore_names_file, correct_rows)
+        except FileNotFoundError:
+            log.error(f"Error: File not found at {northshore_names_file}")
+            return False
+        except ValueError as e:
+            log.error(f"  Error: {e}")
+            return False
+        except Exception as e:
+            log.error(f"Error processing {northshore_names_file}: {e}")
+            import traceback
+            log.error(traceback.format_exc())
+            return False
 
-    except FileNotFoundError:
-        write_log(f"Error: File not found at {northshore_names_file}", log_f)
-        exit()
-    except Exception as e:
-        write_log(f"Error reading {northshore_names_file}: {e}", log_f)
-        import traceback
-        write_log(traceback.format_exc(), log_f)
-        exit()
+        metrics.count('rows_in', rows_written)
+        log.info(f"Corrected {rows_written} rows of {northshore_names_file}.")
+        log.info(f"Total corrections applied: {counts['corrections_applied']}")
+        metrics.count('rows_out', rows_written)
+        metrics.count('corrections_applied', counts['corrections_applied'])
 
-    if not fieldnames or not rows:
-        write_log("No data processed or fieldnames not available. Exiting without writing.", log_f)
-        exit()
+        log.info("--- Script correct_northshore_names.py finished ---")
+        return True
 
-    # Write the updated rows back to the file
-    try:
-        with open(northshore_names_file, 'w', newline='', encoding='utf-8') as f_out:
-            writer = csv.DictWriter(f_out, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-        write_log(f"Successfully wrote {len(rows)} rows back to {northshore_names_file}", log_f)
-        write_log(f"Total corrections applied: {corrections_applied_count}", log_f)
-    except Exception as e:
-        write_log(f"Error writing to {northshore_names_file}: {e}", log_f)
-        import traceback
-        write_log(traceback.format_exc(), log_f)
+def main():
+    workspace = ProviderWorkspace()
+    if not run(workspace):
+        sys.exit(1)
+    workspace.flush(log=print)
 
-    write_log("--- Script correct_northshore_names.py finished ---", log_f) 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
-import csv
 import os
+import sys
+
+from provider_workspace import ProviderWorkspace
+from script_log import ScriptLog
+from stage_metrics import StageMetrics
 
 # Define file paths
 pulse_file = os.path.join('05_airtable_and_mapping', '02_pulse', 'pulse_consolidated_names.csv')
@@ -7,33 +11,31 @@ northshore_file = os.path.join('05_airtable_and_mapping', '03_northshore', 'nort
 output_airtable_file = os.path.join('05_airtable_and_mapping', 'working_airtable.csv')
 log_file_path = os.path.join('03_scripts', 'create_working_airtable_log.txt')
 
-def write_log(message, handle):
-    print(message)
-    handle.write(message + '\n')
-
-with open(log_file_path, 'w', encoding='utf-8') as log_f:
-    write_log("--- Running script: create_working_airtable.py ---", log_f)
+def run(workspace):
+    """Combine the workspace's Pulse and Northshore names into the working Airtable table."""
+    with ScriptLog(log_file_path) as log, StageMetrics('create_working_airtable', log_file_path) as metrics:
+        log.info("--- Running script: create_working_airtable.py ---")
 
-    all_output_rows = []
-    output_header = ["UID", "Last Name", "First Name", "Internal Label"]
-    all_output_rows.append(output_header)
+        all_output_rows = []
+        output_header = ["UID", "Last Name", "First Name", "Internal Label"]
+        all_output_rows.append(output_header)
 
-    pulse_rows_processed = 0
-    northshore_rows_processed = 0
+        pulse_rows_processed = 0
+        northshore_rows_processed = 0
 
-    # --- Step 1: Process Pulse Consolidated Names ---
-    write_log(f"Attempting to process Pulse file: {pulse_file}", log_f)
-    try:
-        with open(pulse_file, 'r', newline='', encoding='utf-8') as f_pulse:
-            reader = csv.DictReader(f_pulse)
-            if not reader.fieldnames or not all(col in reader.fieldnames for col in ['First Name', 'Last Name', 'Pulse Label']):
-                write_log(f"  Error: Pulse file {pulse_file} is missing required columns ('First Name', 'Last Name', 'Pulse Label').", log_f)
+        # --- Step 1: Process Pulse Consolidated Names ---
+        log.info(f"Attempting to process Pulse file: {pulse_file}")
+        try:
+            with metrics.phase('load'):
+                pulse_table = workspace.read_table(pulse_file)
+            if not pulse_table.header or not all(col in pulse_table.header for col in ['First Name', 'Last Name', 'Pulse Label']):
+                log.error(f"  Error: Pulse file {pulse_file} is missing required columns ('First Name', 'Last Name', 'Pulse Label').")
             else:
-                for row in reader:
+                for row in pulse_table.dicts():
                     first_name = row.get('First Name', '').strip()
                     last_name = row.get('Last Name', '').strip()
                     pulse_label = row.get('Pulse Label', '').strip() # This becomes the Internal Label
-                    
+
                     if first_name and last_name: # Only add if name is present
                         all_output_rows.append([
                             "",                # Blank UID
@@ -43,24 +45,24 @@ with open(log_file_path, 'w', encoding='utf-8') as log_f:
                         ])
                         pulse_rows_processed += 1
                     else:
-                        write_log(f"  Warning: Skipping row in Pulse file due to missing First/Last Name: {row}", log_f)
-        write_log(f"Successfully processed {pulse_rows_processed} rows from {pulse_file}.", log_f)
-    except FileNotFoundError:
-        write_log(f"  Error: Pulse file not found at {pulse_file}. Skipping this source.", log_f)
-    except Exception as e:
-        write_log(f"  Error processing Pulse file {pulse_file}: {e}", log_f)
-        import traceback
-        write_log(traceback.format_exc(), log_f)
+                        log.sample('Pulse row missing first/last name', f"  Warning: Skipping row in Pulse file due to missing First/Last Name: {row}")
+            log.info(f"Successfully processed {pulse_rows_processed} rows from {pulse_file}.")
+        except FileNotFoundError:
+            log.error(f"  Error: Pulse file not found at {pulse_file}. Skipping this source.")
+        except Exception as e:
+            log.error(f"  Error processing Pulse file {pulse_file}: {e}")
+            import traceback
+            log.error(traceback.format_exc())
 
-    # --- Step 2: Process Northshore Names ---
-    write_log(f"\nAttempting to process Northshore file: {northshore_file}", log_f)
-    try:
-        with open(northshore_file, 'r', newline='', encoding='utf-8') as f_northshore:
-            reader = csv.DictReader(f_northshore)
-            if not reader.fieldnames or not all(col in reader.fieldnames for col in ['First Name', 'Last Name', 'Internal Label']):
-                write_log(f"  Error: Northshore file {northshore_file} is missing required columns ('First Name', 'Last Name', 'Internal Label').", log_f)
+        # --- Step 2: Process Northshore Names ---
+        log.info(f"\nAttempting to process Northshore file: {northshore_file}")
+        try:
+            with metrics.phase('load'):
+                northshore_table = workspace.read_table(northshore_file)
+            if not northshore_table.header or not all(col in northshore_table.header for col in ['First Name', 'Last Name', 'Internal Label']):
+                log.error(f"  Error: Northshore file {northshore_file} is missing required columns ('First Name', 'Last Name', 'Internal Label').")
             else:
-                for row in reader:
+                for row in northshore_table.dicts():
                     first_name = row.get('First Name', '').strip()
                     last_name = row.get('Last Name', '').strip()
                     internal_label = row.get('Internal Label', '').strip()
@@ -74,35 +76,40 @@ with open(log_file_path, 'w', encoding='utf-8') as log_f:
                         ])
                         northshore_rows_processed += 1
                     else:
-                        write_log(f"  Warning: Skipping row in Northshore file due to missing First/Last Name: {row}", log_f)
-        write_log(f"Successfully processed {northshore_rows_processed} rows from {northshore_file}.", log_f)
-    except FileNotFoundError:
-        write_log(f"  Error: Northshore file not found at {northshore_file}. Skipping this source.", log_f)
-    except Exception as e:
-        write_log(f"  Error processing Northshore file {northshore_file}: {e}", log_f)
-        import traceback
-        write_log(traceback.format_exc(), log_f)
-
-    # --- Step 3: Write combined data to Working Airtable file ---
-    total_data_rows = len(all_output_rows) - 1 # Subtract header
-    if total_data_rows > 0:
-        write_log(f"\nAttempting to write {total_data_rows} combined data rows to: {output_airtable_file}", log_f)
-        try:
-            with open(output_airtable_file, 'w', newline='', encoding='utf-8') as f_out:
-                writer = csv.writer(f_out)
-                writer.writerows(all_output_rows)
-            write_log(f"Successfully wrote {total_data_rows} data rows (plus header) to {output_airtable_file}", log_f)
+                        log.sample('Northshore row missing first/last name', f"  Warning: Skipping row in Northshore file due to missing First/Last Name: {row}")
+            log.info(f"Successfully processed {northshore_rows_processed} rows from {northshore_file}.")
+        except FileNotFoundError:
+            log.error(f"  Error: Northshore file not found at {northshore_file}. Skipping this source.")
         except Exception as e:
-            write_log(f"FATAL ERROR writing to {output_airtable_file}: {e}", log_f)
+            log.error(f"  Error processing Northshore file {northshore_file}: {e}")
             import traceback
-            write_log(traceback.format_exc(), log_f)
-    else:
-        write_log("\nNo data processed from sources. Output file will not be created or will be empty (header only).", log_f)
+            log.error(traceback.format_exc())
+
+        # --- Step 3: Hand combined data to the workspace as the Working Airtable table ---
+        total_data_rows = len(all_output_rows) - 1 # Subtract header
+        if total_data_rows > 0:
+            with metrics.phase('write'):
+                workspace.write_table(output_airtable_file, all_output_rows[0], all_output_rows[1:])
+            log.info(f"\nStaged {total_data_rows} combined data rows (plus header) for {output_airtable_file}")
+        else:
+            log.info("\nNo data processed from sources. Output file will not be created or will be empty (header only).")
+
+        # --- Final Summary ---
+        log.info("\n--- Create Working Airtable Summary ---")
+        log.info(f"Rows processed from Pulse file: {pulse_rows_processed}")
+        log.info(f"Rows processed from Northshore file: {northshore_rows_processed}")
+        log.info(f"Total data rows written to {os.path.basename(output_airtable_file)}: {total_data_rows}")
+        metrics.count('rows_in', pulse_rows_processed + northshore_rows_processed)
+        metrics.count('rows_out', total_data_rows)
+
+        log.info("\n--- Script create_working_airtable.py finished ---")
+        return True
 
-    # --- Final Summary ---
-    write_log("\n--- Create Working Airtable Summary ---", log_f)
-    write_log(f"Rows processed from Pulse file: {pulse_rows_processed}", log_f)
-    write_log(f"Rows processed from Northshore file: {northshore_rows_processed}", log_f)
-    write_log(f"Total data rows written to {os.path.basename(output_airtable_file)}: {total_data_rows}", log_f)
+def main():
+    workspace = ProviderWorkspace()
+    if not run(workspace):
+        sys.exit(1)
+    workspace.flush(log=print)
 
-    write_log("\n--- Script create_working_airtable.py finished ---", log_f) 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
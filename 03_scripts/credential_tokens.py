@@ -0,0 +1,83 @@
+"""
+Every Salesforce credential named in a free-text credentials cell or provider name.
+
+The old parse_credentials() split cells on [,;/&#] and ' and ' and kept the first piece on
+the picklist, so "MD PhD" (space-separated) found nothing and "LCPC, CADC" lost CADC.
+CredentialExtractor compiles every spelling the crosswalk knows for a credential (the
+picklist values, the manual aliases such as PMHNP-BC -> PMHNP, and cached matches; see
+picklist_crosswalk.PicklistCrosswalk.aliases) into one aho_corasick.AhoCorasick automaton
+over characters and finds all of them in a single left-to-right scan of each string:
+
+    extractor = CredentialExtractor.load()
+    extractor.extract("PhD, LCPC, ATR-BC, CADC")          # ['PhD', 'LCPC', 'ATR', 'CADC']
+    extractor.extract("Jane Do, PMHNP-BC", in_name=True)   # ['PMHNP'] (not DO: 'Do' is a name)
+    extractor.extract_series(df['Credentials'])            # list per cell, one scan per distinct cell
+
+Text is scanned in the crosswalk's normalized form (case-folded, dots dropped, whitespace
+collapsed). A match only counts at word boundaries, where a boundary is anything but a
+letter, digit or '-' (so PA is not found inside PA-C, nor APN inside APN-CNP); overlapping
+matches resolve leftmost-longest. In names (in_name=True) a credential must also be written
+in capitals or exactly as on the picklist, as in name_cleaning, so surnames like "Do" survive.
+"""
+import re
+
+from aho_corasick import AhoCorasick, leftmost_longest
+from picklist_crosswalk import PicklistCrosswalk
+
+WHITESPACE_RUN = re.compile(r"\s+")
+
+
+def _scan_form(text):
+    """`text` with dots dropped and whitespace collapsed (the case is kept for in_name checks)."""
+    return WHITESPACE_RUN.sub(' ', text.replace('.', '')).strip()
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '-'
+
+
+class CredentialExtractor:
+    """Character automaton over the normalized spellings of the credentials picklist."""
+
+    def __init__(self, aliases):
+        """`aliases`: {normalized spelling: canonical credential}."""
+        self._automaton = AhoCorasick(aliases.items())
+
+    @classmethod
+    def load(cls, crosswalk=None):
+        crosswalk = crosswalk or PicklistCrosswalk.load()
+        return cls(crosswalk.aliases('credential'))
+
+    def extract(self, text, in_name=False):
+        """Distinct canonical credentials in `text`, in the order they appear ([] for blanks)."""
+        if not isinstance(text, str):
+            return []
+        cased = _scan_form(text)
+        folded = cased.lower() # lower(), not casefold(): it keeps positions aligned with `cased`
+
+        def accept(start, end, canonical):
+            if (start > 0 and _is_word_char(folded[start - 1])) or (end < len(folded) and _is_word_char(folded[end])):
+                return False # Inside a word
+            return not in_name or cased[start:end] == canonical or cased[start:end].isupper()
+
+        credentials = []
+        for _, _, canonical in leftmost_longest(self._automaton.matches(folded), accept):
+            if canonical not in credentials:
+                credentials.append(canonical)
+        return credentials
+
+    def extract_values(self, values, in_name=False):
+        """{value: [credentials]} for distinct `values`."""
+        return {value: self.extract(value, in_name) for value in values}
+
+    def extract_series(self, series, in_name=False):
+        """List of credentials per cell of a column; each distinct cell is scanned once."""
+        distinct = series.dropna().unique()
+        credentials = self.extract_values(distinct, in_name)
+        return series.map(lambda value: credentials.get(value, []) if isinstance(value, str) else [])
+
+    def extract_column(self, series, in_name=False):
+        """multi_value.MultiValueColumn of the credentials of each cell."""
+        from multi_value import MultiValueColumn
+
+        cells = MultiValueColumn.from_series(series, separators=[])
+        return cells.expand(self.extract_values(cells.vocabulary, in_name))
@@ -0,0 +1,145 @@
+"""
+Trigram-indexed fuzzy name matching.
+
+Truth names go into a character-trigram inverted index once. A query only scores the
+entries that share trigrams with it (using Jaro-Winkler), so lookups touch a small
+candidate set instead of every truth row. Typical use:
+
+    index = TrigramIndex()
+    for key in truth_keys:
+        index.add(key)
+    index.search("martha trujilo", k=3)  # -> [("martha trujillo", 0.98), ...]
+
+search() keeps the best k of a capped candidate list, so whether B is found from A depends on
+the other keys in the index. neighbors() has no top-k or cap and measures trigram overlap
+against the shorter of the two strings: a pair is returned from either side, whatever else is
+indexed (for matching that must give the same answer when only part of the data is re-run).
+"""
+import heapq
+from collections import Counter
+
+DEFAULT_TOP_K = 3
+DEFAULT_MIN_SCORE = 0.85
+# Only this many of the highest trigram-overlap candidates are scored with Jaro-Winkler
+DEFAULT_MAX_CANDIDATES = 20
+# Candidates must share at least this fraction of the query's trigrams to be scored
+DEFAULT_MIN_OVERLAP = 0.5
+
+
+def trigrams(text):
+    """Character trigrams of `text`, padded so short names and word edges still produce grams."""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def jaro_similarity(s1, s2):
+    """Jaro similarity in [0, 1]."""
+    if s1 == s2:
+        return 1.0
+    len1, len2 = len(s1), len(s2)
+    if not len1 or not len2:
+        return 0.0
+    match_window = max(max(len1, len2) // 2 - 1, 0)
+    s1_matches = [False] * len1
+    s2_matches = [False] * len2
+    matches = 0
+    for i, ch in enumerate(s1):
+        start = max(0, i - match_window)
+        end = min(i + match_window + 1, len2)
+        for j in range(start, end):
+            if not s2_matches[j] and s2[j] == ch:
+                s1_matches[i] = s2_matches[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+    transpositions = 0
+    j = 0
+    for i in range(len1):
+        if s1_matches[i]:
+            while not s2_matches[j]:
+                j += 1
+            if s1[i] != s2[j]:
+                transpositions += 1
+            j += 1
+    transpositions //= 2
+    return (matches / len1 + matches / len2 + (matches - transpositions) / matches) / 3
+
+def jaro_winkler_similarity(s1, s2, prefix_scale=0.1):
+    """Jaro-Winkler similarity in [0, 1]; rewards a shared prefix of up to 4 characters."""
+    jaro = jaro_similarity(s1, s2)
+    prefix = 0
+    for ch1, ch2 in zip(s1[:4], s2[:4]):
+        if ch1 != ch2:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_scale * (1 - jaro)
+
+
+class TrigramIndex:
+    """Inverted index from character trigram to the keys containing it."""
+
+    def __init__(self):
+        self._keys = []
+        self._values = []
+        self._gram_counts = []
+        self._postings = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, value=None):
+        """Index `key` (an already-normalized name). `value` is returned with matches (defaults to key)."""
+        entry_id = len(self._keys)
+        self._keys.append(key)
+        self._values.append(key if value is None else value)
+        grams = trigrams(key)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(entry_id)
+
+    def candidates(self, query, max_candidates=DEFAULT_MAX_CANDIDATES, min_overlap=DEFAULT_MIN_OVERLAP):
+        """Entry ids sharing the most trigrams with `query` (at least `min_overlap` of them), best overlap first."""
+        query_grams = trigrams(query)
+        shared_counts = Counter()
+        for gram in query_grams:
+            shared_counts.update(self._postings.get(gram, ()))
+        min_shared = max(1, int(len(query_grams) * min_overlap))
+        best = heapq.nlargest(max_candidates, shared_counts.items(), key=lambda item: item[1])
+        return [entry_id for entry_id, shared in best if shared >= min_shared]
+
+    def search(self, query, k=DEFAULT_TOP_K, min_score=DEFAULT_MIN_SCORE, max_candidates=DEFAULT_MAX_CANDIDATES,
+               min_overlap=DEFAULT_MIN_OVERLAP):
+        """Top-k (value, score) pairs with Jaro-Winkler score >= min_score, best first."""
+        if not query:
+            return []
+        scored = {}
+        for entry_id in self.candidates(query, max_candidates, min_overlap):
+            score = jaro_winkler_similarity(query, self._keys[entry_id])
+            if score >= min_score:
+                value = self._values[entry_id]
+                # Several entries may share a value; keep its best score
+                if score > scored.get(value, -1.0):
+                    scored[value] = score
+        return heapq.nlargest(k, scored.items(), key=lambda item: item[1])
+
+    def neighbors(self, query, min_score=DEFAULT_MIN_SCORE, min_overlap=DEFAULT_MIN_OVERLAP):
+        """
+        Every (value, score) with Jaro-Winkler score >= min_score among the entries sharing at
+        least `min_overlap` of the trigrams of the shorter of the two strings, best first.
+        """
+        if not query:
+            return []
+        query_grams = trigrams(query)
+        shared_counts = Counter()
+        for gram in query_grams:
+            shared_counts.update(self._postings.get(gram, ()))
+        scored = {}
+        for entry_id, shared in shared_counts.items():
+            if shared < max(1, int(min(len(query_grams), self._gram_counts[entry_id]) * min_overlap)):
+                continue
+            score = jaro_winkler_similarity(query, self._keys[entry_id])
+            if score >= min_score:
+                value = self._values[entry_id]
+                if score > scored.get(value, -1.0):
+                    scored[value] = score
+        return sorted(scored.items(), key=lambda item: (-item[1], item[0]))
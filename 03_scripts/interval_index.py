@@ -0,0 +1,87 @@
+"""
+Static index of closed integer intervals for stabbing and overlap queries.
+
+A centered interval tree: each node holds a center point and the intervals that contain
+it, stored twice (sorted by start, and by end descending); intervals entirely left or right
+of the center go to the node's subtrees (every node holds at least the interval its center
+came from; the depth is O(log n)). A stabbing query walks one root-to-leaf path and at each
+node stops scanning at the first interval that cannot match; an overlap query also descends
+into both sides of nodes whose center it contains, all of whose intervals are results. So
+
+    index = IntervalIndex([(12, 65, 'Aaron Huth'), (18, 120, 'Jane Doe')])
+    index.stab(14)              # ['Aaron Huth'] - values whose interval contains 14
+    index.overlapping(0, 17)    # ['Aaron Huth'] - values whose interval meets [0, 17]
+
+costs O(log n + k) for k results, instead of testing every interval.
+"""
+
+
+class _Node:
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, intervals):
+        starts_and_ends = sorted(point for lo, hi, _ in intervals for point in (lo, hi))
+        self.center = starts_and_ends[len(starts_and_ends) // 2]
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda interval: interval[0])
+        self.by_end = sorted(here, key=lambda interval: -interval[1])
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+
+class IntervalIndex:
+    """Closed intervals [lo, hi] with a value each; built once, queried many times."""
+
+    def __init__(self, intervals=()):
+        intervals = [(lo, hi, value) for lo, hi, value in intervals]
+        for lo, hi, value in intervals:
+            if lo > hi:
+                raise ValueError(f"Interval start {lo} is after its end {hi} (value {value!r}).")
+        self._size = len(intervals)
+        self._root = _Node(intervals) if intervals else None
+
+    def __len__(self):
+        return self._size
+
+    def stab(self, point):
+        """Values of the intervals containing `point`."""
+        return self.overlapping(point, point)
+
+    def overlapping(self, lo, hi):
+        """Values of the intervals that share at least one point with [lo, hi]."""
+        found = []
+        node = self._root
+        pending = [node] if node else []
+        while pending:
+            node = pending.pop()
+            if hi < node.center:
+                # Every interval here ends at or after the center, so it overlaps iff it starts by hi
+                for start, _, value in node.by_start:
+                    if start > hi:
+                        break
+                    found.append(value)
+                if node.left:
+                    pending.append(node.left)
+            elif lo > node.center:
+                # ...and starts at or before the center, so it overlaps iff it ends at or after lo
+                for _, end, value in node.by_end:
+                    if end < lo:
+                        break
+                    found.append(value)
+                if node.right:
+                    pending.append(node.right)
+            else:
+                # The query contains the center: every interval here overlaps, and both sides may
+                found.extend(value for _, _, value in node.by_start)
+                if node.left:
+                    pending.append(node.left)
+                if node.right:
+                    pending.append(node.right)
+        return found
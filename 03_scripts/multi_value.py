@@ -0,0 +1,281 @@
+"""
+Dictionary-encoded multi-valued columns.
+
+The Pulse exports store sets as ';#'-joined strings (Ages, Specialties, Availability, Do NOT
+Refer, Services Offered) and the legacy Airtable export as comma-joined ones (Ages Seen,
+Conditions Treated); source_registry declares the separator of each such column. The
+cleaning scripts used to split, trim and rejoin these cell by cell with Series.apply, and
+every membership test split the strings again. MultiValueColumn parses a column once, with
+one vectorized split + explode, and interns each distinct item in a per-column vocabulary:
+
+    ages = MultiValueColumn.from_series(df['Ages'], separators=[';#'])
+    treats_seniors = ages.contains('Seniors 65+')                 # bool array, one per row
+    ages.counts()                                                  # providers per item
+    ages.to_series()                                               # trimmed, rejoined strings
+
+Each row is then stored twice, both as NumPy arrays:
+
+    codes / offsets   the row's item codes in cell order (a CSR sparse indicator matrix:
+                      row i is codes[offsets[i]:offsets[i + 1]]), so rejoining reproduces
+                      the cleaned cell exactly, duplicates and order included
+    masks             (rows, words) uint64 bitmask of the row's item set, bit c of word
+                      c // 64 for item code c, so membership, counts and set algebra are
+                      bit operations over all rows at once
+
+Rows with no items (blank cells, or only separators/whitespace) have no codes and an empty mask.
+"""
+import re
+
+WORD_BITS = 64
+
+
+def _split_pattern(separators):
+    return '|'.join(re.escape(separator) for separator in separators)
+
+def _recode(codes, row_ids, new_items):
+    """Codes over the distinct non-empty `new_items` (new_items[c] replaces item c; ''/None drops it)."""
+    import pandas as pd
+
+    remap, vocabulary = pd.factorize(pd.Series([item if isinstance(item, str) else '' for item in new_items], dtype=object))
+    vocabulary = list(vocabulary)
+    codes = remap[codes] if len(codes) else codes
+    if '' in vocabulary:
+        empty_code = vocabulary.index('')
+        kept = codes != empty_code
+        codes, row_ids = codes[kept], row_ids[kept]
+        codes = codes - (codes > empty_code)
+        del vocabulary[empty_code]
+    return vocabulary, codes, row_ids
+
+def _transform_vocabulary(vocabulary, transform, log):
+    """transform() of each distinct item; an item whose transform raises is kept as is."""
+    transformed = []
+    for item in vocabulary:
+        try:
+            result = transform(item)
+            transformed.append(str(result) if result else '') # None/empty results drop the item
+        except Exception as e:
+            log(f"  - Warning: Error transforming item '{item}': {e}. Keeping original.")
+            transformed.append(item)
+    return transformed
+
+
+class MultiValueColumn:
+    """One multi-valued column: vocabulary, per-row item codes (CSR) and per-row bitmasks."""
+
+    def __init__(self, vocabulary, codes, offsets, index=None):
+        import numpy as np
+
+        self.vocabulary = list(vocabulary)
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.index = index
+        self._positions = {item: code for code, item in enumerate(self.vocabulary)}
+        self.masks = self._build_masks()
+
+    @classmethod
+    def from_series(cls, series, separators=(';#',), transform=None, log=print):
+        """
+        Parse a column of joined strings. Cells are split on any of `separators`, items are
+        trimmed and empty ones dropped (no separators: single-valued cells). `transform` (e.g. str.upper) runs once per distinct
+        item; items it maps to the same value are merged, and items it maps to ''/None are dropped.
+        """
+        import numpy as np
+        import pandas as pd
+
+        values = series.reset_index(drop=True)
+        present = values.notna()
+        texts = values[present].astype(str)
+        pieces = texts.str.split(_split_pattern(separators), regex=True).explode() if separators else texts
+        items = pieces.str.strip()
+        kept = (items != '').to_numpy()
+        row_ids = pieces.index.to_numpy()[kept]
+        codes, vocabulary = pd.factorize(items[kept])
+        vocabulary = list(vocabulary)
+        if transform is not None:
+            vocabulary, codes, row_ids = _recode(codes, row_ids, _transform_vocabulary(vocabulary, transform, log))
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids, minlength=len(values)), out=offsets[1:])
+        return cls(vocabulary, codes, offsets, index=series.index)
+
+    @classmethod
+    def from_masks(cls, vocabulary, masks, index=None):
+        """A column with the given item sets (rows list their items in vocabulary order)."""
+        import numpy as np
+
+        indicators = cls._unpack(masks, len(vocabulary))
+        row_ids, codes = np.nonzero(indicators)
+        offsets = np.zeros(len(masks) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids, minlength=len(masks)), out=offsets[1:])
+        return cls(vocabulary, codes, offsets, index=index)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def recode(self, mapping):
+        """
+        Column with every item replaced by mapping[item] (a dict, or a Series indexed by item),
+        looked up once per distinct item. Items mapped to the same value are merged; items that
+        are missing from `mapping` or map to ''/None are dropped.
+        """
+        import numpy as np
+
+        vocabulary, codes, row_ids = _recode(self.codes, self.row_ids, [mapping.get(item) for item in self.vocabulary])
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids, minlength=len(self)), out=offsets[1:])
+        return MultiValueColumn(vocabulary, codes, offsets, index=self.index)
+
+    def expand(self, mapping):
+        """
+        Column with every item replaced by all of mapping[item] (a list of items, in order), e.g.
+        an age range by the age buckets it overlaps. Items missing from `mapping` or mapped to an
+        empty list are dropped; an item reached through several of a row's items is kept once.
+        """
+        import numpy as np
+
+        targets = [list(mapping.get(item) or ()) for item in self.vocabulary]
+        lengths = np.array([len(target) for target in targets], dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(targets) else lengths
+        entry_lengths = lengths[self.codes] if len(self.codes) else self.codes
+        # Entry i becomes the flat targets starts[code]:starts[code] + lengths[code]
+        entry_ends = np.cumsum(entry_lengths)
+        within = np.arange(entry_ends[-1] if len(entry_ends) else 0) - np.repeat(entry_ends - entry_lengths, entry_lengths)
+        flat_codes = np.repeat(starts[self.codes] if len(self.codes) else self.codes, entry_lengths) + within
+        row_ids = np.repeat(self.row_ids, entry_lengths)
+        vocabulary, codes, row_ids = _recode(flat_codes, row_ids, [item for target in targets for item in target])
+        # Keep the first occurrence of each item in a row
+        pairs = np.stack([row_ids, codes], axis=1)
+        first = np.sort(np.unique(pairs, axis=0, return_index=True)[1]) if len(pairs) else np.zeros(0, dtype=np.int64)
+        row_ids, codes = row_ids[first], codes[first]
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids, minlength=len(self)), out=offsets[1:])
+        return MultiValueColumn(vocabulary, codes, offsets, index=self.index)
+
+    @property
+    def row_ids(self):
+        """Row position of every entry of `codes`."""
+        import numpy as np
+
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def _build_masks(self):
+        import numpy as np
+
+        words = max(1, -(-len(self.vocabulary) // WORD_BITS))
+        masks = np.zeros((len(self), words), dtype=np.uint64)
+        bits = np.left_shift(np.uint64(1), (self.codes % WORD_BITS).astype(np.uint64))
+        np.bitwise_or.at(masks, (self.row_ids, self.codes // WORD_BITS), bits)
+        return masks
+
+    @staticmethod
+    def _unpack(masks, size):
+        """Dense bool indicator matrix (rows, size) of bitmasks."""
+        import numpy as np
+
+        bits = np.unpackbits(np.ascontiguousarray(masks).view(np.uint8), axis=1, bitorder='little')
+        return bits[:, :size].astype(bool)
+
+    def indicators(self):
+        """Dense (rows, vocabulary) bool matrix: True where the row has the item."""
+        return self._unpack(self.masks, len(self.vocabulary))
+
+    def query_mask(self, items):
+        """Bitmask (one row of words) of those `items` that are in the vocabulary."""
+        import numpy as np
+
+        mask = np.zeros(self.masks.shape[1], dtype=np.uint64)
+        for item in items:
+            code = self._positions.get(item)
+            if code is not None:
+                mask[code // WORD_BITS] |= np.uint64(1) << np.uint64(code % WORD_BITS)
+        return mask
+
+    def contains(self, item):
+        """Bool array: rows that have `item`."""
+        return self.contains_any([item])
+
+    def contains_any(self, items):
+        """Bool array: rows that have at least one of `items`."""
+        return ((self.masks & self.query_mask(items)) != 0).any(axis=1)
+
+    def contains_all(self, items):
+        """Bool array: rows that have every one of `items` (none do if an item is unknown)."""
+        import numpy as np
+
+        items = list(items)
+        if any(item not in self._positions for item in items):
+            return np.zeros(len(self), dtype=bool)
+        query = self.query_mask(items)
+        return ((self.masks & query) == query).all(axis=1)
+
+    def row_sizes(self):
+        """Number of distinct items per row."""
+        return self.indicators().sum(axis=1)
+
+    def counts(self):
+        """Rows having each item (Series indexed by item, in vocabulary order)."""
+        import pandas as pd
+
+        return pd.Series(self.indicators().sum(axis=0), index=pd.Index(self.vocabulary, dtype=object), name='rows')
+
+    def aligned(self, vocabulary):
+        """Bitmasks of these rows re-encoded over `vocabulary` (items missing from it are dropped)."""
+        import numpy as np
+
+        positions = {item: code for code, item in enumerate(vocabulary)}
+        remap = np.array([positions.get(item, -1) for item in self.vocabulary], dtype=np.int64)
+        codes = remap[self.codes] if len(self.codes) else self.codes
+        kept = codes >= 0
+        words = max(1, -(-len(vocabulary) // WORD_BITS))
+        masks = np.zeros((len(self), words), dtype=np.uint64)
+        bits = np.left_shift(np.uint64(1), (codes[kept] % WORD_BITS).astype(np.uint64))
+        np.bitwise_or.at(masks, (self.row_ids[kept], codes[kept] // WORD_BITS), bits)
+        return masks
+
+    def _combine(self, other, operation):
+        if len(self) != len(other):
+            raise ValueError(f"Columns differ in length ({len(self)} vs {len(other)} rows).")
+        vocabulary = self.vocabulary + [item for item in other.vocabulary if item not in self._positions]
+        return MultiValueColumn.from_masks(vocabulary, operation(self.aligned(vocabulary), other.aligned(vocabulary)), self.index)
+
+    def union(self, other):
+        """Row-wise union with another column of the same rows."""
+        return self._combine(other, lambda a, b: a | b)
+
+    def intersection(self, other):
+        """Row-wise intersection with another column of the same rows."""
+        return self._combine(other, lambda a, b: a & b)
+
+    def difference(self, other):
+        """Row-wise items of this column not in `other`."""
+        return self._combine(other, lambda a, b: a & ~b)
+
+    def to_series(self, sep=';#', unique=False, sort=False):
+        """
+        Rows rejoined with `sep` (None where a row has no items). By default each row keeps its
+        items in cell order, duplicates included; unique=True keeps one of each, sort=True sorts them.
+        """
+        import numpy as np
+        import pandas as pd
+
+        row_ids, codes = self.row_ids, self.codes
+        if unique or sort:
+            if sort:
+                ranks = np.empty(len(self.vocabulary), dtype=np.int64)
+                ranks[sorted(range(len(self.vocabulary)), key=self.vocabulary.__getitem__)] = np.arange(len(self.vocabulary))
+                keys = ranks[codes]
+            else:
+                keys = codes
+            pairs = np.stack([row_ids, keys], axis=1)
+            if unique:
+                _, first = np.unique(pairs, axis=0, return_index=True)
+                first.sort()
+                row_ids, codes, keys = row_ids[first], codes[first], keys[first]
+            if sort:
+                order = np.lexsort((keys, row_ids))
+                row_ids, codes = row_ids[order], codes[order]
+        texts = np.array(self.vocabulary, dtype=object)[codes].tolist()
+        ends = np.cumsum(np.bincount(row_ids, minlength=len(self))).tolist()
+        starts = [0] + ends[:-1]
+        values = [sep.join(texts[start:end]) if end > start else None for start, end in zip(starts, ends)]
+        return pd.Series(values, index=self.index, dtype=object)
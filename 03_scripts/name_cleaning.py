@@ -0,0 +1,108 @@
+"""
+Shared cleaning/splitting of free-form provider name strings ("Jane Smith, LCSW (she/her) [Trial Staff]").
+
+Credentials, name suffixes, parentheticals and bracketed tags are stripped by ONE compiled
+regex built from the Salesforce credentials picklist plus the degrees/suffixes below,
+so each name is cleaned in a single scan instead of one re.sub per credential.
+"""
+import csv
+import functools
+import os
+import re
+
+SALESFORCE_CREDENTIALS_FILE = os.path.join('02_salesforce_picklist', 'salesforce_credentials.csv')
+SALESFORCE_CREDENTIALS_COL = "salesforce_credentials"
+
+# Credentials/degrees the older per-script cleaners stripped; several (PMHNP-BC, FNP-BC,
+# BCBA, QIDP, MA, MS, MPH) are not on the Salesforce picklist but do appear in names.
+NAME_CREDENTIALS = [
+    "PhD", "MD", "LCSW", "LCPC", "PsyD", "PMHNP-BC", "APN", "PA-C", "PA", "DO", "FNP-BC",
+    "DNP", "APRN", "LSW", "LPC", "CADC", "BCBA", "QIDP", "LMFT", "RN",
+    "MA", "MS", "MBA", "MEd", "MSW", "MPH",
+]
+NAME_SUFFIXES = ["Jr", "Sr", "II", "III", "IV"]
+
+
+def load_credential_list(path=SALESFORCE_CREDENTIALS_FILE):
+    """Read the Salesforce credentials picklist. Returns [] if the file is missing."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f_creds:
+        reader = csv.DictReader(f_creds)
+        return [row[SALESFORCE_CREDENTIALS_COL].strip() for row in reader if row.get(SALESFORCE_CREDENTIALS_COL, '').strip()]
+
+def build_name_noise_pattern(credentials, suffixes=NAME_SUFFIXES):
+    """
+    Compile the combined matcher for everything that is not part of the name:
+    [bracketed tags], (parentheticals), and credentials/suffixes following a comma or space.
+    """
+    # Tokens match as written or in all caps (PhD/PHD, Jr/JR) but not in other casings, so
+    # surnames such as "Do" or "Ma" survive. Longest first so PA-C wins over PA.
+    tokens = {t for t in list(credentials) + list(suffixes) if t}
+    tokens |= {t.upper() for t in tokens}
+    alternation = "|".join(re.escape(t) for t in sorted(tokens, key=lambda t: (-len(t), t)))
+    return re.compile(
+        r"\s*\[[^\]]*\]"                                   # [Trial Staff]
+        r"|\s*\([^)]*\)"                                   # (she/her), (Dr. Jim)
+        rf"|(?:\s*,\s*|\s+)(?:{alternation})\.?(?![\w-])",  # , LCSW / PhD / Jr.
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_name_noise_pattern(credentials_file=SALESFORCE_CREDENTIALS_FILE):
+    """Build (once per process) the combined pattern from the picklist plus NAME_CREDENTIALS."""
+    return build_name_noise_pattern(load_credential_list(credentials_file) + NAME_CREDENTIALS)
+
+def strip_name_noise(full_name_str, pattern=None):
+    """Remove credentials, suffixes, parentheticals and bracketed tags in one pass."""
+    if full_name_str is None or (isinstance(full_name_str, float) and full_name_str != full_name_str):
+        return ""
+    pattern = pattern or get_name_noise_pattern()
+    return pattern.sub("", str(full_name_str)).strip()
+
+def split_clean_name(name):
+    """
+    Split an already-cleaned name. With exactly one comma it is "Last, First" when the part
+    before the comma is one word or the part after it is not all caps; otherwise the part after
+    the comma is a suffix the cleaner did not know ("Jane Smith, LMHC") and is dropped.
+    Everything else splits as "First Last...".
+    """
+    parts = name.split(',')
+    if len(parts) == 2:
+        before, after = parts[0].strip(), parts[1].strip()
+        if len(before.split()) == 1 or not after.isupper():
+            return after, before
+        name = before
+    name_parts = name.split()
+    if not name_parts:
+        return "", ""
+    return name_parts[0].strip(), " ".join(name_parts[1:]).strip()
+
+def clean_and_split_full_name(full_name_str, pattern=None):
+    """Cleans a full name string and splits it into (first_name, last_name)."""
+    return split_clean_name(strip_name_noise(full_name_str, pattern))
+
+
+# --- Batch API (pandas Series in, Series out) ---
+
+def strip_name_noise_series(series, pattern=None):
+    """Vectorized strip_name_noise over a whole Series."""
+    pattern = pattern or get_name_noise_pattern()
+    return series.fillna('').astype(str).str.replace(pattern, '', regex=True).str.strip()
+
+def clean_and_split_full_name_series(series, pattern=None):
+    """Vectorized clean_and_split_full_name. Returns (first_name_series, last_name_series)."""
+    cleaned = strip_name_noise_series(series, pattern)
+
+    comma_parts = cleaned.str.split(',')
+    has_one_comma = comma_parts.str.len() == 2
+    before = comma_parts.str[0].fillna('').astype(str).str.strip()
+    after = comma_parts.str[1].fillna('').astype(str).str.strip()
+    is_last_first = has_one_comma & ((before.str.split().str.len() == 1) | ~after.str.isupper())
+    drops_suffix = has_one_comma & ~is_last_first
+    tokens = cleaned.where(~drops_suffix, before).str.split()
+
+    first = tokens.str[0].fillna('').astype(str)
+    last = tokens.str[1:].str.join(' ').fillna('').astype(str)
+    first = first.where(~is_last_first, comma_parts.str[1].fillna('').astype(str).str.strip())
+    last = last.where(~is_last_first, comma_parts.str[0].fillna('').astype(str).str.strip())
+    return first, last
@@ -0,0 +1,57 @@
+"""
+Shared name normalization used to build lookup keys in every script.
+
+All stages must key providers the same way, so this module is the single place the
+rules live: lowercase, treat hyphens/periods/commas as spaces, and collapse whitespace.
+
+Scalar helpers work on plain values (no pandas needed, so the csv-module scripts can
+use them); the *_series helpers apply the identical rules to a whole pandas Series.
+"""
+
+# Hyphens, periods and commas separate name tokens ("Yakimova-Marfoe", "Jr.", "Smith, Jane")
+NAME_PUNCTUATION_TABLE = str.maketrans({'-': ' ', '.': ' ', ',': ' '})
+NAME_KEY_SEPARATOR = '_'
+EMPTY_NAME_KEY = NAME_KEY_SEPARATOR # Key produced when both first and last name are blank
+
+
+def _is_missing(value):
+    # None or float NaN (NaN is the only value not equal to itself)
+    return value is None or (isinstance(value, float) and value != value)
+
+def normalize_name_part(name_part):
+    """Normalize a single part of a name (first or last)."""
+    if _is_missing(name_part):
+        return ""
+    return ' '.join(str(name_part).lower().translate(NAME_PUNCTUATION_TABLE).split())
+
+def normalize_full_name(full_name):
+    """Normalize a full "First Last" name string. Same rules as a single part."""
+    return normalize_name_part(full_name)
+
+def create_name_key(first_name, last_name):
+    """Create the consistent 'first_last' lookup key from first and last name."""
+    return f"{normalize_name_part(first_name)}{NAME_KEY_SEPARATOR}{normalize_name_part(last_name)}"
+
+def create_full_name_key(first_name, last_name):
+    """Create the normalized 'first last' key used for full-name lookups."""
+    return normalize_full_name(f"{'' if _is_missing(first_name) else first_name} {'' if _is_missing(last_name) else last_name}")
+
+
+# --- Batch API (pandas Series in, Series out) ---
+
+def normalize_name_series(series):
+    """Vectorized normalize_name_part over a whole Series."""
+    normalized = series.fillna('').astype(str).str.lower().str.translate(NAME_PUNCTUATION_TABLE)
+    return normalized.str.split().str.join(' ')
+
+def normalize_full_name_series(series):
+    """Vectorized normalize_full_name over a whole Series."""
+    return normalize_name_series(series)
+
+def create_name_key_series(first_series, last_series):
+    """Vectorized create_name_key over aligned first/last name Series."""
+    return normalize_name_series(first_series) + NAME_KEY_SEPARATOR + normalize_name_series(last_series)
+
+def create_full_name_key_series(first_series, last_series):
+    """Vectorized create_full_name_key over aligned first/last name Series."""
+    return normalize_name_series(first_series.fillna('').astype(str) + ' ' + last_series.fillna('').astype(str))
@@ -0,0 +1,80 @@
+"""
+Loadable first-name nickname dictionary (Jon <-> Jonathan, Mike <-> Michael, ...).
+
+The alias table is a CSV of (Canonical Name, Alias) pairs, so newly discovered nicknames are
+a data edit rather than a code change. At load time every name is expanded into its
+equivalence set (itself, its canonical forms, and their other aliases) and stored in a
+dict, so matchers get a name's variants with a single O(1) lookup.
+"""
+import csv
+import functools
+import os
+
+from name_normalization import normalize_name_part
+
+NICKNAME_ALIASES_FILE = os.path.join('05_airtable_and_mapping', '05_name_aliases', 'first_name_aliases.csv')
+COL_CANONICAL = "Canonical Name"
+COL_ALIAS = "Alias"
+
+
+class NicknameIndex:
+    """Precomputed normalized first name -> frozenset of equivalent normalized first names."""
+
+    def __init__(self, pairs=()):
+        aliases_by_canonical = {}
+        canonicals_by_alias = {}
+        for canonical, alias in pairs:
+            canonical, alias = normalize_name_part(canonical), normalize_name_part(alias)
+            if not canonical or not alias or canonical == alias:
+                continue
+            aliases_by_canonical.setdefault(canonical, set()).add(alias)
+            canonicals_by_alias.setdefault(alias, set()).add(canonical)
+
+        # Deliberately not transitive: "alex" reaches alexander and alexandra, but
+        # alexander does not reach alexandra.
+        self._variants = {}
+        for canonical, aliases in aliases_by_canonical.items():
+            self._variants[canonical] = frozenset({canonical} | aliases)
+        for alias, canonicals in canonicals_by_alias.items():
+            variants = set(self._variants.get(alias, (alias,))) # alias may itself be a canonical name
+            for canonical in canonicals:
+                variants |= self._variants[canonical]
+            self._variants[alias] = frozenset(variants)
+
+    def __len__(self):
+        return len(self._variants)
+
+    def variants(self, first_name):
+        """All equivalent normalized first names, including the name itself."""
+        name = normalize_name_part(first_name)
+        if not name:
+            return frozenset()
+        return self._variants.get(name, frozenset((name,)))
+
+    def variant_keys(self, first_name, last_name, key_func):
+        """Lookup keys key_func(variant, last_name) for every other equivalent first name (sorted)."""
+        own_name = normalize_name_part(first_name)
+        for variant in sorted(self.variants(first_name)):
+            if variant != own_name:
+                yield key_func(variant, last_name)
+
+    def find_variant_key(self, first_name, last_name, key_func, lookup):
+        """First nickname-variant key present in `lookup` (any dict/set), or None."""
+        return next((key for key in self.variant_keys(first_name, last_name, key_func) if key in lookup), None)
+
+    def are_equivalent(self, first_name_a, first_name_b):
+        """True if the two first names are the same name or nickname-equivalent."""
+        return normalize_name_part(first_name_b) in self.variants(first_name_a)
+
+
+def load_nickname_pairs(path=NICKNAME_ALIASES_FILE):
+    """Read (canonical, alias) pairs from the alias CSV. Returns [] if the file is missing."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f_aliases:
+        return [(row.get(COL_CANONICAL, ''), row.get(COL_ALIAS, '')) for row in csv.DictReader(f_aliases)]
+
+@functools.lru_cache(maxsize=None)
+def load_nickname_index(path=NICKNAME_ALIASES_FILE):
+    """Build (once per process) the NicknameIndex for the alias CSV."""
+    return NicknameIndex(load_nickname_pairs(path))
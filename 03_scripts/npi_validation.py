@@ -0,0 +1,125 @@
+"""
+Shared NPI canonicalization and check-digit validation.
+
+An NPI is 10 digits whose last digit is a Luhn check digit computed over the number
+prefixed with the card issuer code 80840. Every source stores NPIs differently (strings,
+floats read back as "1356808414.0", stray whitespace), so all stages canonicalize through
+this module and only valid NPIs are used as join keys. Valid NPIs also fit in an int64, so
+NPI-keyed dicts use integer-packed keys (npi_key) instead of strings.
+
+Scalar helpers work on plain values (no pandas/NumPy needed); the *_series helpers
+validate a whole pandas Series in one vectorized NumPy pass.
+"""
+import re
+
+NPI_LENGTH = 10
+# Luhn sum contributed by the 80840 prefix: 8 + 0 + 8 + (4 doubled) + 0
+NPI_PREFIX_LUHN_SUM = 24
+NPI_FLOAT_SUFFIX = re.compile(r"\.0+$")
+INVALID_NPI_KEY = 0 # No valid NPI packs to 0 (the first digit of an NPI is 1 or 2)
+
+
+def _is_missing(value):
+    # None or float NaN (NaN is the only value not equal to itself)
+    return value is None or (isinstance(value, float) and value != value)
+
+def canonicalize_npi(value):
+    """
+    Canonical 10-digit string for an NPI given as str/int/float, or '' when it is blank or
+    not 10 digits. The check digit is not verified here (see is_valid_npi).
+    """
+    if _is_missing(value):
+        return ''
+    if isinstance(value, float):
+        value = int(value) if value.is_integer() else value
+    npi = NPI_FLOAT_SUFFIX.sub('', str(value).strip())
+    return npi if len(npi) == NPI_LENGTH and npi.isdigit() else ''
+
+def npi_check_digit_ok(npi):
+    """Luhn check (with the 80840 prefix) on an already-canonical 10-digit string."""
+    total = NPI_PREFIX_LUHN_SUM
+    for position, ch in enumerate(npi[:-1]):
+        digit = ord(ch) - 48
+        if position % 2 == 0: # Doubled: every other digit counting left from the check digit
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return (total + ord(npi[-1]) - 48) % 10 == 0
+
+def npi_check_digit(prefix):
+    """Check digit that completes a 9-digit NPI prefix (e.g. for generated test NPIs)."""
+    if len(prefix) != NPI_LENGTH - 1 or not prefix.isdigit():
+        raise ValueError(f"Not a 9-digit NPI prefix: {prefix!r}")
+    total = NPI_PREFIX_LUHN_SUM
+    for position, ch in enumerate(prefix):
+        digit = ord(ch) - 48
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return str(-total % 10)
+
+def is_valid_npi(value):
+    """True if `value` canonicalizes to 10 digits with a correct check digit."""
+    npi = canonicalize_npi(value)
+    return bool(npi) and npi_check_digit_ok(npi)
+
+def valid_npi(value):
+    """Canonical NPI string if valid, else ''."""
+    npi = canonicalize_npi(value)
+    return npi if npi and npi_check_digit_ok(npi) else ''
+
+def npi_key(value):
+    """Integer-packed key of a valid NPI, or None (use as the key of NPI-indexed dicts)."""
+    npi = valid_npi(value)
+    return int(npi) if npi else None
+
+
+# --- Batch API (pandas Series in, Series out; NumPy does the check-digit math) ---
+
+def canonicalize_npi_series(series):
+    """Vectorized canonicalize_npi: 10-digit strings, '' for blank or malformed values."""
+    npi = series.astype(object).where(series.notna(), '').astype(str).str.strip()
+    npi = npi.str.replace(NPI_FLOAT_SUFFIX, '', regex=True)
+    return npi.where(npi.str.fullmatch(r"\d{%d}" % NPI_LENGTH), '')
+
+def npi_check_digits_ok(canonical_series):
+    """Boolean NumPy array: Luhn check over every canonical NPI at once ('' -> False)."""
+    import numpy as np
+
+    values = canonical_series.to_numpy(dtype=str)
+    ok = np.zeros(len(values), dtype=bool)
+    has_npi = np.char.str_len(values) == NPI_LENGTH
+    if not has_npi.any():
+        return ok
+    # One row of 10 digit values per NPI, straight from the ASCII bytes
+    raw = ''.join(values[has_npi]).encode('ascii')
+    digits = (np.frombuffer(raw, dtype=np.uint8).reshape(-1, NPI_LENGTH) - ord('0')).astype(np.int64)
+    doubled = digits[:, 0:NPI_LENGTH - 1:2] * 2
+    doubled -= 9 * (doubled > 9)
+    totals = NPI_PREFIX_LUHN_SUM + doubled.sum(axis=1) + digits[:, 1:NPI_LENGTH - 1:2].sum(axis=1) + digits[:, -1]
+    ok[has_npi] = totals % 10 == 0
+    return ok
+
+def validate_npi_series(series):
+    """
+    Canonicalize and check a whole NPI column.
+    Returns (canonical_series, is_valid_series); canonical values that fail are kept so they can be reported.
+    """
+    import pandas as pd
+
+    canonical = canonicalize_npi_series(series)
+    is_valid = pd.Series(npi_check_digits_ok(canonical), index=series.index)
+    return canonical, is_valid
+
+def valid_npi_series(series):
+    """Vectorized valid_npi: canonical string where the NPI is valid, '' elsewhere."""
+    canonical, is_valid = validate_npi_series(series)
+    return canonical.where(is_valid, '')
+
+def npi_key_series(series):
+    """Integer-packed NPI keys (int64 Series), INVALID_NPI_KEY where blank, malformed or failing the check digit."""
+    canonical, is_valid = validate_npi_series(series)
+    return canonical.where(is_valid, str(INVALID_NPI_KEY)).astype('int64')
@@ -0,0 +1,259 @@
+"""
+Offline NPI lookup against a locally downloaded NPPES dissemination file.
+
+The NPPES CSV is several GB, so it is never loaded into pandas. `build_nppes_index` streams
+it once, keeps active individual providers (entity type 1), and writes a compact index
+directory of NumPy arrays:
+
+    records.npy    fixed-width records (NPI, state, last, first, credential) sorted by NPI
+    name_keys.npy  fixed-width "STATE + last name + first name" keys, sorted
+    name_rows.npy  for each sorted name key, its row in records.npy
+    meta.json      source file, row count and format version
+
+`NppesIndex` memory-maps those arrays, so opening the index is instant, only the pages a
+lookup touches are read, and a batch of lookups is a single vectorized binary search
+(np.searchsorted). Build the index with:
+
+    python 03_scripts/nppes_index.py path/to/npidata_pfile.csv
+"""
+import argparse
+import csv
+import json
+import os
+import unicodedata
+
+from name_normalization import normalize_name_part
+from npi_validation import INVALID_NPI_KEY, npi_key
+
+NPPES_INDEX_DIR = os.path.join('00_source_data', 'nppes_index')
+INDEX_FORMAT_VERSION = 1
+
+# NPPES dissemination file columns
+NPPES_NPI_COL = "NPI"
+NPPES_ENTITY_TYPE_COL = "Entity Type Code"
+NPPES_LAST_COL = "Provider Last Name (Legal Name)"
+NPPES_FIRST_COL = "Provider First Name"
+NPPES_CREDENTIAL_COL = "Provider Credential Text"
+NPPES_STATE_COL = "Provider Business Practice Location Address State Name"
+NPPES_DEACTIVATION_COL = "NPI Deactivation Date"
+NPPES_REACTIVATION_COL = "NPI Reactivation Date"
+NPPES_INDIVIDUAL_ENTITY_TYPE = "1"
+
+# Field widths follow the NPPES column limits; names are stored normalized (see name_bytes)
+STATE_WIDTH = 2
+LAST_NAME_WIDTH = 35
+FIRST_NAME_WIDTH = 20
+CREDENTIAL_WIDTH = 20
+NAME_KEY_WIDTH = STATE_WIDTH + LAST_NAME_WIDTH + FIRST_NAME_WIDTH
+NAME_KEY_PAD = b' ' # Sorts below every letter, so "smith" precedes "smithe"
+
+IMPORT_CHUNK_ROWS = 200_000 # Rows converted to a NumPy chunk at a time while streaming
+
+
+def _record_dtype():
+    import numpy as np
+
+    return np.dtype([
+        ('npi', '<i8'),
+        ('state', f'S{STATE_WIDTH}'),
+        ('last', f'S{LAST_NAME_WIDTH}'),
+        ('first', f'S{FIRST_NAME_WIDTH}'),
+        ('credential', f'S{CREDENTIAL_WIDTH}'),
+    ])
+
+def name_bytes(name, width):
+    """Normalized name as ASCII bytes, accents folded, truncated to the field width."""
+    ascii_name = unicodedata.normalize('NFKD', normalize_name_part(name)).encode('ascii', 'ignore')
+    return ascii_name[:width]
+
+def state_bytes(state):
+    return str(state or '').strip().upper().encode('ascii', 'ignore')[:STATE_WIDTH]
+
+def name_key_prefix(state, last_name):
+    """Fixed-width key prefix for every provider with this state and last name."""
+    return state_bytes(state).ljust(STATE_WIDTH, NAME_KEY_PAD) + name_bytes(last_name, LAST_NAME_WIDTH).ljust(LAST_NAME_WIDTH, NAME_KEY_PAD)
+
+def name_key(state, last_name, first_name):
+    """Fixed-width sortable key "STATE + last + first" (same layout as name_keys.npy)."""
+    return name_key_prefix(state, last_name) + name_bytes(first_name, FIRST_NAME_WIDTH)
+
+def _is_active_individual(row, col):
+    if row[col[NPPES_ENTITY_TYPE_COL]] != NPPES_INDIVIDUAL_ENTITY_TYPE:
+        return False
+    # Deactivated NPIs stay in the file; skip them unless they were reactivated
+    return not row[col[NPPES_DEACTIVATION_COL]] or bool(row[col[NPPES_REACTIVATION_COL]])
+
+def _iter_record_chunks(nppes_csv_path, dtype):
+    """Stream the NPPES CSV and yield NumPy record arrays of up to IMPORT_CHUNK_ROWS rows."""
+    import numpy as np
+
+    with open(nppes_csv_path, 'r', newline='', encoding='utf-8', errors='replace') as f_in:
+        reader = csv.reader(f_in)
+        header = next(reader)
+        col = {name: header.index(name) for name in (
+            NPPES_NPI_COL, NPPES_ENTITY_TYPE_COL, NPPES_LAST_COL, NPPES_FIRST_COL,
+            NPPES_CREDENTIAL_COL, NPPES_STATE_COL, NPPES_DEACTIVATION_COL, NPPES_REACTIVATION_COL,
+        )}
+        rows = []
+        for row in reader:
+            if len(row) < len(header) or not _is_active_individual(row, col):
+                continue
+            npi = npi_key(row[col[NPPES_NPI_COL]])
+            if npi is None:
+                continue
+            rows.append((
+                npi,
+                state_bytes(row[col[NPPES_STATE_COL]]),
+                name_bytes(row[col[NPPES_LAST_COL]], LAST_NAME_WIDTH),
+                name_bytes(row[col[NPPES_FIRST_COL]], FIRST_NAME_WIDTH),
+                row[col[NPPES_CREDENTIAL_COL]].strip().encode('ascii', 'ignore')[:CREDENTIAL_WIDTH],
+            ))
+            if len(rows) == IMPORT_CHUNK_ROWS:
+                yield np.array(rows, dtype=dtype)
+                rows = []
+        if rows:
+            yield np.array(rows, dtype=dtype)
+
+def build_nppes_index(nppes_csv_path, index_dir=NPPES_INDEX_DIR):
+    """
+    Stream `nppes_csv_path` into the index directory. Unsorted records are spilled to a temp
+    file chunk by chunk, then sorted through memory-mapped arrays. Returns the record count.
+    """
+    import numpy as np
+
+    dtype = _record_dtype()
+    os.makedirs(index_dir, exist_ok=True)
+    spill_path = os.path.join(index_dir, 'records.unsorted.tmp')
+    record_count = 0
+    with open(spill_path, 'wb') as f_spill:
+        for chunk in _iter_record_chunks(nppes_csv_path, dtype):
+            chunk.tofile(f_spill)
+            record_count += len(chunk)
+
+    if record_count:
+        unsorted = np.memmap(spill_path, dtype=dtype, mode='r', shape=(record_count,))
+        npi_order = np.argsort(unsorted['npi'], kind='stable')
+        records = np.lib.format.open_memmap(os.path.join(index_dir, 'records.npy'), mode='w+', dtype=dtype, shape=(record_count,))
+        name_keys = np.lib.format.open_memmap(os.path.join(index_dir, 'name_keys.npy'), mode='w+',
+                                              dtype=f'S{NAME_KEY_WIDTH}', shape=(record_count,))
+        for start in range(0, record_count, IMPORT_CHUNK_ROWS):
+            chunk = unsorted[npi_order[start:start + IMPORT_CHUNK_ROWS]]
+            records[start:start + len(chunk)] = chunk
+            name_keys[start:start + len(chunk)] = [
+                state.ljust(STATE_WIDTH, NAME_KEY_PAD) + last.ljust(LAST_NAME_WIDTH, NAME_KEY_PAD) + first
+                for state, last, first in zip(chunk['state'], chunk['last'], chunk['first'])
+            ]
+        del unsorted, npi_order
+        name_order = np.argsort(name_keys, kind='stable')
+        sorted_name_keys = name_keys[name_order]
+        name_keys[:] = sorted_name_keys
+        name_keys.flush()
+        records.flush()
+        np.save(os.path.join(index_dir, 'name_rows.npy'), name_order.astype(np.int64))
+        del records, name_keys, sorted_name_keys
+    else:
+        np.save(os.path.join(index_dir, 'records.npy'), np.zeros(0, dtype=dtype))
+        np.save(os.path.join(index_dir, 'name_keys.npy'), np.zeros(0, dtype=f'S{NAME_KEY_WIDTH}'))
+        np.save(os.path.join(index_dir, 'name_rows.npy'), np.zeros(0, dtype=np.int64))
+    os.remove(spill_path)
+
+    with open(os.path.join(index_dir, 'meta.json'), 'w', encoding='utf-8') as f_meta:
+        json.dump({'version': INDEX_FORMAT_VERSION, 'source': os.path.abspath(nppes_csv_path),
+                   'records': record_count}, f_meta, indent=2)
+    return record_count
+
+
+def _record_to_dict(record):
+    return {
+        'npi': str(int(record['npi'])),
+        'state': record['state'].decode('ascii'),
+        'last': record['last'].decode('ascii'),
+        'first': record['first'].decode('ascii'),
+        'credential': record['credential'].decode('ascii'),
+    }
+
+
+class NppesIndex:
+    """Read-only, memory-mapped view of an index directory written by build_nppes_index."""
+
+    def __init__(self, index_dir=NPPES_INDEX_DIR):
+        import numpy as np
+
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f_meta:
+            meta = json.load(f_meta)
+        if meta.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"NPPES index at {index_dir} has format {meta.get('version')}, expected {INDEX_FORMAT_VERSION}. Rebuild it.")
+        self.records = np.load(os.path.join(index_dir, 'records.npy'), mmap_mode='r')
+        self.name_keys = np.load(os.path.join(index_dir, 'name_keys.npy'), mmap_mode='r')
+        self.name_rows = np.load(os.path.join(index_dir, 'name_rows.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.records)
+
+    def lookup_npi(self, npi):
+        """Record dict for a (valid) NPI, or None if it is not in the index."""
+        rows = self.npi_rows([npi])
+        return _record_to_dict(self.records[rows[0]]) if rows[0] >= 0 else None
+
+    def npi_rows(self, npis):
+        """Vectorized: record row for each NPI (any form canonicalize_npi accepts), -1 when absent."""
+        import numpy as np
+
+        keys = np.array([npi_key(npi) or INVALID_NPI_KEY for npi in npis], dtype=np.int64)
+        npi_column = self.records['npi']
+        positions = np.searchsorted(npi_column, keys)
+        in_range = positions < len(npi_column)
+        found = np.zeros(len(keys), dtype=bool)
+        found[in_range] = npi_column[positions[in_range]] == keys[in_range]
+        return np.where(found, positions, -1)
+
+    def _name_ranges(self, low_keys, high_keys):
+        import numpy as np
+
+        low = np.searchsorted(self.name_keys, np.array(low_keys, dtype=f'S{NAME_KEY_WIDTH}'), side='left')
+        high = np.searchsorted(self.name_keys, np.array(high_keys, dtype=f'S{NAME_KEY_WIDTH}'), side='right')
+        return low, high
+
+    def lookup_names(self, states, last_names, first_names):
+        """
+        Vectorized exact lookup: for each (state, last, first) the list of matching record
+        dicts (usually zero or one). Pass first_name=None to get everyone with that state and last name.
+        """
+        low_keys, high_keys = [], []
+        for state, last_name, first_name in zip(states, last_names, first_names):
+            if first_name is None:
+                prefix = name_key_prefix(state, last_name)
+                low_keys.append(prefix)
+                high_keys.append(prefix + b'\xff' * FIRST_NAME_WIDTH)
+            else:
+                key = name_key(state, last_name, first_name)
+                low_keys.append(key)
+                high_keys.append(key)
+        if not low_keys:
+            return []
+        low, high = self._name_ranges(low_keys, high_keys)
+        return [
+            [_record_to_dict(self.records[row]) for row in self.name_rows[start:end]]
+            for start, end in zip(low, high)
+        ]
+
+    def lookup_name(self, state, last_name, first_name=None):
+        """Records for one (state, last, first); see lookup_names."""
+        return self.lookup_names([state], [last_name], [first_name])[0]
+
+
+def load_nppes_index(index_dir=NPPES_INDEX_DIR):
+    """NppesIndex for `index_dir`, or None if no index has been built there."""
+    if not os.path.exists(os.path.join(index_dir, 'meta.json')):
+        return None
+    return NppesIndex(index_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline NPPES lookup index from a dissemination CSV.")
+    parser.add_argument('nppes_csv', help="Path to the NPPES npidata_pfile CSV")
+    parser.add_argument('--out', default=NPPES_INDEX_DIR, help=f"Index directory (default: {NPPES_INDEX_DIR})")
+    args = parser.parse_args()
+    print(f"Building NPPES index from {args.nppes_csv} into {args.out} ...")
+    count = build_nppes_index(args.nppes_csv, args.out)
+    print(f"Indexed {count} active individual providers.")
@@ -0,0 +1,147 @@
+"""
+Process-pool fan-out for work that is independent per source file (or per chunk of rows).
+
+The Pulse scripts handle BHI, Counseling and MM one after another although nothing links the
+files except a read-only lookup built up front. run_tasks() hands each task to a
+ProcessPoolExecutor worker instead:
+
+    results = run_tasks(split_rows_task, tasks, shared=name_split_lookup, jobs=4)
+    for result, task_log in results:      # always in task order
+        ...
+
+- The read-only lookup (`shared`) is installed once per worker process by the pool
+  initializer (inherited copy-on-write under fork, pickled once per worker under spawn), not
+  sent with every task.
+- A worker is a module-level function worker(task, shared, task_log). It does not write to
+  the log file itself: it appends lines (task_log.write / task_log.sample) and counters to its
+  TaskLog, and the parent merges them in task order (TaskLog.replay into a ScriptLog), so
+  logs and totals are identical whatever the number of processes.
+- jobs=1 (or a single task) runs everything in this process with the same semantics.
+- iter_task_results() is the streaming form for a file rewritten row by row: it pulls
+  `jobs` tasks at a time from a lazy iterable (e.g. iter_chunks over a csv.reader) and yields
+  their results in order, so only one batch of chunks is held at once.
+
+Scripts that use this must keep their top-level code under `if __name__ == "__main__":` so
+spawned workers can import them.
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Rows per task when a large file is split into chunks
+DEFAULT_CHUNK_ROWS = 50000
+
+_shared = None # The read-only lookup of the current process (set by _install_shared)
+
+
+class TaskLog:
+    """Log lines and named counters collected by one task, merged by the parent in task order."""
+
+    def __init__(self):
+        self.entries = [] # (sample category or None, message)
+        self.counters = {}
+
+    @property
+    def lines(self):
+        return [message for _, message in self.entries]
+
+    def write(self, message):
+        self.entries.append((None, message))
+
+    def sample(self, category, message):
+        """A line of a repeated warning class; replayed through ScriptLog.sample() by the parent."""
+        self.entries.append((category, message))
+
+    def replay(self, log):
+        """Write the collected lines to a ScriptLog, in order (sampled ones only up to its example limit)."""
+        for category, message in self.entries:
+            if category is None:
+                log.info(message)
+            else:
+                log.sample(category, message)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+
+def default_jobs():
+    """One worker per available core."""
+    return os.cpu_count() or 1
+
+
+def chunk_rows(rows, chunk_size=DEFAULT_CHUNK_ROWS):
+    """Split `rows` into [(start offset, rows slice)]; an empty list gives one empty chunk."""
+    if not rows:
+        return [(0, [])]
+    return [(start, rows[start:start + chunk_size]) for start in range(0, len(rows), chunk_size)]
+
+
+def iter_chunks(rows, chunk_size=DEFAULT_CHUNK_ROWS):
+    """chunk_rows for any iterable (e.g. a streaming csv.reader): (start offset, rows list) pairs, read lazily."""
+    rows = iter(rows)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def merge_counters(task_logs):
+    """Sum the counters of several TaskLogs (e.g. every chunk of one file)."""
+    totals = {}
+    for task_log in task_logs:
+        for name, amount in task_log.counters.items():
+            totals[name] = totals.get(name, 0) + amount
+    return totals
+
+
+def _install_shared(shared):
+    global _shared
+    _shared = shared
+
+
+def _run_task(worker, task):
+    task_log = TaskLog()
+    return worker(task, _shared, task_log), task_log
+
+
+def run_tasks(worker, tasks, shared=None, jobs=None):
+    """
+    Run worker(task, shared, task_log) for every task and return [(result, TaskLog)] in task
+    order. `jobs` caps the worker processes (default: one per core); with jobs=1 or a single
+    task no pool is started.
+    """
+    tasks = list(tasks)
+    jobs = min(jobs or default_jobs(), len(tasks))
+    if jobs <= 1:
+        _install_shared(shared)
+        try:
+            return [_run_task(worker, task) for task in tasks]
+        finally:
+            _install_shared(None)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_install_shared, initargs=(shared,)) as pool:
+        return list(pool.map(_run_task, [worker] * len(tasks), tasks))
+
+
+def iter_task_results(worker, tasks, shared=None, jobs=None):
+    """
+    run_tasks over a lazy iterable of tasks: takes `jobs` tasks at a time and yields their
+    (result, TaskLog) pairs in task order, so only one batch of tasks and results is held.
+    """
+    tasks = iter(tasks)
+    jobs = jobs or default_jobs()
+    batch = list(itertools.islice(tasks, max(jobs, 1)))
+    if jobs <= 1 or len(batch) <= 1:
+        _install_shared(shared)
+        try:
+            for task in itertools.chain(batch, tasks):
+                yield _run_task(worker, task)
+        finally:
+            _install_shared(None)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_install_shared, initargs=(shared,)) as pool:
+        while batch:
+            yield from pool.map(_run_task, [worker] * len(batch), batch)
+            batch = list(itertools.islice(tasks, jobs))
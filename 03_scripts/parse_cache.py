@@ -0,0 +1,183 @@
+"""
+Columnar parse cache for the source CSVs, keyed by path and file content hash.
+
+Every pandas script paid the full read_csv cost on start-up - worst for the legacy Airtable
+export (57 columns, multi-paragraph bios), which several scripts re-read only for a handful
+of columns. read_csv_cached() is a drop-in for pd.read_csv:
+
+    df_legacy = read_csv_cached(LEGACY_AIRTABLE_FILE, dtype={LEGACY_NPI: str},
+                                usecols=[LEGACY_FIRST, LEGACY_LAST, LEGACY_NPI, LEGACY_WEB])
+
+The first read parses the whole file with pd.read_csv (all columns, the given options) and
+writes a typed columnar snapshot under PARSE_CACHE_DIR; later reads of the same file bytes
+with the same options memory-map only the requested columns from it. Layout, one
+directory per source path and one snapshot per (content hash, read options):
+
+    <cache>/<file name>-<path hash>/source.json          size, mtime and content hash of the source
+    <cache>/<file name>-<path hash>/<content>-<options>/
+        meta.json                                         columns, dtypes, row count, format version
+        00003.values.npy                                  numeric/bool column: the NumPy array
+        00004.data.npy, 00004.offsets.npy, 00004.nulls.npy
+                                                          text column: UTF-8 bytes of all cells,
+                                                          character offsets and the missing mask
+
+(the offsets + data layout of Arrow string columns; pyarrow is not a dependency here, so the
+arrays are plain .npy files like the NPPES index). The content hash is only recomputed when
+the source's size or mtime changed. Frames with other dtypes or a non-default index are
+returned uncached. Delete the cache directory at any time; it is rebuilt on demand.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from row_state import file_content_hash, row_content_hash
+
+PARSE_CACHE_DIR = os.path.join('00_source_data', 'parse_cache')
+CACHE_FORMAT_VERSION = 1
+
+# Column dtypes stored as a single NumPy array; str/object columns use data + offsets + nulls
+NUMERIC_DTYPES = {'int64', 'float64', 'bool'}
+TEXT_DTYPES = {'str', 'object'}
+
+
+def _path_dir(path, cache_dir):
+    path_hash = hashlib.sha1(os.path.normcase(os.path.abspath(path)).encode('utf-8')).hexdigest()[:12]
+    safe_name = ''.join(ch if ch.isalnum() or ch in '._-' else '_' for ch in os.path.basename(path))
+    return os.path.join(cache_dir, f"{safe_name}-{path_hash}")
+
+def _options_key(read_csv_kwargs):
+    return row_content_hash([repr(sorted(read_csv_kwargs.items(), key=lambda item: item[0]))])[:12]
+
+def source_content_hash(path, cache_dir=PARSE_CACHE_DIR):
+    """Content hash of `path`, reusing the stored one while its size and mtime are unchanged."""
+    stat = os.stat(path)
+    source_file = os.path.join(_path_dir(path, cache_dir), 'source.json')
+    try:
+        with open(source_file, 'r', encoding='utf-8') as f_source:
+            source = json.load(f_source)
+        if source['size'] == stat.st_size and source['mtime_ns'] == stat.st_mtime_ns:
+            return source['content_hash']
+    except (OSError, ValueError, KeyError):
+        pass
+    content_hash = file_content_hash(path)
+    os.makedirs(os.path.dirname(source_file), exist_ok=True)
+    temp_path = source_file + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f_source:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'content_hash': content_hash}, f_source)
+    os.replace(temp_path, source_file)
+    return content_hash
+
+def _select_columns(columns, usecols):
+    """Positions of the columns `usecols` picks (names or a callable, as in pd.read_csv), in file order."""
+    if usecols is None:
+        return list(range(len(columns)))
+    if callable(usecols):
+        return [i for i, name in enumerate(columns) if usecols(name)]
+    wanted = set(usecols)
+    missing = wanted - set(columns)
+    if missing:
+        raise ValueError(f"Usecols do not match columns, columns expected but not found: {sorted(missing)}")
+    return [i for i, name in enumerate(columns) if name in wanted]
+
+def _cacheable(df):
+    import pandas as pd
+
+    if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+        return False
+    for name in df.columns:
+        dtype = str(df[name].dtype)
+        if dtype in NUMERIC_DTYPES:
+            continue
+        if dtype not in TEXT_DTYPES:
+            return False
+        if dtype == 'object' and not df[name].map(lambda value: isinstance(value, str) or value != value).all(): # str or NaN only
+            return False
+    return True
+
+def _write_snapshot(df, snapshot_dir, source_path, content_hash, read_csv_kwargs):
+    import numpy as np
+
+    columns = []
+    temp_dir = tempfile.mkdtemp(prefix='.snapshot-', dir=os.path.dirname(snapshot_dir))
+    try:
+        for position, name in enumerate(df.columns):
+            series = df.iloc[:, position]
+            dtype = str(series.dtype)
+            stem = os.path.join(temp_dir, f"{position:05d}")
+            if dtype in NUMERIC_DTYPES:
+                np.save(stem + '.values.npy', series.to_numpy(dtype=dtype))
+            else:
+                nulls = series.isna().to_numpy()
+                cells = ['' if is_null else value for value, is_null in zip(series.tolist(), nulls)]
+                offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+                np.cumsum([len(cell) for cell in cells], out=offsets[1:])
+                np.save(stem + '.data.npy', np.frombuffer(''.join(cells).encode('utf-8'), dtype=np.uint8))
+                np.save(stem + '.offsets.npy', offsets)
+                np.save(stem + '.nulls.npy', nulls)
+            columns.append({'name': name, 'dtype': dtype})
+        with open(os.path.join(temp_dir, 'meta.json'), 'w', encoding='utf-8') as f_meta:
+            json.dump({
+                'version': CACHE_FORMAT_VERSION, 'source': source_path, 'content_hash': content_hash,
+                'read_options': repr(sorted(read_csv_kwargs.items(), key=lambda item: item[0])),
+                'rows': len(df), 'columns': columns,
+            }, f_meta, indent=2)
+        os.replace(temp_dir, snapshot_dir)
+    except OSError:
+        # Another process stored the same snapshot first (or the cache is not writable): keep theirs
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _read_snapshot(snapshot_dir, meta, usecols):
+    import numpy as np
+    import pandas as pd
+
+    data = {}
+    for position in _select_columns([column['name'] for column in meta['columns']], usecols):
+        column = meta['columns'][position]
+        stem = os.path.join(snapshot_dir, f"{position:05d}")
+        if column['dtype'] in NUMERIC_DTYPES:
+            data[column['name']] = np.load(stem + '.values.npy', mmap_mode='r')
+            continue
+        offsets = np.load(stem + '.offsets.npy', mmap_mode='r').tolist()
+        nulls = np.load(stem + '.nulls.npy', mmap_mode='r').tolist()
+        text = np.load(stem + '.data.npy', mmap_mode='r').tobytes().decode('utf-8')
+        values = [np.nan if is_null else text[start:end] for start, end, is_null in zip(offsets, offsets[1:], nulls)]
+        data[column['name']] = pd.array(values, dtype=column['dtype'])
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['rows']))
+
+def _load_meta(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, 'meta.json'), 'r', encoding='utf-8') as f_meta:
+            meta = json.load(f_meta)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_FORMAT_VERSION else None
+
+def read_csv_cached(path, usecols=None, cache_dir=PARSE_CACHE_DIR, **read_csv_kwargs):
+    """
+    pd.read_csv(path, usecols=usecols, **read_csv_kwargs), served from the columnar snapshot
+    when one exists for the file's current bytes and these options (written on a miss).
+    Raises FileNotFoundError like read_csv when `path` does not exist.
+    """
+    import pandas as pd
+
+    if cache_dir is None:
+        return pd.read_csv(path, usecols=usecols, **read_csv_kwargs)
+    content_hash = source_content_hash(path, cache_dir)
+    path_dir = _path_dir(path, cache_dir)
+    snapshot_dir = os.path.join(path_dir, f"{content_hash[:16]}-{_options_key(read_csv_kwargs)}")
+    meta = _load_meta(snapshot_dir)
+    if meta is not None:
+        return _read_snapshot(snapshot_dir, meta, usecols)
+
+    df = pd.read_csv(path, **read_csv_kwargs)
+    if _cacheable(df):
+        # Snapshots of this path's older contents are stale now
+        for entry in os.listdir(path_dir):
+            if not entry.startswith(content_hash[:16]) and not entry.startswith('.') and entry != 'source.json':
+                shutil.rmtree(os.path.join(path_dir, entry), ignore_errors=True)
+        _write_snapshot(df, snapshot_dir, path, content_hash, read_csv_kwargs)
+    if usecols is None:
+        return df
+    return df.iloc[:, _select_columns(list(df.columns), usecols)]
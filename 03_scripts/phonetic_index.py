@@ -0,0 +1,144 @@
+"""
+Phonetic blocking index for provider names (NYSIIS codes over first and last names).
+
+Spelling variants that sound alike (Trujilo/Trujillo) get the same NYSIIS code, so an exact
+dict lookup on (first-name code, last-name code) finds them in O(1). Hyphenated or
+multi-part last names are also indexed under each part, so "Mulligan-Denman" and "Mulligan"
+land in the same block.
+"""
+import csv
+import re
+
+from name_normalization import create_name_key
+
+VOWELS = frozenset("AEIOU")
+NYSIIS_PREFIXES = (('MAC', 'MCC'), ('KN', 'NN'), ('K', 'C'), ('PH', 'FF'), ('PF', 'FF'), ('SCH', 'SSS'))
+NYSIIS_SUFFIXES = (('EE', 'Y'), ('IE', 'Y'), ('DT', 'D'), ('RT', 'D'), ('RD', 'D'), ('NT', 'D'), ('ND', 'D'))
+LAST_NAME_PART_SPLIT = re.compile(r"[\s\-]+")
+
+
+def nysiis(name):
+    """NYSIIS phonetic code of a single name token (not truncated). Non-letters are ignored."""
+    if not name:
+        return ""
+    chars = [ch for ch in str(name).upper() if 'A' <= ch <= 'Z']
+    if not chars:
+        return ""
+    word = ''.join(chars)
+    for src, dst in NYSIIS_PREFIXES:
+        if word.startswith(src):
+            word = dst + word[len(src):]
+            break
+    for src, dst in NYSIIS_SUFFIXES:
+        if word.endswith(src):
+            word = word[:-len(src)] + dst
+            break
+
+    chars = list(word)
+    key = [chars[0]]
+    i = 1
+    while i < len(chars):
+        ch = chars[i]
+        next_ch = chars[i + 1] if i + 1 < len(chars) else ''
+        if ch == 'E' and next_ch == 'V':
+            chars[i:i + 2] = ['A', 'F']
+        elif ch in VOWELS:
+            chars[i] = 'A'
+        elif ch == 'Q':
+            chars[i] = 'G'
+        elif ch == 'Z':
+            chars[i] = 'S'
+        elif ch == 'M':
+            chars[i] = 'N'
+        elif ch == 'K':
+            chars[i] = 'N' if next_ch == 'N' else 'C'
+        elif chars[i:i + 3] == ['S', 'C', 'H']:
+            chars[i:i + 3] = ['S', 'S', 'S']
+        elif ch == 'P' and next_ch == 'H':
+            chars[i:i + 2] = ['F', 'F']
+        elif ch == 'H' and (chars[i - 1] not in VOWELS or next_ch not in VOWELS):
+            chars[i] = chars[i - 1]
+        elif ch == 'W' and chars[i - 1] in VOWELS:
+            chars[i] = chars[i - 1]
+        if chars[i] != key[-1]:
+            key.append(chars[i])
+        i += 1
+
+    if len(key) > 1 and key[-1] == 'S':
+        key.pop()
+    if key[-2:] == ['A', 'Y']:
+        key[-2:] = ['Y']
+    if len(key) > 1 and key[-1] == 'A':
+        key.pop()
+    return ''.join(key)
+
+def _as_text(value):
+    # None and float NaN (blank CSV cells read by pandas) count as empty
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value)
+
+def first_name_code(first_name):
+    """Code of the first token of a first name ("Eun Sun" -> code of "Eun")."""
+    tokens = _as_text(first_name).split()
+    return nysiis(tokens[0]) if tokens else ""
+
+def last_name_codes(last_name):
+    """Codes for the whole last name and for each of its hyphen/space-separated parts."""
+    last_name = _as_text(last_name)
+    parts = [p for p in LAST_NAME_PART_SPLIT.split(last_name) if p]
+    codes = [nysiis(''.join(parts))] + [nysiis(p) for p in parts]
+    return list(dict.fromkeys(c for c in codes if c)) # de-duplicated, order kept
+
+
+class PhoneticIndex:
+    """Dict from (first-name code, last-name code) to the values (name keys) indexed under it."""
+
+    def __init__(self):
+        self._blocks = {}
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def add(self, first_name, last_name, value=None):
+        """Index a provider. `value` defaults to the shared create_name_key(first, last)."""
+        if value is None:
+            value = create_name_key(first_name, last_name)
+        first_code = first_name_code(first_name)
+        if not first_code:
+            return
+        for last_code in last_name_codes(last_name):
+            block = self._blocks.setdefault((first_code, last_code), [])
+            if value not in block:
+                block.append(value)
+
+    def lookup(self, first_name, last_name):
+        """Values whose phonetic block matches this first/last name, in insertion order."""
+        first_code = first_name_code(first_name)
+        if not first_code:
+            return []
+        found = {}
+        for last_code in last_name_codes(last_name):
+            for value in self._blocks.get((first_code, last_code), ()):
+                found[value] = True
+        return list(found)
+
+
+def build_phonetic_index(first_names, last_names, values=None):
+    """Build a PhoneticIndex from aligned iterables (e.g. two DataFrame columns)."""
+    index = PhoneticIndex()
+    if values is None:
+        for first_name, last_name in zip(first_names, last_names):
+            index.add(first_name, last_name)
+    else:
+        for first_name, last_name, value in zip(first_names, last_names, values):
+            index.add(first_name, last_name, value)
+    return index
+
+def load_phonetic_index(path, first_col="First Name", last_col="Last Name", index=None):
+    """Build (or extend) a PhoneticIndex from a CSV such as provider_ids_for_mapping.csv or the truth file."""
+    index = index if index is not None else PhoneticIndex()
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f_in:
+        for row in csv.DictReader(f_in):
+            index.add(row.get(first_col, ''), row.get(last_col, ''))
+    return index
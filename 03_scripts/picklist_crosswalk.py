@@ -0,0 +1,245 @@
+"""
+Crosswalk from raw source values to the canonical Salesforce picklists.
+
+    python 03_scripts/picklist_crosswalk.py        # coverage report; caches new fuzzy results
+
+The four picklists in 02_salesforce_picklist/ (PICKLIST_FIELDS) and the crosswalk table
+CROSSWALK_FILE are loaded into one dict per field, keyed by the normalized value
+(normalize_picklist_value: case-folded, dots dropped, whitespace collapsed):
+
+    crosswalk = PicklistCrosswalk.load()
+    df['Salesforce Gender'] = crosswalk.map_series('gender', df['Gender'])
+    credentials = crosswalk.map_column('credential', MultiValueColumn.from_series(df['Credentials'], [',']))
+    crosswalk.save()                                  # persist newly cached fuzzy results
+
+A column is normalized once, reduced to its distinct values, and mapped with Series.map
+against the field's dict, so the work grows with the number of distinct raw values rather
+than with rows. Only distinct values the dict has never seen go to the fuzzy fallback
+(fuzzy_matching.TrigramIndex over the normalized picklist), and its answer - a match or
+"unmatched" - is added to the dict and cached in the crosswalk table for the next run.
+
+Crosswalk rows (Field, Source Value, Canonical Value, Method, Score, Picklist Version):
+    manual     reviewed mappings, maintained by hand (LSCW -> LCSW, PMHNP-BC -> PMHNP);
+               always applied
+    fuzzy      cached fallback matches (review and change Method to manual to keep them)
+    unmatched  cached fallback misses (blank Canonical Value)
+Cached rows only apply while their field's picklist is unchanged (Picklist Version); after a
+picklist edit those values are matched again. Age ranges are not matched by spelling: the
+age buckets are ranges, and age_ranges.AgeBuckets maps each source range to the buckets it
+overlaps.
+"""
+import csv
+import os
+import re
+
+from atomic_csv import AtomicCsvWriter
+from fuzzy_matching import TrigramIndex
+from row_state import row_content_hash
+
+PICKLIST_DIR = '02_salesforce_picklist'
+CROSSWALK_FILE = os.path.join('05_airtable_and_mapping', '06_picklist_crosswalk', 'picklist_crosswalk.csv')
+CROSSWALK_HEADER = ['Field', 'Source Value', 'Canonical Value', 'Method', 'Score', 'Picklist Version']
+
+# Picklist file and header row of each field (salesforce_ages.csv has no header row), whether
+# unseen values go to the fuzzy fallback (not for ages: bucket labels are ranges, not
+# spellings; see age_ranges), and the separators of multi-valued source cells for the coverage report (on
+# top of those declared in source_registry; credential cells mix ',', ';' and ';#').
+PICKLIST_FIELDS = {
+    'credential': {'file': 'salesforce_credentials.csv', 'header': 'salesforce_credentials', 'fuzzy': True,
+                   'separators': [',', ';#', ';']},
+    'age': {'file': 'salesforce_ages.csv', 'header': None, 'fuzzy': False, 'separators': []},
+    'gender': {'file': 'salesforce_genders.csv', 'header': 'salesforce_genders', 'fuzzy': True, 'separators': []},
+    'treatment_modality': {'file': 'salesforce_treatment_modialities.csv', 'header': 'salesforce_treatment_modialities',
+                           'fuzzy': True, 'separators': []},
+}
+
+FUZZY_MIN_SCORE = 0.93
+# Shorter normalized values (most credential abbreviations) are only matched exactly:
+# one letter apart is a different credential (LCSW / LSW), not a typo
+FUZZY_MIN_LENGTH = 6
+
+# Source columns of each field for the coverage report: (source key, column)
+FIELD_SOURCE_COLUMNS = {
+    'credential': [('legacy_airtable', 'Credentials'), ('pulse_bhi', 'Credentials'),
+                   ('pulse_counseling', 'Credentials'), ('pulse_mm', 'Credentials')],
+    'age': [('legacy_airtable', 'Ages Seen'), ('legacy_airtable', 'LOMG Grid - Ages Treated'), ('pulse_bhi', 'Ages'),
+            ('pulse_counseling', 'Ages'), ('pulse_mm', 'Ages'), ('guidebook', 'Ages')],
+    'gender': [('legacy_airtable', 'Gender'), ('pulse_bhi', 'Therapist Gender'),
+               ('pulse_counseling', 'CT Gender ID'), ('pulse_mm', 'Gender')],
+    'treatment_modality': [('legacy_airtable', 'Treatment Modalities')],
+}
+
+WHITESPACE_RUN = re.compile(r"\s+")
+
+
+def normalize_picklist_value(value):
+    """Lookup form of a picklist or source value ('' for blanks)."""
+    if not isinstance(value, str):
+        return ''
+    return WHITESPACE_RUN.sub(' ', value.replace('.', '')).strip().casefold()
+
+def normalize_picklist_series(series):
+    """Vectorized normalize_picklist_value."""
+    normalized = series.astype(object).where(series.notna(), '').astype(str)
+    return normalized.str.replace('.', '', regex=False).str.replace(WHITESPACE_RUN, ' ', regex=True).str.strip().str.casefold()
+
+def load_picklist(field, picklist_dir=PICKLIST_DIR):
+    """Canonical values of `field`, in file order. Raises FileNotFoundError if the picklist is missing."""
+    spec = PICKLIST_FIELDS[field]
+    with open(os.path.join(picklist_dir, spec['file']), 'r', newline='', encoding='utf-8-sig') as f_picklist:
+        values = [row[0].strip() for row in csv.reader(f_picklist) if row and row[0].strip()]
+    if spec['header'] and values and values[0] == spec['header']:
+        values = values[1:]
+    return values
+
+def load_crosswalk_rows(path=CROSSWALK_FILE):
+    """Rows of the crosswalk table as dicts. Returns [] if the file is missing."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f_crosswalk:
+        return list(csv.DictReader(f_crosswalk))
+
+
+class PicklistCrosswalk:
+    """Per-field dict from normalized source value to canonical picklist value (None = no match)."""
+
+    def __init__(self, picklists, crosswalk_rows=(), path=CROSSWALK_FILE):
+        self.path = path
+        self.picklists = {field: list(values) for field, values in picklists.items()}
+        self.versions = {field: row_content_hash(values)[:12] for field, values in self.picklists.items()}
+        self._index = {}
+        self._fuzzy = {}
+        self._manual_rows = []
+        self._cached_rows = {} # (field, normalized value) -> crosswalk row dict
+        self.stats = {field: {'fuzzy': 0, 'unmatched': 0} for field in self.picklists} # New fallback results this run
+        for field, values in self.picklists.items():
+            self._index[field] = {normalize_picklist_value(value): value for value in values}
+        for row in crosswalk_rows:
+            field, method = row.get('Field', ''), row.get('Method', '')
+            normalized = normalize_picklist_value(row.get('Source Value'))
+            if field not in self._index or not normalized:
+                continue
+            canonical = row.get('Canonical Value') or None
+            if method == 'manual':
+                self._manual_rows.append(row)
+                if canonical in self.picklists[field]:
+                    self._index[field][normalized] = canonical
+            elif row.get('Picklist Version') == self.versions[field] and (canonical is None or canonical in self.picklists[field]):
+                # Cached fallback results only hold for the picklist they were matched against
+                self._index[field].setdefault(normalized, canonical)
+                self._cached_rows[(field, normalized)] = row
+
+    @classmethod
+    def load(cls, picklist_dir=PICKLIST_DIR, path=CROSSWALK_FILE):
+        return cls({field: load_picklist(field, picklist_dir) for field in PICKLIST_FIELDS}, load_crosswalk_rows(path), path)
+
+    def _fuzzy_index(self, field):
+        if field not in self._fuzzy:
+            index = TrigramIndex()
+            for value in self.picklists[field]:
+                index.add(normalize_picklist_value(value), value)
+            self._fuzzy[field] = index
+        return self._fuzzy[field]
+
+    def _match_unseen(self, field, normalized, source_value):
+        """Fuzzy fallback for one distinct value not in the dict yet; the result is cached."""
+        canonical, score = None, ''
+        if PICKLIST_FIELDS[field]['fuzzy'] and len(normalized) >= FUZZY_MIN_LENGTH:
+            matches = self._fuzzy_index(field).search(normalized, k=1, min_score=FUZZY_MIN_SCORE)
+            if matches:
+                canonical, score = matches[0][0], f"{matches[0][1]:.3f}"
+        self._index[field][normalized] = canonical
+        self._cached_rows[(field, normalized)] = {
+            'Field': field, 'Source Value': source_value, 'Canonical Value': canonical or '',
+            'Method': 'fuzzy' if canonical else 'unmatched', 'Score': score, 'Picklist Version': self.versions[field],
+        }
+        self.stats[field]['fuzzy' if canonical else 'unmatched'] += 1
+        return canonical
+
+    def aliases(self, field):
+        """{normalized spelling: canonical value} of every spelling known to map (picklist, manual and cached)."""
+        return {normalized: canonical for normalized, canonical in self._index[field].items() if canonical}
+
+    def map_values(self, field, values):
+        """{value: canonical value or None} for distinct raw `values`."""
+        mapping = {}
+        index = self._index[field]
+        for value in values:
+            normalized = normalize_picklist_value(value)
+            if not normalized:
+                mapping[value] = None
+            elif normalized in index:
+                mapping[value] = index[normalized]
+            else:
+                mapping[value] = self._match_unseen(field, normalized, value)
+        return mapping
+
+    def map_series(self, field, series):
+        """Canonical value for every cell of a single-valued column (NaN where blank or unmatched)."""
+        import numpy as np
+
+        normalized = normalize_picklist_series(series)
+        # One raw spelling per distinct normalized value (the first), so the cache records a real source value
+        first_positions = np.flatnonzero((~normalized.duplicated() & (normalized != '')).to_numpy())
+        distinct_raw = series.iloc[first_positions].tolist()
+        mapping = self.map_values(field, distinct_raw)
+        canonical_by_normalized = {normalized.iat[position]: mapping[raw] for position, raw in zip(first_positions, distinct_raw)}
+        return normalized.map(canonical_by_normalized)
+
+    def map_column(self, field, column):
+        """multi_value.MultiValueColumn of canonical values (unmatched items dropped, duplicates merged)."""
+        return column.recode(self.map_values(field, column.vocabulary))
+
+    def new_cache_rows(self):
+        return [row for key, row in self._cached_rows.items() if row.get('Picklist Version') == self.versions[key[0]]]
+
+    def save(self):
+        """Write the manual rows plus every current cached result to the crosswalk table."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        cached = sorted(self.new_cache_rows(), key=lambda row: (row['Field'], row['Method'], normalize_picklist_value(row['Source Value'])))
+        with AtomicCsvWriter(self.path) as writer:
+            writer.writerow(CROSSWALK_HEADER)
+            writer.writerows([row.get(column, '') or '' for column in CROSSWALK_HEADER] for row in self._manual_rows + cached)
+
+
+def main():
+    from age_ranges import AgeBuckets
+    from multi_value import MultiValueColumn
+    from source_registry import get_source, read_source
+
+    crosswalk = PicklistCrosswalk.load()
+    age_buckets = AgeBuckets(crosswalk.picklists['age'])
+    print("--- Picklist crosswalk coverage ---")
+    for field, source_columns in FIELD_SOURCE_COLUMNS.items():
+        print(f"\n{field} ({len(crosswalk.picklists[field])} picklist values):")
+        for source_key, column in source_columns:
+            try:
+                df = read_source(source_key, columns=[column])
+            except FileNotFoundError:
+                print(f"  {source_key}: file not found. Skipping.")
+                continue
+            if column not in df.columns:
+                print(f"  {source_key}: no '{column}' column. Skipping.")
+                continue
+            separator = get_source(source_key)['multi_value_separators'].get(column)
+            separators = PICKLIST_FIELDS[field]['separators'] + ([separator] if separator else [])
+            values = MultiValueColumn.from_series(df[column], separators=separators)
+            if field == 'age':
+                mapping = {value: ', '.join(buckets) or None for value, buckets in age_buckets.map_values(values.vocabulary).items()}
+            else:
+                mapping = crosswalk.map_values(field, values.vocabulary)
+            counts = values.counts()
+            unmatched = sorted(value for value, canonical in mapping.items() if canonical is None)
+            mapped_rows = int(counts[[value for value, canonical in mapping.items() if canonical]].sum()) if len(counts) else 0
+            print(f"  {source_key} '{column}': {len(mapping) - len(unmatched)} of {len(mapping)} distinct values mapped "
+                  f"({mapped_rows} of {int(counts.sum())} occurrences)")
+            if unmatched:
+                print(f"    Unmatched: {', '.join(unmatched)}")
+        stats = crosswalk.stats[field]
+        if stats['fuzzy'] or stats['unmatched']:
+            print(f"  New fallback results: {stats['fuzzy']} fuzzy matches, {stats['unmatched']} unmatched (cached)")
+    crosswalk.save()
+    print(f"\nSaved the crosswalk to {crosswalk.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Shared in-memory workspace for the pipeline stages.
+
+Every stage used to open, parse and rewrite the CSVs it touched, so a full run parsed
+northshore_names.csv and pulse_consolidated_names.csv four times each and rewrote them after
+every stage. Stages now take a ProviderWorkspace instead: each file is parsed once, on first
+use, into a CsvTable shared by every later stage; writes only replace the table in memory
+and mark it dirty; flush() writes each dirty table to disk once, at the end, through an
+AtomicCsvWriter (streamed to a temp file, then os.replace), so a failed flush never leaves a
+half-written source file.
+
+    workspace = ProviderWorkspace()
+    correct_northshore_names.run(workspace)
+    add_internal_label_to_northshore.run(workspace)
+    workspace.flush()
+
+discard_changes() drops the unwritten tables of a stage that stopped on an error, so a flush
+never writes a half-updated table.
+
+Tables are plain header + list-of-rows record stores (every cell a str, exactly as the csv
+module reads it), so rewriting a table reproduces the same CSV the stage would have written.
+
+Row-by-row stages do not need the whole file at once, so they do not load it:
+
+    workspace.rewrite_table(path, transform_rows)   # transform_rows(header, rows) -> (header, rows)
+    with workspace.open_rows(path) as (header, rows):
+        lookup = {...}                              # read-only pass for a lookup
+
+rewrite_table() streams a file the workspace does not hold from disk, through the transform,
+into a temp file that replaces it (atomic_csv.rewrite_csv_in_place), so memory stays bounded
+whatever the file size; a table an earlier stage loaded or wrote is transformed in memory and
+written by flush() as before. open_rows() iterates a held table or streams the file without
+caching it.
+
+A long-lived workspace (the providers.py worker) calls drop_changed_tables() before each
+command so files edited on disk in the meantime are parsed again.
+"""
+import contextlib
+import csv
+import hashlib
+import io
+import os
+import threading
+
+from atomic_csv import DEFAULT_ENCODING, WRITE_BUFFER_ROWS, AtomicCsvWriter, rewrite_csv_in_place
+from row_state import file_content_hash
+
+
+def _file_signature(path):
+    """(size, mtime_ns) of `path`, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class CsvTable:
+    """One parsed CSV: header (list of str) and rows (list of lists of str)."""
+
+    def __init__(self, header, rows):
+        self.header = list(header)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column_index(self, column):
+        """Position of `column` in the header (first occurrence). Raises ValueError if absent."""
+        return self.header.index(column)
+
+    def dicts(self):
+        """Rows as dicts keyed by header, like csv.DictReader (short rows lack the missing keys)."""
+        header = self.header
+        return (dict(zip(header, row)) for row in self.rows)
+
+    def to_frame(self, dtype=str):
+        """pandas DataFrame of the table (every column `dtype`, str by default)."""
+        import pandas as pd
+
+        width = len(self.header)
+        padded = [row + [''] * (width - len(row)) if len(row) < width else row[:width] for row in self.rows]
+        return pd.DataFrame(padded, columns=self.header, dtype=dtype)
+
+    def iter_serialized(self, batch_rows=WRITE_BUFFER_ROWS):
+        """The bytes csv.writer would write for this table, in chunks of `batch_rows` rows."""
+        buffer = io.StringIO(newline='')
+        writer = csv.writer(buffer)
+        writer.writerow(self.header)
+        for start in range(0, len(self.rows), batch_rows):
+            writer.writerows(self.rows[start:start + batch_rows])
+            yield buffer.getvalue().encode(DEFAULT_ENCODING)
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode(DEFAULT_ENCODING)
+
+    def serialize(self):
+        """The exact bytes csv.writer would write for this table."""
+        return b''.join(self.iter_serialized())
+
+
+class ProviderWorkspace:
+    """Parse-once cache of CSV tables with deferred, single writes."""
+
+    def __init__(self):
+        self._tables = {}
+        self._dirty = set()
+        self._signatures = {} # path -> file signature when the table was read or last flushed
+        self._lock = threading.Lock() # Stages of independent branches may share one workspace
+
+    def has_table(self, path):
+        """True if `path` is loaded or exists on disk."""
+        return path in self._tables or os.path.exists(path)
+
+    def read_table(self, path):
+        """
+        The shared CsvTable for `path`, parsed on first use. Raises FileNotFoundError if the
+        file does not exist, and ValueError if it is empty (no header row).
+        """
+        key = os.path.normpath(path)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                signature = _file_signature(path)
+                with open(path, 'r', newline='', encoding=DEFAULT_ENCODING) as f_in:
+                    reader = csv.reader(f_in)
+                    header = next(reader, None)
+                    if header is None:
+                        raise ValueError(f"{path} is empty (no header row).")
+                    table = CsvTable(header, list(reader))
+                self._tables[key] = table
+                self._signatures[key] = signature
+            return table
+
+    def write_table(self, path, header, rows):
+        """Replace the table for `path` in memory; it is written to disk by flush()."""
+        key = os.path.normpath(path)
+        table = CsvTable(header, [list(row) for row in rows])
+        with self._lock:
+            self._tables[key] = table
+            self._dirty.add(key)
+        return table
+
+    @contextlib.contextmanager
+    def open_rows(self, path):
+        """
+        (header, rows) for one read-only pass over `path`: the held table's rows, or a csv.reader
+        streaming the file (not cached). Raises FileNotFoundError / ValueError like read_table.
+        """
+        with self._lock:
+            table = self._tables.get(os.path.normpath(path))
+        if table is not None:
+            yield table.header, iter(table.rows)
+            return
+        with open(path, 'r', newline='', encoding=DEFAULT_ENCODING) as f_in:
+            reader = csv.reader(f_in)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f"{path} is empty (no header row).")
+            yield header, reader
+
+    def rewrite_table(self, path, transform_rows):
+        """
+        Apply transform_rows(header, rows) -> (new header, new rows) to `path`. A held table is
+        transformed in memory (on copies of its rows) and written by flush(); otherwise the file
+        streams through the transform straight to disk. Either way `path` is unchanged if the
+        transform raises. Returns the number of data rows written.
+        """
+        key = os.path.normpath(path)
+        with self._lock:
+            table = self._tables.get(key)
+        if table is not None:
+            header, rows = transform_rows(table.header, (list(row) for row in table.rows))
+            return len(self.write_table(path, header, rows))
+        return rewrite_csv_in_place(path, transform_rows)
+
+    def write_dicts(self, path, fieldnames, row_dicts):
+        """write_table for dict rows (like csv.DictWriter: missing fields become '')."""
+        return self.write_table(path, fieldnames, ([row.get(field, '') for field in fieldnames] for row in row_dicts))
+
+    def is_dirty(self, path):
+        return os.path.normpath(path) in self._dirty
+
+    def content_hash(self, path):
+        """SHA-256 of the file as it will be after flush() (disk bytes if not modified in memory)."""
+        key = os.path.normpath(path)
+        with self._lock:
+            table = self._tables.get(key) if key in self._dirty else None
+        if table is None:
+            return file_content_hash(path)
+        digest = hashlib.sha256()
+        for chunk in table.iter_serialized():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def drop_changed_tables(self):
+        """Forget unmodified tables whose file changed on disk since it was read or flushed (re-read on next use). Returns their paths."""
+        with self._lock:
+            changed = [path for path in self._tables
+                       if path not in self._dirty and self._signatures.get(path) != _file_signature(path)]
+            for path in changed:
+                del self._tables[path]
+                self._signatures.pop(path, None)
+        return changed
+
+    def discard_changes(self, paths=None):
+        """Forget the unwritten changes to `paths` (default: every dirty table); they are re-read from disk on next use. Returns the paths dropped."""
+        with self._lock:
+            keys = self._dirty if paths is None else {os.path.normpath(path) for path in paths} & self._dirty
+            dropped = sorted(keys)
+            for path in dropped:
+                self._dirty.discard(path)
+                del self._tables[path]
+                self._signatures.pop(path, None)
+        return dropped
+
+    def flush(self, log=None):
+        """Write every dirty table once (streamed to a temp file in the same directory, then os.replace). Returns the paths written."""
+        with self._lock:
+            dirty = sorted(self._dirty)
+        for path in dirty:
+            table = self._tables[path]
+            with AtomicCsvWriter(path, encoding=DEFAULT_ENCODING) as writer:
+                writer.writerow(table.header)
+                writer.writerows(table.rows)
+            with self._lock:
+                self._dirty.discard(path) # A table whose write failed stays dirty
+                self._signatures[path] = _file_signature(path)
+            if log:
+                log(f"Wrote {len(self._tables[path])} data rows to {path}")
+        return dirty
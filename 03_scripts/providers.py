@@ -0,0 +1,302 @@
+"""
+Single entry point for the provider-data scripts, with an optional resident worker.
+
+    python 03_scripts/providers.py                                  # list the commands
+    python 03_scripts/providers.py pipeline --dry-run               # = run_pipeline.py --dry-run
+    python 03_scripts/providers.py correct-northshore-names         # one active stage
+    python 03_scripts/providers.py serve &                          # start the worker
+    python 03_scripts/providers.py --worker add-salesforce-credentials
+    python 03_scripts/providers.py stop
+
+Only the module of the chosen command is imported, so listing commands or running a
+csv-module stage never pays for pandas/NumPy. Chaining the pandas scripts still starts an
+interpreter and imports pandas per command; `serve` instead keeps one process running that
+has pandas, NumPy and the shared helpers imported, the imported command modules, one
+ProviderWorkspace (CSV tables parsed once across commands) and the lru_cached reference
+loaders (name-noise pattern, nickname index). `--worker` sends the command to it over a local
+socket (a Unix socket, or a named pipe on Windows) and prints its output and exit status.
+
+Before each command the worker re-reads CSV tables and reference files that changed on disk,
+so edit-and-rerun loops see the edits. Python code is not reloaded: restart the worker after
+changing a script. The worker runs one command at a time, from the repo root it was started
+in, and only accepts commands from clients started in that same directory. Its address and a
+per-run authentication key are in WORKER_INFO_FILE (readable by the owner only).
+"""
+import argparse
+import contextlib
+import hashlib
+import importlib
+import importlib.util
+import io
+import json
+import os
+import secrets
+import sys
+import tempfile
+import time
+import traceback
+
+scripts_dir = '03_scripts'
+WORKER_INFO_FILE = os.path.join(scripts_dir, 'providers_worker.json')
+
+# Subcommand -> module (path under 03_scripts/ for archive scripts) and how it is called:
+#   'stage'    run(workspace) on the shared workspace, then flush unless it returned False (no options, as in run_pipeline)
+#   'pipeline' main(argv, workspace=workspace)
+#   'argv'     main(argv)
+#   'plain'    main() (no options)
+COMMANDS = {
+    'pipeline': {'module': 'run_pipeline', 'call': 'pipeline',
+                 'help': "Run the active stages in dependency order."},
+    'correct-northshore-names': {'module': 'correct_northshore_names', 'call': 'stage',
+                                 'help': "Apply the Northshore name corrections."},
+    'add-internal-label-to-northshore': {'module': 'add_internal_label_to_northshore', 'call': 'stage',
+                                         'help': "Copy Internal Labels from the guidebook to northshore_names.csv."},
+    'update-guidebook-names': {'module': 'update_guidebook_names_from_northshore', 'call': 'stage',
+                               'help': "Update guidebook names from northshore_names.csv."},
+    'split-pulse-names': {'module': 'split_pulse_names', 'call': 'stage',
+                          'help': "Split the Pulse full-name columns into First/Last Name."},
+    'update-pulse-labels': {'module': 'update_pulse_labels', 'call': 'stage',
+                            'help': "Update the Pulse labels in pulse_consolidated_names.csv."},
+    'create-working-airtable': {'module': 'create_working_airtable', 'call': 'stage',
+                                'help': "Build working_airtable.csv from the Pulse and Northshore names."},
+    'resolve-entities': {'module': 'resolve_provider_entities', 'call': 'argv',
+                         'help': "Cluster provider rows from every source into entities."},
+    'analyze-names': {'module': os.path.join('archive', 'name_consistency_analyzer.py'), 'call': 'plain',
+                      'help': "Report name/NPI discrepancies against the truth file."},
+    'create-truth-file': {'module': os.path.join('archive', 'create_new_truth_file.py'), 'call': 'plain',
+                          'help': "Create the new provider truth file."},
+    'enrich-truth-file': {'module': os.path.join('archive', 'enrich_truth_file.py'), 'call': 'plain',
+                          'help': "Add phone numbers and web addresses to the truth file."},
+    'add-salesforce-credentials': {'module': os.path.join('archive', 'add_salesforce_credentials.py'), 'call': 'plain',
+                                   'help': "Add Salesforce credentials to the truth file."},
+    'extract-modalities': {'module': 'treatment_modalities', 'call': 'plain',
+                           'help': "Write the provider -> treatment modality table from the legacy free text."},
+    'age-ranges': {'module': 'age_ranges', 'call': 'argv',
+                   'help': "Map source age ranges to the Salesforce age buckets; --age N lists who sees age N."},
+    'benchmark': {'module': 'benchmark_pipeline', 'call': 'argv',
+                  'help': "Time the stages on synthetic rosters against the baseline."},
+    'synthetic-roster': {'module': 'synthetic_roster', 'call': 'argv',
+                         'help': "Write a seeded synthetic provider roster."},
+}
+
+# Modules the worker imports up front (the heavy third-party ones and the shared helpers)
+WORKER_PRELOAD = ['numpy', 'pandas', 'name_cleaning', 'name_normalization', 'nickname_aliases',
+                  'npi_validation', 'parse_cache', 'source_registry', 'fuzzy_matching', 'phonetic_index']
+
+# lru_cached loaders the worker clears when their file changes: (module, function, file attribute)
+WORKER_CACHED_LOADERS = [
+    ('name_cleaning', 'get_name_noise_pattern', 'SALESFORCE_CREDENTIALS_FILE'),
+    ('nickname_aliases', 'load_nickname_index', 'NICKNAME_ALIASES_FILE'),
+]
+
+
+def load_command_module(command):
+    """Import the module of `command` (archive scripts by file path, as they are not a package)."""
+    module_name = COMMANDS[command]['module']
+    if not module_name.endswith('.py'):
+        return importlib.import_module(module_name)
+    name = os.path.splitext(os.path.basename(module_name))[0]
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(scripts_dir, module_name))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+    return sys.modules[name]
+
+def run_command(command, argv, workspace=None):
+    """Run one command in this process. Returns its exit status."""
+    spec = COMMANDS[command]
+    if spec['call'] in ('stage', 'plain') and argv:
+        print(f"{command} takes no options (got: {' '.join(argv)}).", file=sys.stderr)
+        return 2
+    module = load_command_module(command)
+    if spec['call'] == 'stage':
+        if workspace is None:
+            from provider_workspace import ProviderWorkspace
+            workspace = ProviderWorkspace()
+        if not module.run(workspace):
+            workspace.discard_changes() # Stopped on an error: write none of its tables
+            return 1
+        workspace.flush(log=print)
+        return 0
+    if spec['call'] == 'pipeline':
+        status = module.main(argv, workspace=workspace)
+    elif spec['call'] == 'argv':
+        status = module.main(argv)
+    else:
+        status = module.main()
+    return status if isinstance(status, int) else 0
+
+
+# --- Resident worker ---
+
+def worker_address(root):
+    """Local socket address for the worker of repo `root` (a named pipe on Windows)."""
+    root_hash = hashlib.sha1(os.path.normcase(os.path.abspath(root)).encode('utf-8')).hexdigest()[:12]
+    if sys.platform == 'win32':
+        return rf"\\.\pipe\providers-worker-{root_hash}"
+    return os.path.join(tempfile.gettempdir(), f"providers-worker-{root_hash}.sock")
+
+def read_worker_info():
+    try:
+        with open(WORKER_INFO_FILE, 'r', encoding='utf-8') as f_info:
+            return json.load(f_info)
+    except (OSError, ValueError):
+        return None
+
+def write_worker_info(info):
+    temp_path = WORKER_INFO_FILE + '.tmp'
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f_info:
+        json.dump(info, f_info, indent=2)
+    os.replace(temp_path, WORKER_INFO_FILE)
+
+class WorkerState:
+    """What the worker keeps between commands: the shared workspace and the watched reference files."""
+
+    def __init__(self):
+        from provider_workspace import ProviderWorkspace
+
+        self.workspace = ProviderWorkspace()
+        self._loader_signatures = {}
+
+    def refresh(self):
+        """Drop tables and cached loaders whose files changed on disk since the last command."""
+        changed = self.workspace.drop_changed_tables()
+        for module_name, function_name, file_attribute in WORKER_CACHED_LOADERS:
+            module = sys.modules.get(module_name)
+            if module is None:
+                continue
+            path = getattr(module, file_attribute)
+            try:
+                stat = os.stat(path)
+                signature = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                signature = None
+            key = (module_name, function_name)
+            if key in self._loader_signatures and self._loader_signatures[key] != signature:
+                getattr(module, function_name).cache_clear()
+                changed.append(path)
+            self._loader_signatures[key] = signature
+        return changed
+
+    def reset(self):
+        """Start over with an empty workspace (after a failed command, whose tables may be half-updated)."""
+        from provider_workspace import ProviderWorkspace
+
+        self.workspace = ProviderWorkspace()
+
+    def execute(self, command, argv):
+        """Run one command; returns (exit status, captured output)."""
+        output = io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            for path in self.refresh():
+                print(f"[worker] {path} changed on disk; reloading it.")
+            try:
+                status = run_command(command, argv, self.workspace)
+            except SystemExit as e: # argparse --help or a usage error
+                status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                traceback.print_exc()
+                self.reset()
+                status = 1
+            print(f"[worker] {command} finished in {time.perf_counter() - started:.2f}s (exit {status}).")
+        return status, output.getvalue()
+
+def serve():
+    """Run the worker in the foreground until `stop` (or Ctrl+C)."""
+    from multiprocessing.connection import Listener
+
+    started = time.perf_counter()
+    for module_name in WORKER_PRELOAD:
+        importlib.import_module(module_name)
+    state = WorkerState()
+    root = os.getcwd()
+    address = worker_address(root)
+    authkey = secrets.token_bytes(32)
+    if sys.platform != 'win32' and os.path.exists(address):
+        os.remove(address) # Left behind by a worker that was killed
+    with Listener(address, authkey=authkey) as listener:
+        write_worker_info({'address': address, 'authkey': authkey.hex(), 'pid': os.getpid(), 'root': root})
+        print(f"Worker ready in {time.perf_counter() - started:.2f}s on {address} (pid {os.getpid()}). "
+              f"Send commands with: providers.py --worker <command>")
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (OSError, EOFError) as e: # Failed handshake (wrong key) or a dropped client
+                    print(f"Rejected a connection: {e}")
+                    continue
+                with connection:
+                    # A client that disconnects or sends a malformed request costs only its own connection
+                    try:
+                        request = connection.recv()
+                        if request.get('stop'):
+                            connection.send({'status': 0, 'output': "Worker stopped.\n"})
+                            break
+                        if os.path.normcase(request.get('cwd', '')) != os.path.normcase(root):
+                            connection.send({'status': 2, 'output': f"The worker runs in {root}; run the client from there.\n"})
+                            continue
+                        print(f"Running: {request['command']} {' '.join(request['argv'])}".rstrip())
+                        status, output = state.execute(request['command'], request['argv'])
+                        connection.send({'status': status, 'output': output})
+                    except (OSError, EOFError, KeyError) as e:
+                        print(f"Dropped a request: {e!r}")
+                        continue
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if read_worker_info() and read_worker_info().get('pid') == os.getpid():
+                os.remove(WORKER_INFO_FILE)
+    print("Worker stopped.")
+    return 0
+
+def send_to_worker(request):
+    """Send one request to the running worker. Returns its exit status (2 if no worker is reachable)."""
+    from multiprocessing.connection import Client
+
+    info = read_worker_info()
+    if info is None:
+        print(f"No worker running (no {WORKER_INFO_FILE}); start one with: providers.py serve", file=sys.stderr)
+        return 2
+    try:
+        with Client(info['address'], authkey=bytes.fromhex(info['authkey'])) as connection:
+            connection.send(request)
+            reply = connection.recv()
+    except (OSError, EOFError) as e:
+        print(f"Could not reach the worker at {info['address']}: {e}. Start a new one with: providers.py serve", file=sys.stderr)
+        return 2
+    sys.stdout.write(reply['output'])
+    return reply['status']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the provider-data scripts (from the repo root).",
+        epilog="Commands:\n" + '\n'.join(f"  {name:<34}{spec['help']}" for name, spec in COMMANDS.items())
+               + f"\n  {'serve':<34}Start the resident worker.\n  {'stop':<34}Stop the resident worker.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--worker', action='store_true', help="Run the command in the resident worker (see `serve`).")
+    parser.add_argument('command', nargs='?', choices=[*COMMANDS, 'serve', 'stop'], metavar='command')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="Options passed on to the command.")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 0
+    if args.command == 'serve':
+        return serve()
+    if args.command == 'stop':
+        return send_to_worker({'stop': True})
+    if args.worker:
+        return send_to_worker({'command': args.command, 'argv': args.args, 'cwd': os.getcwd()})
+    return run_command(args.command, args.args)
+
+if __name__ == "__main__":
+    sys.exit(main())
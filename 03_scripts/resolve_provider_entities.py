@@ -0,0 +1,471 @@
+import argparse
+import csv
+import os
+import sys
+import uuid
+
+from atomic_csv import AtomicCsvWriter, rewrite_csv_in_place
+from fuzzy_matching import TrigramIndex, jaro_winkler_similarity
+from name_cleaning import clean_and_split_full_name
+from name_normalization import EMPTY_NAME_KEY, create_name_key, normalize_name_part
+from nickname_aliases import NICKNAME_ALIASES_FILE, load_nickname_index
+from npi_validation import canonicalize_npi, npi_check_digit_ok, npi_key
+from row_state import assign_row_ids, file_content_hash, load_run_state, row_content_hash, save_run_state
+from script_log import ScriptLog
+from source_registry import get_source, uses_split_name_columns
+from stage_metrics import StageMetrics
+
+# Define file paths
+truth_file = os.path.join('01_processed_data', 'new_provider_truth_file.csv')
+clusters_output_file = os.path.join('01_processed_data', 'main_provider_table', 'provider_entity_clusters.csv')
+# Per-row hashes and resolved clusters from the last run, for incremental re-matching
+state_file = os.path.join('01_processed_data', 'main_provider_table', 'provider_entity_state.json')
+log_file_path = os.path.join('03_scripts', 'resolve_provider_entities_log.txt')
+
+# Every source row becomes a node; NPI, exact-key, nickname and accepted fuzzy matches become edges.
+# Only NPI edges may join two clusters that already hold different valid NPIs; name edges between them are refused.
+# Edges are applied in EDGE_TYPES order, then by node, so which edge is refused never depends on the run.
+# First/last columns are used when present; otherwise the full-name column is cleaned and split.
+ENTITY_SOURCES = [get_source(key) for key in (
+    'legacy_airtable', 'pulse_bhi', 'pulse_counseling', 'pulse_mm', 'northshore_names', 'guidebook',
+)]
+
+FUZZY_ACCEPT_SCORE = 0.93 # Same threshold the analyzer uses to call a name a likely variant; applied to first names
+# Last names must be near-exact ('Mohuiddin'/'Mohiuddin') or one a part of the other ('Tate'/'Tate-Julu'):
+# a fuzzy score over the whole key let 'Angela Dea' match 'Angela Labedz'
+LAST_NAME_ACCEPT_SCORE = 0.96
+FUZZY_CANDIDATE_SCORE = 0.85 # Whole-key score that only nominates candidates for the per-part check
+EDGE_TYPES = ['NPI', 'Exact Name', 'Nickname', 'Fuzzy Name'] # Strongest evidence first
+CLUSTER_ID_NAMESPACE = uuid.UUID('6f1c1d2e-3c55-4b8e-9a57-0c0d3e7b9a11')
+
+CLUSTER_HEADER = ["Cluster ID", "Source", "Source Row", "First Name", "Last Name", "NPI", "Name Key", "Matched By"]
+TRUTH_UIUD_COL = "uiud"
+TRUTH_FIRST_COL = "First Name"
+TRUTH_LAST_COL = "Last Name"
+TRUTH_NPI_COL = "NPI Number"
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size (near-linear overall)."""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, node):
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]] # Path halving
+            node = parent[node]
+        return node
+
+    def union(self, node_a, node_b):
+        root_a, root_b = self.find(node_a), self.find(node_b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return True
+
+
+def load_source_records(source, log):
+    """Read one source into node records: dicts with source label, row number, names, NPI, name key and row hash."""
+    records = []
+    invalid_npi_count = 0
+    if not os.path.exists(source['path']):
+        log.warning(f"  Warning: {source['label']} file not found at {source['path']}. Skipping.")
+        return records
+    with open(source['path'], 'r', newline='', encoding='utf-8-sig') as f_in:
+        reader = csv.DictReader(f_in)
+        fieldnames = reader.fieldnames or []
+        use_name_cols = uses_split_name_columns(source, fieldnames)
+        if not use_name_cols and source['full_name_col'] not in fieldnames:
+            log.warning(f"  Warning: {source['label']} has no usable name columns. Header: {fieldnames}. Skipping.")
+            return records
+        for i, row in enumerate(reader):
+            if use_name_cols:
+                first_name = (row.get(source['first_col']) or '').strip()
+                last_name = (row.get(source['last_col']) or '').strip()
+            else:
+                first_name, last_name = clean_and_split_full_name(row.get(source['full_name_col']))
+            npi = canonicalize_npi(row.get(source['npi_col'])) if source['npi_col'] else ''
+            if npi and not npi_check_digit_ok(npi): # Never link on an NPI that fails the check digit
+                invalid_npi_count += 1
+                npi = ''
+            name_key = create_name_key(first_name, last_name)
+            if name_key == EMPTY_NAME_KEY and not npi:
+                continue
+            records.append({
+                'source': source['label'], 'row_num': i + 2, 'first': first_name, 'last': last_name,
+                'npi': npi, 'name_key': name_key,
+                # Only the fields that feed matching: other column edits never force a re-match
+                'row_hash': row_content_hash((first_name, last_name, npi)),
+            })
+    log.info(f"  Loaded {len(records)} rows from {source['label']} ({source['path']}).")
+    if invalid_npi_count:
+        log.warning(f"    Warning: Ignored {invalid_npi_count} NPIs in {source['label']} that fail the check digit.")
+    return records
+
+def settings_fingerprint():
+    """Changes to anything here besides the source rows invalidate the incremental state."""
+    return row_content_hash((
+        FUZZY_ACCEPT_SCORE, LAST_NAME_ACCEPT_SCORE, FUZZY_CANDIDATE_SCORE, EDGE_TYPES,
+        CLUSTER_ID_NAMESPACE, file_content_hash(NICKNAME_ALIASES_FILE),
+    ))
+
+def plan_incremental_run(records, previous_rows):
+    """
+    Nodes to re-resolve and stored rows that disappeared. Dirty nodes are rows whose hash is new
+    plus every surviving member of a cluster that lost a row (that cluster may now split).
+    """
+    current_row_ids = {record['row_id'] for record in records}
+    removed_rows = {row_id: stored for row_id, stored in previous_rows.items() if row_id not in current_row_ids}
+    affected_clusters = {stored['cluster_id'] for stored in removed_rows.values()}
+    dirty_nodes = [
+        node for node, record in enumerate(records)
+        if record['row_id'] not in previous_rows or previous_rows[record['row_id']]['cluster_id'] in affected_clusters
+    ]
+    return dirty_nodes, removed_rows
+
+def last_names_agree(last_a, last_b):
+    """Normalized last names that are equal, near-exact, or one a part of the other (compound surnames)."""
+    if not last_a or not last_b:
+        return False
+    if last_a == last_b or set(last_a.split()) <= set(last_b.split()) or set(last_b.split()) <= set(last_a.split()):
+        return True
+    return jaro_winkler_similarity(last_a, last_b) >= LAST_NAME_ACCEPT_SCORE
+
+def names_are_fuzzy_variants(name_a, name_b):
+    """
+    Whether two normalized (first, last) names are the same person's name: the same words split
+    differently ('Eun' 'Sun Paik' / 'Eun Sun' 'Paik'), or agreeing last names and first names
+    scoring at least FUZZY_ACCEPT_SCORE.
+    """
+    if f"{name_a[0]} {name_a[1]}".split() == f"{name_b[0]} {name_b[1]}".split():
+        return True
+    return (bool(name_a[0]) and bool(name_b[0]) and last_names_agree(name_a[1], name_b[1])
+            and jaro_winkler_similarity(name_a[0], name_b[0]) >= FUZZY_ACCEPT_SCORE)
+
+def link_records(records, log, dirty_nodes=None, previous_rows=None):
+    """
+    Union records that share an NPI or name key, or whose names are nickname/fuzzy variants.
+    Name edges never join two clusters holding different valid NPIs (two people with one name).
+    Every edge depends only on its two rows and is found from either of them, and all edges are
+    applied in one fixed order, so a run gives the same clusters whichever rows it re-resolves.
+    With `previous_rows`, the rows re-resolved are `dirty_nodes` plus every stored cluster they
+    reach through an edge (accepted or refused); the other clusters are re-joined as stored.
+    """
+    nodes_by_npi = {}
+    nodes_by_name_key = {}
+    for node, record in enumerate(records):
+        if record['npi']:
+            nodes_by_npi.setdefault(int(record['npi']), []).append(node)
+        if record['name_key'] != EMPTY_NAME_KEY:
+            nodes_by_name_key.setdefault(record['name_key'], []).append(node)
+
+    # Nickname and fuzzy edges work on distinct name keys (their first node each). The whole-key
+    # trigram neighbors only nominate candidates; first and last names are scored apart.
+    nickname_index = load_nickname_index()
+    name_key_index = TrigramIndex()
+    for name_key in nodes_by_name_key:
+        name_key_index.add(name_key)
+
+    def name_parts(name_key):
+        record = records[nodes_by_name_key[name_key][0]]
+        return normalize_name_part(record['first']), normalize_name_part(record['last'])
+
+    # Nickname variants in both directions (the alias sets are not transitive, so not always symmetric)
+    nickname_keys = {}
+    for name_key, nodes in nodes_by_name_key.items():
+        record = records[nodes[0]]
+        for variant_key in nickname_index.variant_keys(record['first'], record['last'], create_name_key):
+            if variant_key != name_key and variant_key in nodes_by_name_key:
+                nickname_keys.setdefault(name_key, set()).add(variant_key)
+                nickname_keys.setdefault(variant_key, set()).add(name_key)
+
+    def edges_of(node):
+        """(edge type, other node) of every edge touching `node`."""
+        record = records[node]
+        # Rows sharing an NPI or name key are joined in a star around the first of them
+        if record['npi']:
+            nodes = nodes_by_npi[int(record['npi'])]
+            for other in (nodes[1:] if node == nodes[0] else nodes[:1]):
+                yield 'NPI', other
+        name_key = record['name_key']
+        if name_key == EMPTY_NAME_KEY:
+            return
+        nodes = nodes_by_name_key[name_key]
+        for other in (nodes[1:] if node == nodes[0] else nodes[:1]):
+            yield 'Exact Name', other
+        if node != nodes[0]:
+            return
+        for other_key in sorted(nickname_keys.get(name_key, ())):
+            yield 'Nickname', nodes_by_name_key[other_key][0]
+        for other_key, _ in name_key_index.neighbors(name_key, min_score=FUZZY_CANDIDATE_SCORE):
+            # Scored in key order, so the answer is the same from either side
+            if other_key != name_key and names_are_fuzzy_variants(*(name_parts(key) for key in sorted((name_key, other_key)))):
+                yield 'Fuzzy Name', nodes_by_name_key[other_key][0]
+
+    # Collect the edges of every re-resolved row. A stored cluster one of them reaches is
+    # re-resolved whole, so every edge applied has both ends re-resolved.
+    members_by_cluster = {}
+    if previous_rows:
+        resolved_nodes = set(dirty_nodes)
+        for node, record in enumerate(records):
+            stored = previous_rows.get(record['row_id'])
+            if stored:
+                members_by_cluster.setdefault(stored['cluster_id'], []).append(node)
+    else:
+        resolved_nodes = set(range(len(records)))
+    pending = sorted(resolved_nodes)
+    edges = set() # (position in EDGE_TYPES, smaller node, larger node)
+    while pending:
+        node = pending.pop()
+        for edge_type, other in edges_of(node):
+            edges.add((EDGE_TYPES.index(edge_type), min(node, other), max(node, other)))
+            if other not in resolved_nodes:
+                for member in members_by_cluster[previous_rows[records[other]['row_id']]['cluster_id']]:
+                    if member not in resolved_nodes:
+                        resolved_nodes.add(member)
+                        pending.append(member)
+    if previous_rows:
+        log.info(f"  Re-resolving {len(resolved_nodes)} rows: the changed ones and every stored cluster they reach.")
+
+    union_find = UnionFind(len(records))
+    matched_by = [set() for _ in records]
+    # Valid NPIs of each cluster, kept at its union-find root
+    npis_by_root = {node: {record['npi']} for node, record in enumerate(records) if record['npi']}
+    edge_counts = {edge_type: 0 for edge_type in EDGE_TYPES}
+    refused_counts = {edge_type: 0 for edge_type in EDGE_TYPES}
+
+    def union(node_a, node_b):
+        root_a, root_b = union_find.find(node_a), union_find.find(node_b)
+        if not union_find.union(root_a, root_b):
+            return False
+        npis = npis_by_root.pop(root_a, set()) | npis_by_root.pop(root_b, set())
+        if npis:
+            npis_by_root[union_find.find(root_a)] = npis
+        return True
+
+    def add_edge(node_a, node_b, edge_type):
+        if edge_type != 'NPI':
+            npis = npis_by_root.get(union_find.find(node_a), set()) | npis_by_root.get(union_find.find(node_b), set())
+            if len(npis) > 1:
+                refused_counts[edge_type] += 1
+                return
+        matched_by[node_a].add(edge_type)
+        matched_by[node_b].add(edge_type)
+        if union(node_a, node_b):
+            edge_counts[edge_type] += 1
+
+    if previous_rows:
+        first_node_by_cluster = {}
+        for node, record in enumerate(records):
+            if node in resolved_nodes:
+                continue
+            stored = previous_rows[record['row_id']]
+            matched_by[node].update(stored['matched_by'])
+            union(first_node_by_cluster.setdefault(stored['cluster_id'], node), node)
+
+    for edge_rank, node_a, node_b in sorted(edges):
+        add_edge(node_a, node_b, EDGE_TYPES[edge_rank])
+
+    for edge_type, count in edge_counts.items():
+        log.info(f"  {edge_type} edges that merged two clusters: {count}")
+        if refused_counts[edge_type]:
+            log.info(f"    Refused {refused_counts[edge_type]} {edge_type} edges between clusters with different NPIs")
+    return union_find, matched_by
+
+def assign_cluster_ids(records, union_find):
+    """One stable ID per connected component, derived from its smallest NPI (or smallest name key)."""
+    members_by_root = {}
+    for node in range(len(records)):
+        members_by_root.setdefault(union_find.find(node), []).append(node)
+    cluster_id_by_root = {}
+    for root, members in members_by_root.items():
+        npis = sorted(records[m]['npi'] for m in members if records[m]['npi'])
+        anchor = f"npi:{npis[0]}" if npis else f"name:{min(records[m]['name_key'] for m in members)}"
+        cluster_id_by_root[root] = str(uuid.uuid5(CLUSTER_ID_NAMESPACE, anchor))
+    return [cluster_id_by_root[union_find.find(node)] for node in range(len(records))]
+
+def find_dirty_clusters(records, cluster_ids, dirty_nodes, previous_rows, removed_rows):
+    """
+    Old and new IDs of every cluster an incremental run may have changed: those holding a
+    re-resolved row, those whose ID changed for any member, and those that lost a row.
+    """
+    dirty_clusters = {stored['cluster_id'] for stored in removed_rows.values()}
+    for node in dirty_nodes:
+        dirty_clusters.add(cluster_ids[node])
+        stored = previous_rows.get(records[node]['row_id'])
+        if stored:
+            dirty_clusters.add(stored['cluster_id'])
+    for record, cluster_id in zip(records, cluster_ids):
+        stored = previous_rows.get(record['row_id'])
+        if stored and stored['cluster_id'] != cluster_id:
+            dirty_clusters.update((stored['cluster_id'], cluster_id))
+    return dirty_clusters
+
+def update_truth_uiuds(records, cluster_ids, log, dirty_clusters=None):
+    """
+    Fill the truth file's uiud column with the cluster ID found by NPI, then by name key.
+    When dirty_clusters is given, only truth rows whose current uiud or resolved cluster is one
+    of those IDs are re-assigned; the others keep their uiud.
+    """
+    cluster_by_npi = {}
+    cluster_by_name_key = {}
+    for record, cluster_id in zip(records, cluster_ids):
+        if record['npi']:
+            cluster_by_npi.setdefault(int(record['npi']), cluster_id)
+        if record['name_key'] != EMPTY_NAME_KEY:
+            cluster_by_name_key.setdefault(record['name_key'], cluster_id)
+
+    incremental = dirty_clusters is not None
+    counts = {'assigned': 0, 'rows': 0}
+
+    def assign_uiuds(header, rows):
+        if TRUTH_UIUD_COL not in header:
+            raise ValueError(f"{truth_file} has no '{TRUTH_UIUD_COL}' column")
+        uiud_idx = header.index(TRUTH_UIUD_COL)
+        column_idx = {col: header.index(col) for col in (TRUTH_UIUD_COL, TRUTH_NPI_COL, TRUTH_FIRST_COL, TRUTH_LAST_COL) if col in header}
+
+        def cell(row, col):
+            idx = column_idx.get(col)
+            return row[idx] if idx is not None and idx < len(row) else None
+
+        def updated_rows():
+            for i, row in enumerate(rows):
+                counts['rows'] += 1
+                npi = npi_key(cell(row, TRUTH_NPI_COL))
+                name_key = create_name_key(cell(row, TRUTH_FIRST_COL), cell(row, TRUTH_LAST_COL))
+                cluster_id = cluster_by_npi.get(npi)
+                if not cluster_id:
+                    cluster_id = cluster_by_name_key.get(name_key)
+                if incremental and cluster_id not in dirty_clusters and cell(row, TRUTH_UIUD_COL) not in dirty_clusters:
+                    yield row
+                    continue
+                if cluster_id:
+                    row = row + [''] * (uiud_idx + 1 - len(row))
+                    row[uiud_idx] = cluster_id
+                    counts['assigned'] += 1
+                else:
+                    log.sample('Truth row without a cluster', f"  Warning: Truth row {i+2} ('{cell(row, TRUTH_FIRST_COL)}', '{cell(row, TRUTH_LAST_COL)}') matched no cluster.")
+                yield row
+
+        return header, updated_rows()
+
+    # Streamed row by row into a temp file that replaces the truth file only once complete
+    try:
+        rewrite_csv_in_place(truth_file, assign_uiuds)
+    except ValueError as e:
+        log.error(f"  Error: {e}. Truth file not updated.")
+        return
+    log.info(f"  Assigned cluster IDs to {counts['assigned']} of {counts['rows']} truth rows in {truth_file}.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cluster provider rows from every source into entities.")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the stored row state and re-resolve every row.")
+    parser.add_argument('--check-full', action='store_true',
+                        help="After an incremental run, also re-resolve every row and fail (exit 1) on any row whose cluster differs.")
+    args = parser.parse_args(argv)
+
+    with ScriptLog(log_file_path) as log, StageMetrics('resolve_provider_entities', log_file_path) as metrics:
+        log.info("--- Running script: resolve_provider_entities.py ---")
+
+        # --- Step 1: Load every source row as a node ---
+        records = []
+        with metrics.phase('load'):
+            for source in ENTITY_SOURCES:
+                records.extend(load_source_records(source, log))
+        if not records:
+            log.error("FATAL ERROR: No provider rows loaded from any source. Exiting.")
+            return
+        row_ids = assign_row_ids((record['source'], record['row_hash']) for record in records)
+        for record, row_id in zip(records, row_ids):
+            record['row_id'] = row_id
+        log.info(f"Loaded {len(records)} provider rows in total.")
+        metrics.count('rows_in', len(records))
+
+        # --- Step 2: Decide between a full and an incremental run ---
+        fingerprint = settings_fingerprint()
+        previous_rows = None if args.full else load_run_state(state_file, fingerprint)
+        if previous_rows is None:
+            dirty_nodes, removed_rows = list(range(len(records))), {}
+            log.info("\nFull run: no usable row state (or --full given); resolving every row.")
+        else:
+            dirty_nodes, removed_rows = plan_incremental_run(records, previous_rows)
+            log.info(f"\nIncremental run: {len(dirty_nodes)} rows to re-resolve, "
+                      f"{len(removed_rows)} rows removed since the last run.")
+
+        # --- Step 3: Link and cluster ---
+        log.info("\nLinking rows by NPI, exact name key, nickname and fuzzy name match...")
+        with metrics.phase('match'):
+            union_find, matched_by = link_records(records, log, dirty_nodes, previous_rows)
+            cluster_ids = assign_cluster_ids(records, union_find)
+        check_failed = False
+        if args.check_full and previous_rows is not None:
+            log.info("\nChecking the incremental result against a full re-resolution...")
+            full_union_find, full_matched_by = link_records(records, log)
+            full_cluster_ids = assign_cluster_ids(records, full_union_find)
+            mismatches = [node for node in range(len(records))
+                          if (cluster_ids[node], matched_by[node]) != (full_cluster_ids[node], full_matched_by[node])]
+            for node in mismatches:
+                record = records[node]
+                log.sample('Incremental/full mismatch', f"  Mismatch: {record['source']} row {record['row_num']} ('{record['first']}', '{record['last']}'): "
+                           f"incremental {cluster_ids[node]} {sorted(matched_by[node])}, full {full_cluster_ids[node]} {sorted(full_matched_by[node])}")
+            if mismatches:
+                log.error(f"  Check failed: {len(mismatches)} rows differ from a full run. Writing the full result.")
+                cluster_ids, matched_by = full_cluster_ids, full_matched_by
+                check_failed = True
+            else:
+                log.info(f"  Check passed: all {len(records)} rows have the same cluster as in a full run.")
+        cluster_count = len(set(cluster_ids))
+        log.info(f"Resolved {len(records)} rows into {cluster_count} provider clusters.")
+
+        # --- Step 4: Write cluster assignments and the row state for the next run ---
+        with metrics.phase('write'):
+            with AtomicCsvWriter(clusters_output_file) as writer:
+                writer.writerow(CLUSTER_HEADER)
+                for record, cluster_id, edge_types in zip(records, cluster_ids, matched_by):
+                    writer.writerow([
+                        cluster_id, record['source'], record['row_num'], record['first'], record['last'],
+                        record['npi'], record['name_key'], ';#'.join(sorted(edge_types)),
+                    ])
+            log.info(f"Wrote {len(records)} cluster assignments to {clusters_output_file}")
+            save_run_state(state_file, fingerprint, {
+                record['row_id']: {
+                    'cluster_id': cluster_id, 'matched_by': sorted(edge_types),
+                    'npi': record['npi'], 'name_key': record['name_key'],
+                }
+                for record, cluster_id, edge_types in zip(records, cluster_ids, matched_by)
+            })
+
+            # --- Step 5: Give the truth file's uiud column the cluster ID ---
+            if not os.path.exists(truth_file):
+                log.info(f"\nTruth file not found at {truth_file}. Skipping uiud update.")
+            elif previous_rows is None:
+                log.info(f"\nUpdating '{TRUTH_UIUD_COL}' in {truth_file}")
+                update_truth_uiuds(records, cluster_ids, log)
+            elif dirty_nodes or removed_rows:
+                # Every member of a changed cluster may need the new ID, not only rows sharing a changed row's NPI or name
+                dirty_clusters = find_dirty_clusters(records, cluster_ids, dirty_nodes, previous_rows, removed_rows)
+                log.info(f"\nUpdating '{TRUTH_UIUD_COL}' in {truth_file} for truth rows in {len(dirty_clusters)} changed cluster IDs")
+                update_truth_uiuds(records, cluster_ids, log, dirty_clusters)
+            else:
+                log.info(f"\nNo source rows changed since the last run. '{TRUTH_UIUD_COL}' left as is.")
+
+        # --- Final Summary ---
+        log.info("\n--- Resolve Provider Entities Summary ---")
+        log.info(f"Provider rows loaded: {len(records)}")
+        log.info(f"Provider rows re-resolved: {len(dirty_nodes)}")
+        log.info(f"Provider clusters: {cluster_count}")
+        metrics.count('rows_out', len(records))
+        metrics.count('rows_re_resolved', len(dirty_nodes))
+        metrics.count('clusters', cluster_count)
+        log.info("\n--- Script resolve_provider_entities.py finished ---")
+    return 1 if check_failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
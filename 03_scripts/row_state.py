@@ -0,0 +1,69 @@
+"""
+Per-row content hashes and persisted run state for incremental re-matching.
+
+A script that resolves source rows stores, per row, a hash of the fields that feed matching
+together with the result it resolved. On the next run only rows whose hash is new (plus
+anything the script decides they touched) need to be matched again; rows whose hash is
+unchanged reuse their stored result. The state file also records a settings fingerprint so
+a change to thresholds or alias data forces a full run instead of mixing old and new results.
+"""
+import hashlib
+import json
+import os
+
+STATE_FORMAT_VERSION = 1
+ROW_HASH_SEPARATOR = '\x1f' # Unit separator: cannot appear in CSV cell text we hash
+
+
+def row_content_hash(values):
+    """Stable hex digest of a sequence of cell values (None counts as empty)."""
+    joined = ROW_HASH_SEPARATOR.join('' if v is None else str(v) for v in values)
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()
+
+def file_content_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes, read in chunks. Returns '' if the file is missing."""
+    if not os.path.exists(path):
+        return ''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f_in:
+        for chunk in iter(lambda: f_in.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def assign_row_ids(prefixes_and_hashes):
+    """
+    Row IDs "<prefix>|<hash>|<n>" for (prefix, hash) pairs, where n numbers identical rows,
+    so an ID survives rows being reordered or inserted elsewhere in the file.
+    """
+    seen = {}
+    row_ids = []
+    for prefix, content_hash in prefixes_and_hashes:
+        base = f"{prefix}|{content_hash}"
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        row_ids.append(f"{base}|{occurrence}")
+    return row_ids
+
+def load_run_state(path, settings_fingerprint):
+    """
+    Stored {row_id: result} from the last run, or None when there is no usable state
+    (missing, unreadable, older format, or produced with different settings).
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f_state:
+            state = json.load(f_state)
+    except (OSError, ValueError):
+        return None
+    if state.get('version') != STATE_FORMAT_VERSION or state.get('settings') != settings_fingerprint:
+        return None
+    rows = state.get('rows')
+    return rows if isinstance(rows, dict) else None
+
+def save_run_state(path, settings_fingerprint, rows):
+    """Write the state atomically (temp file in the same directory, then os.replace)."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f_state:
+        json.dump({'version': STATE_FORMAT_VERSION, 'settings': settings_fingerprint, 'rows': rows}, f_state)
+    os.replace(temp_path, path)
@@ -0,0 +1,191 @@
+import argparse
+import importlib
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from provider_workspace import ProviderWorkspace
+from row_state import file_content_hash, load_run_state, row_content_hash, save_run_state
+from script_log import ScriptLog
+from stage_metrics import StageMetrics
+
+# Define file paths
+scripts_dir = '03_scripts'
+northshore_names_file = os.path.join('05_airtable_and_mapping', '03_northshore', 'northshore_names.csv')
+guidebook_file = os.path.join('00_source_data', 'guidebook', 'guidebook.csv')
+consolidated_names_file = os.path.join('05_airtable_and_mapping', '02_pulse', 'pulse_consolidated_names.csv')
+pulse_bhi_file = os.path.join('00_source_data', 'pulse_data', 'pulse_bhi', 'pulse_bhi.csv')
+pulse_counseling_file = os.path.join('00_source_data', 'pulse_data', 'pulse_counseling', 'pulse_counseling.csv')
+pulse_mm_file = os.path.join('00_source_data', 'pulse_data', 'pulse_mm', 'pulse_mm.csv')
+working_airtable_file = os.path.join('05_airtable_and_mapping', 'working_airtable.csv')
+state_file = os.path.join(scripts_dir, 'run_pipeline_state.json')
+log_file_path = os.path.join(scripts_dir, 'run_pipeline_log.txt')
+
+# Active stages in their hand-run order. Dependencies are derived from the declared files:
+# a stage waits for every earlier stage that writes a file it reads or writes, or that reads
+# a file it writes. Stages that share no files (the Northshore and Pulse branches) run concurrently.
+# Every stage runs in this process against one ProviderWorkspace, so each CSV is parsed once
+# and every modified file is written once, after the last stage. A stage's run(workspace)
+# returns False when it stopped on an error (after logging it); that counts as a failure.
+PIPELINE_STAGES = [
+    {'name': 'correct_northshore_names', 'script': 'correct_northshore_names.py',
+     'inputs': [northshore_names_file], 'outputs': [northshore_names_file]},
+    {'name': 'add_internal_label_to_northshore', 'script': 'add_internal_label_to_northshore.py',
+     'inputs': [guidebook_file, northshore_names_file], 'outputs': [northshore_names_file]},
+    {'name': 'update_guidebook_names_from_northshore', 'script': 'update_guidebook_names_from_northshore.py',
+     'inputs': [northshore_names_file, guidebook_file], 'outputs': [guidebook_file]},
+    {'name': 'split_pulse_names', 'script': 'split_pulse_names.py',
+     'inputs': [consolidated_names_file, pulse_bhi_file, pulse_counseling_file, pulse_mm_file],
+     'outputs': [pulse_bhi_file, pulse_counseling_file, pulse_mm_file]},
+    {'name': 'update_pulse_labels', 'script': 'update_pulse_labels.py',
+     'inputs': [consolidated_names_file], 'outputs': [consolidated_names_file]},
+    {'name': 'create_working_airtable', 'script': 'create_working_airtable.py',
+     'inputs': [consolidated_names_file, northshore_names_file], 'outputs': [working_airtable_file]},
+]
+
+LOCAL_IMPORT_PATTERN = re.compile(r"^\s*(?:from\s+(\w+)\s+import|import\s+(\w+))", re.MULTILINE)
+
+def stage_dependencies(stages):
+    """Map stage name -> names of earlier stages it must wait for (read/write conflicts on declared files)."""
+    dependencies = {}
+    for i, stage in enumerate(stages):
+        reads, writes = set(stage['inputs']), set(stage['outputs'])
+        dependencies[stage['name']] = {
+            earlier['name'] for earlier in stages[:i]
+            if set(earlier['outputs']) & (reads | writes) or set(earlier['inputs']) & writes
+        }
+    return dependencies
+
+def stage_code_files(script_path):
+    """The stage script plus the shared 03_scripts modules it imports (transitively)."""
+    code_files = []
+    pending = [script_path]
+    while pending:
+        path = pending.pop()
+        if path in code_files or not os.path.exists(path):
+            continue
+        code_files.append(path)
+        with open(path, 'r', encoding='utf-8') as f_code:
+            for from_name, import_name in LOCAL_IMPORT_PATTERN.findall(f_code.read()):
+                pending.append(os.path.join(scripts_dir, f"{from_name or import_name}.py"))
+    return sorted(code_files)
+
+def stage_file_hashes(stage, workspace):
+    """Content hash of every file that decides whether the stage is up to date (data files as they will be after flush)."""
+    data_paths = set(stage['inputs']) | set(stage['outputs'])
+    code_paths = set(stage_code_files(os.path.join(scripts_dir, stage['script']))) - data_paths
+    hashes = {path: workspace.content_hash(path) for path in data_paths}
+    hashes.update({path: file_content_hash(path) for path in code_paths})
+    return dict(sorted(hashes.items()))
+
+def run_stage(stage, workspace):
+    """Import the stage module and call its run(workspace); returns (error text or None, seconds)."""
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(os.path.splitext(stage['script'])[0])
+        if module.run(workspace):
+            error = None
+        else:
+            error = f"{stage['script']} stopped on an error (details in its log).\n"
+    except Exception:
+        error = traceback.format_exc()
+    return error, time.perf_counter() - started
+
+def main(argv=None, workspace=None):
+    parser = argparse.ArgumentParser(description="Run the active provider-data stages in dependency order.")
+    parser.add_argument('--force', action='store_true', help="Run every stage even if its files are unchanged.")
+    parser.add_argument('--dry-run', action='store_true', help="Only report which stages would run.")
+    parser.add_argument('--jobs', type=int, default=2, help="Maximum stages to run at once (default: 2).")
+    args = parser.parse_args(argv)
+
+    dependencies = stage_dependencies(PIPELINE_STAGES)
+    stages_by_name = {stage['name']: stage for stage in PIPELINE_STAGES}
+    settings = row_content_hash(repr(PIPELINE_STAGES))
+    previous_hashes = (None if args.force else load_run_state(state_file, settings)) or {}
+    recorded_hashes = dict(previous_hashes)
+
+    with ScriptLog(log_file_path) as log, StageMetrics('run_pipeline', log_file_path) as metrics:
+        log.info("--- Running script: run_pipeline.py ---")
+        for stage in PIPELINE_STAGES:
+            waits_for = ', '.join(sorted(dependencies[stage['name']])) or '(nothing)'
+            log.info(f"  {stage['name']} waits for: {waits_for}")
+
+        workspace = workspace if workspace is not None else ProviderWorkspace() # The providers.py worker passes its warm one
+        finished, failed, ran, skipped = set(), set(), [], []
+        failed_outputs = set() # Tables a failed stage may have left half-updated
+        pending = [stage['name'] for stage in PIPELINE_STAGES]
+        running = {}
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            while pending or running:
+                # Decide (just before starting it) whether each ready stage is up to date
+                for name in list(pending):
+                    if not dependencies[name] <= finished | failed:
+                        continue
+                    pending.remove(name)
+                    if dependencies[name] & failed:
+                        log.warning(f"\nNot running {name}: an upstream stage failed.")
+                        failed.add(name)
+                        continue
+                    upstream_would_run = dependencies[name] & set(ran) if args.dry_run else set()
+                    if upstream_would_run: # Its inputs would change, whatever their hashes are now
+                        log.info(f"\nWould run {name} (after {', '.join(sorted(upstream_would_run))}).")
+                        ran.append(name)
+                        finished.add(name)
+                        continue
+                    current_hashes = stage_file_hashes(stages_by_name[name], workspace)
+                    if current_hashes == previous_hashes.get(name):
+                        log.info(f"\nSkipping {name}: inputs, outputs and code unchanged since its last run.")
+                        skipped.append(name)
+                        finished.add(name)
+                    elif args.dry_run:
+                        log.info(f"\nWould run {name}.")
+                        ran.append(name)
+                        finished.add(name)
+                    else:
+                        log.info(f"\nStarting {name} ...")
+                        running[executor.submit(run_stage, stages_by_name[name], workspace)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error, seconds = future.result()
+                    metrics.record_phase(name, seconds) # Per-stage wall time; the stage's own phases are in its *_metrics.json
+                    if error is None:
+                        log.info(f"\nFinished {name} in {seconds:.2f}s.")
+                        recorded_hashes[name] = stage_file_hashes(stages_by_name[name], workspace) # State after the run
+                        ran.append(name)
+                        finished.add(name)
+                    else:
+                        log.error(f"\n{name} failed after {seconds:.2f}s:\n{error.rstrip()}")
+                        recorded_hashes.pop(name, None)
+                        failed.add(name)
+                        failed_outputs.update(stages_by_name[name]['outputs'])
+
+        if not args.dry_run:
+            # A failed stage's tables are dropped, not written (a finished stage sharing one reruns next time)
+            for path in workspace.discard_changes(failed_outputs):
+                log.warning(f"Not writing {path}: a stage that writes it failed.")
+            # Single write of every table the finished stages changed, then the hashes that describe it
+            with metrics.phase('write'):
+                for path in workspace.flush():
+                    log.info(f"Wrote {path}")
+                    metrics.count('files_written')
+            save_run_state(state_file, settings, recorded_hashes)
+
+        # --- Final Summary ---
+        log.info("\n--- Pipeline Summary ---")
+        log.info(f"{'Would run' if args.dry_run else 'Ran'}: {', '.join(ran) or 'none'}")
+        log.info(f"Skipped (up to date): {', '.join(skipped) or 'none'}")
+        log.info(f"Failed or blocked: {', '.join(sorted(failed)) or 'none'}")
+        metrics.count('stages_ran', len(ran))
+        metrics.count('stages_skipped', len(skipped))
+        metrics.count('stages_failed', len(failed))
+        log.info("\n--- Script run_pipeline.py finished ---")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Leveled, buffered logging for the pipeline scripts.
+
+Every script used to call write_log(message, handle) - a print plus a file write - once per
+row warning, so big inputs filled the *_log.txt files with thousands of near-identical
+"not found" lines and console I/O dominated the run. ScriptLog replaces it:
+
+    with ScriptLog(log_file_path) as log:
+        log.info("--- Running script: x.py ---")
+        for i, row in enumerate(rows):
+            ...
+            log.sample('Name not found', f"  Warning: Row {i+2} - '{name}' not found.")
+    # on exit: "Name not found: 4127 occurrences (first 5 shown)" and the file is closed
+
+- Levels: debug/info/warning/error. Lines below `level` are dropped; lines below
+  `console_level` go to the file only.
+- sample(category, message) counts every occurrence of a warning class but only writes
+  the first `examples_per_category`; close() adds one aggregate line per class that
+  overflowed, so the log still says what went wrong and how often.
+- Formatting happens in the caller; the file and console writes happen on a background
+  thread fed by a queue, with buffered file output.
+
+Log lines are written exactly as given (no level prefixes), so the files read as before.
+"""
+import queue
+import sys
+import threading
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+# Occurrences of each sampled warning class written in full before only counting
+DEFAULT_EXAMPLES_PER_CATEGORY = 5
+
+_STOP = object() # Queue sentinel that ends the writer thread
+
+
+class ScriptLog:
+    """One script run's log file (and console echo), written by a background thread."""
+
+    def __init__(self, path, level=INFO, console_level=INFO, examples_per_category=DEFAULT_EXAMPLES_PER_CATEGORY, console=None):
+        self.path = path
+        self.level = level
+        self.console_level = console_level
+        self.examples_per_category = examples_per_category
+        self._console = console if console is not None else sys.stdout
+        self._counts = {}   # category -> occurrences
+        self._levels = {}   # category -> level of its aggregate line
+        self._counts_lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._thread = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def open(self):
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._thread = threading.Thread(target=self._drain, name=f"ScriptLog({self.path})", daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            level, message = item
+            self._file.write(message + '\n')
+            if level >= self.console_level:
+                self._console.write(message + '\n')
+        self._file.flush()
+        self._console.flush()
+
+    def log(self, level, message):
+        if level >= self.level:
+            self._queue.put((level, message))
+
+    def debug(self, message):
+        self.log(DEBUG, message)
+
+    def info(self, message):
+        self.log(INFO, message)
+
+    def warning(self, message):
+        self.log(WARNING, message)
+
+    def error(self, message):
+        self.log(ERROR, message)
+
+    def sample(self, category, message, level=WARNING):
+        """Count one occurrence of `category`; write `message` only for its first examples_per_category occurrences."""
+        with self._counts_lock:
+            count = self._counts.get(category, 0) + 1
+            self._counts[category] = count
+            self._levels.setdefault(category, level)
+        if count <= self.examples_per_category:
+            self.log(level, message)
+
+    def count(self, category):
+        """Occurrences of `category` so far."""
+        with self._counts_lock:
+            return self._counts.get(category, 0)
+
+    def category_counts(self):
+        with self._counts_lock:
+            return dict(self._counts)
+
+    def write_category_summary(self):
+        """One aggregate line per sampled category that had more occurrences than were written."""
+        with self._counts_lock:
+            overflowed = [(category, count) for category, count in self._counts.items() if count > self.examples_per_category]
+        if not overflowed:
+            return
+        self.info("\n--- Repeated messages (only the first examples were logged) ---")
+        for category, count in sorted(overflowed):
+            self.log(self._levels[category], f"{category}: {count} occurrences (first {self.examples_per_category} shown)")
+
+    def close(self):
+        if self._thread is None:
+            return
+        self.write_category_summary()
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+        self._thread = None
@@ -0,0 +1,151 @@
+"""
+One declaration of every provider source file, and the loader that projects it.
+
+FILES_TO_CHECK (name_consistency_analyzer), source_files_config (add_salesforce_credentials),
+ENTITY_SOURCES (resolve_provider_entities) and the Pulse scripts' files_to_process each
+described the same files again, and the pandas readers loaded every column of them as
+inferred/object dtype. SOURCES now declares each source once:
+
+    'label'                   display label (also the Source value of entity clusters)
+    'path'                    CSV path relative to the repo root
+    'first_col', 'last_col'   split name columns (used when both are in the file)
+    'full_name_col'           free-form name column (cleaned and split otherwise)
+    'npi_col'                 NPI column or None
+    'credential_col'          free-text credentials column or None
+    'pulse_label'             BHI / Counseling / MM for the Pulse exports, else None
+    'multi_value_separators'  {column: separator} for multi-valued cells
+    'dtypes'                  {column: 'category'} for low-cardinality columns; every other
+                              column is read as pandas' string dtype
+
+read_source() loads only the columns a stage asks for (explicit names and/or the roles
+above), through the parse cache, with those dtypes:
+
+    df_legacy = read_source('legacy_airtable', roles=('names', 'npi'), columns=[LEGACY_WEB])
+"""
+import os
+
+from parse_cache import read_csv_cached
+
+PULSE_MULTI_VALUE_SEPARATOR = ';#'
+LEGACY_MULTI_VALUE_SEPARATOR = ','
+
+SOURCES = {
+    'legacy_airtable': {
+        'label': 'Legacy Airtable',
+        'path': os.path.join('00_source_data', 'airtable_monolithic', 'Providers-All Providers.csv'),
+        'first_col': 'First Name', 'last_col': 'Last Name', 'full_name_col': 'Provider Full Name',
+        'npi_col': 'National Provider Identifier (NPI)', 'credential_col': 'Credentials', 'pulse_label': None,
+        'multi_value_separators': dict.fromkeys([
+            'Languages', 'Ages Seen', 'Clinical Interests - Legacy Sites', 'Clinical Focus', 'Conditions Treated',
+            'Treatment Modalities', 'LOMG Grid - Ages Treated', 'LOMG Grid - Specialties', 'LOMG Grid - Do NOT Refer',
+        ], LEGACY_MULTI_VALUE_SEPARATOR),
+        'dtypes': dict.fromkeys([
+            'Legacy Region', 'Gender', 'Pronouns', 'Video', 'Web Specialty', 'Provider Type',
+            'Level(s) of Care - BHSL List', 'LOMG Grid - Label', 'LOMG Grid - Location', 'LOMG Grid - Availability',
+            'LOMG Grid - Soonest Availability',
+        ], 'category'),
+    },
+    'pulse_bhi': {
+        'label': 'Pulse BHI',
+        'path': os.path.join('00_source_data', 'pulse_data', 'pulse_bhi', 'pulse_bhi.csv'),
+        'first_col': 'First Name', 'last_col': 'Last Name', 'full_name_col': 'Provider Name',
+        'npi_col': None, 'credential_col': 'Credentials', 'pulse_label': 'BHI',
+        'multi_value_separators': dict.fromkeys(
+            ['Availability', 'Services Offered', 'Ages', 'Specialities/Preference', 'Do Not Refer'], PULSE_MULTI_VALUE_SEPARATOR),
+        'dtypes': dict.fromkeys(['Title', 'Therapist Gender', 'EEMG Practice'], 'category'),
+    },
+    'pulse_counseling': {
+        'label': 'Pulse Counseling',
+        'path': os.path.join('00_source_data', 'pulse_data', 'pulse_counseling', 'pulse_counseling.csv'),
+        'first_col': 'First Name', 'last_col': 'Last Name', 'full_name_col': 'Therapist Name',
+        'npi_col': None, 'credential_col': 'Credentials', 'pulse_label': 'Counseling',
+        'multi_value_separators': dict.fromkeys(
+            ['Ages', 'Specialties/Preferences', 'DO NOT Refer'], PULSE_MULTI_VALUE_SEPARATOR),
+        'dtypes': dict.fromkeys(['Title', 'Availability', 'Location', 'CT Gender ID'], 'category'),
+    },
+    'pulse_mm': {
+        'label': 'Pulse MM',
+        'path': os.path.join('00_source_data', 'pulse_data', 'pulse_mm', 'pulse_mm.csv'),
+        'first_col': 'First Name', 'last_col': 'Last Name', 'full_name_col': 'Provider Name',
+        'npi_col': None, 'credential_col': 'Credentials', 'pulse_label': 'MM',
+        'multi_value_separators': dict.fromkeys(
+            ['Availability', 'Specialties', 'Do NOT Refer'], PULSE_MULTI_VALUE_SEPARATOR),
+        'dtypes': dict.fromkeys(['Title', 'Location', 'Gender', 'Soonest Availability'], 'category'),
+    },
+    'northshore_names': {
+        'label': 'Northshore',
+        'path': os.path.join('05_airtable_and_mapping', '03_northshore', 'northshore_names.csv'),
+        'first_col': 'First Name', 'last_col': 'Last Name', 'full_name_col': None,
+        'npi_col': None, 'credential_col': None, 'pulse_label': None,
+        'multi_value_separators': {},
+        'dtypes': {'Internal Label': 'category'},
+    },
+    'guidebook': {
+        'label': 'Guidebook',
+        'path': os.path.join('00_source_data', 'guidebook', 'guidebook.csv'),
+        'first_col': 'First Name', 'last_col': 'Last Name', 'full_name_col': 'Provider Name (hyperlink to Practice Brochure)',
+        'npi_col': None, 'credential_col': None, 'pulse_label': None,
+        'multi_value_separators': {'Specialized Services Offered': ';'},
+        'dtypes': dict.fromkeys(['Internal Label', 'Dept Code', 'Location', 'Status'], 'category'),
+    },
+    'providers_with_uids': {
+        'label': 'Providers with UIDs',
+        'path': os.path.join('01_processed_data', 'main_provider_table', '01_providers_with_uids.csv'),
+        'first_col': 'First Name', 'last_col': 'Last Name', 'full_name_col': 'Provider Full Name',
+        'npi_col': 'National Provider Identifier (NPI)', 'credential_col': 'Credentials', 'pulse_label': None,
+        'multi_value_separators': {},
+        'dtypes': {},
+    },
+}
+
+# The three Pulse exports, in their usual processing order
+PULSE_SOURCE_KEYS = ['pulse_bhi', 'pulse_counseling', 'pulse_mm']
+
+# Columns each role of read_source() stands for
+SOURCE_ROLES = {
+    'names': ('first_col', 'last_col', 'full_name_col'),
+    'npi': ('npi_col',),
+    'credential': ('credential_col',),
+}
+
+
+def get_source(key):
+    """The registry entry for `key`. Raises KeyError naming the known sources."""
+    try:
+        return SOURCES[key]
+    except KeyError:
+        raise KeyError(f"Unknown source '{key}'. Known sources: {', '.join(SOURCES)}") from None
+
+def source_columns(source, roles=(), columns=()):
+    """Column names for `roles` (keys of SOURCE_ROLES) plus `columns`, without duplicates, in that order."""
+    selected = []
+    for role in roles:
+        for field in SOURCE_ROLES[role]:
+            if source[field] and source[field] not in selected:
+                selected.append(source[field])
+    selected.extend(column for column in columns if column not in selected)
+    return selected
+
+def uses_split_name_columns(source, available_columns):
+    """True if the file has both split name columns (use them); False means clean and split full_name_col."""
+    return source['first_col'] in available_columns and source['last_col'] in available_columns
+
+def read_source(key, roles=(), columns=(), **read_csv_kwargs):
+    """
+    DataFrame of source `key` with only the columns for `roles` and `columns` (all columns if
+    neither is given). Columns the file lacks are left out, so callers check for what they need.
+    Declared category columns are categorical; all others use the string dtype.
+    """
+    source = get_source(key)
+    wanted = set(source_columns(source, roles, columns))
+    df = read_csv_cached(source['path'], dtype=str, usecols=(lambda column: column in wanted) if wanted else None, **read_csv_kwargs)
+    categorical = {column: dtype for column, dtype in source['dtypes'].items() if column in df.columns}
+    return df.astype(categorical) if categorical else df
+
+def split_multi_value(source, column, value):
+    """The stripped, non-empty items of one multi-valued cell (the whole cell if `column` is single-valued)."""
+    if not isinstance(value, str):
+        return []
+    separator = source['multi_value_separators'].get(column)
+    items = value.split(separator) if separator else [value]
+    return [item.strip() for item in items if item.strip()]
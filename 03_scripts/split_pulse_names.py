@@ -1,161 +1,194 @@
-import csv
+import argparse
 import os
 import re
+import sys
+
+from name_normalization import create_full_name_key, normalize_full_name
+from parallel_files import default_jobs, iter_chunks, iter_task_results, merge_counters
+from provider_workspace import ProviderWorkspace
+from script_log import ScriptLog
+from source_registry import PULSE_SOURCE_KEYS, get_source
+from stage_metrics import StageMetrics
 
 # Define file paths
 consolidated_names_file = os.path.join('05_airtable_and_mapping', '02_pulse', 'pulse_consolidated_names.csv')
-pulse_bhi_file = os.path.join('00_source_data', 'pulse_data', 'pulse_bhi', 'pulse_bhi.csv')
-pulse_counseling_file = os.path.join('00_source_data', 'pulse_data', 'pulse_counseling', 'pulse_counseling.csv')
-pulse_mm_file = os.path.join('00_source_data', 'pulse_data', 'pulse_mm', 'pulse_mm.csv')
 log_file_path = os.path.join('03_scripts', 'split_pulse_names_log.txt')
 
-def write_log(message, handle):
-    print(message)
-    handle.write(message + '\n')
-
-# Helper function to normalize full names for lookup key
-def normalize_full_name_key(name_str):
-    if name_str is None:
-        return ""
-    # Lowercase, remove extra whitespace
-    normalized = ' '.join(name_str.strip().lower().split())
-    return normalized
-
-# --- Step 1: Load consolidated names as the source of truth for First/Last names ---
-# Key: (normalized_full_name, pulse_label)
-# Value: {'first': CorrectFirstName, 'last': CorrectLastName}
-name_split_lookup = {}
-
-with open(log_file_path, 'w', encoding='utf-8') as log_f:
-    write_log(f"--- Running script: split_pulse_names.py ---", log_f)
-    write_log(f"Attempting to load consolidated names from: {consolidated_names_file}", log_f)
-    try:
-        with open(consolidated_names_file, 'r', newline='', encoding='utf-8') as f_consolidated:
-            reader = csv.DictReader(f_consolidated)
-            for row in reader:
-                first_name = row.get('First Name','').strip()
-                last_name = row.get('Last Name','').strip()
-                pulse_label = row.get('Pulse Label','').strip()
-                
-                if not first_name or not last_name or not pulse_label:
-                    write_log(f"  Warning: Skipping row in consolidated file due to missing data: {row}", log_f)
-                    continue
-                    
-                full_name_str = f"{first_name} {last_name}"
-                normalized_key = normalize_full_name_key(full_name_str)
-                lookup_tuple = (normalized_key, pulse_label)
-                
-                if lookup_tuple in name_split_lookup:
-                     write_log(f"  Warning: Duplicate entry found in consolidated file for key {lookup_tuple}. Overwriting previous entry.", log_f)
-                name_split_lookup[lookup_tuple] = {'first': first_name, 'last': last_name}
-                
-        write_log(f"Successfully loaded {len(name_split_lookup)} entries into name split lookup.", log_f)
-
-    except FileNotFoundError:
-        write_log(f"FATAL ERROR: Consolidated names file not found at {consolidated_names_file}", log_f)
-        exit()
-    except Exception as e:
-        write_log(f"FATAL ERROR reading consolidated names file: {e}", log_f)
-        exit()
-
-    if not name_split_lookup:
-        write_log("FATAL ERROR: No data loaded from consolidated names file. Exiting.", log_f)
-        exit()
-
-    # --- Step 2: Process each Pulse file ---
-    files_to_process = [
-        {'path': pulse_bhi_file, 'name_col_header': 'Provider Name', 'label': 'BHI'},
-        {'path': pulse_counseling_file, 'name_col_header': 'Therapist Name', 'label': 'Counseling'},
-        {'path': pulse_mm_file, 'name_col_header': 'Provider Name', 'label': 'MM'}
-    ]
-
-    for file_info in files_to_process:
-        input_file_path = file_info['path']
-        original_name_col_header = file_info['name_col_header']
-        current_pulse_label = file_info['label']
-        
-        write_log(f"\nProcessing file: {input_file_path}", log_f)
-        
-        if not os.path.exists(input_file_path):
-            write_log(f"  Error: File not found at {input_file_path}. Skipping.", log_f)
+def split_name_rows(task, name_split_lookup, task_log):
+    """
+    Pool worker: replace the full-name cell of one chunk of Pulse rows with First/Last Name.
+    task = (path, Pulse label, name column index, new header width, chunk start, rows).
+    """
+    input_file_path, current_pulse_label, name_col_idx, new_header_len, start, rows = task
+    output_rows = []
+    for i, row in enumerate(rows, start=start):
+        if name_col_idx >= len(row):
+            task_log.sample('Pulse row too short', f"  Warning: Row {i+2} in {input_file_path} is shorter than expected. Skipping name split. Row: {row}")
+            # Pad row if necessary to match new header length before appending
+            padded_row = row[:name_col_idx] + ['', ''] + row[name_col_idx+1:]
+            while len(padded_row) < new_header_len:
+                padded_row.append('')
+            output_rows.append(padded_row)
             continue
 
-        output_rows = []
-        not_found_count = 0
-
+        full_name_str = row[name_col_idx].strip()
+        normalized_lookup_key = normalize_full_name(full_name_str)
+        lookup_tuple = (normalized_lookup_key, current_pulse_label)
+
+        first_name_to_insert = ''
+        last_name_to_insert = ''
+
+        # Look up in the consolidated data
+        if lookup_tuple in name_split_lookup:
+            task_log.count('found')
+            split_data = name_split_lookup[lookup_tuple]
+            first_name_to_insert = split_data['first']
+            last_name_to_insert = split_data['last']
+        else:
+            task_log.count('not_found')
+            task_log.sample('Pulse name not in consolidated names', f"  Warning: Row {i+2} - Name '{full_name_str}' (Label: {current_pulse_label}, NormKey: {normalized_lookup_key}) not found in consolidated lookup. Attempting basic split.")
+            # Fallback: Basic split on first space
+            parts = full_name_str.split(' ', 1)
+            first_name_to_insert = parts[0]
+            if len(parts) > 1:
+                last_name_to_insert = parts[1]
+            else:
+                last_name_to_insert = '' # Or handle single names differently?
+                task_log.sample('Pulse name with a single part', f"    -> Could only find single name part '{first_name_to_insert}' during basic split.")
+
+        # Create the new row structure
+        output_rows.append(row[:name_col_idx] + [first_name_to_insert, last_name_to_insert] + row[name_col_idx+1:])
+    return output_rows
+
+def run(workspace, jobs=1):
+    """
+    Replace each workspace Pulse file's full-name column with First/Last Name from the consolidated names.
+    Each file streams through in chunks; `jobs` > 1 splits a file's chunks across that many worker
+    processes, holding at most `jobs` chunks at a time.
+    """
+    # --- Step 1: Load consolidated names as the source of truth for First/Last names ---
+    # Key: (normalized_full_name, pulse_label)
+    # Value: {'first': CorrectFirstName, 'last': CorrectLastName}
+    name_split_lookup = {}
+
+    with ScriptLog(log_file_path) as log, StageMetrics('split_pulse_names', log_file_path) as metrics:
+        log.info(f"--- Running script: split_pulse_names.py ---")
+        log.info(f"Attempting to load consolidated names from: {consolidated_names_file}")
         try:
-            with open(input_file_path, 'r', newline='', encoding='utf-8') as f_in:
-                reader = csv.reader(f_in)
-                try:
-                    header = next(reader)
-                except StopIteration: # Handle empty file
-                    write_log(f"  Warning: File {input_file_path} is empty. Skipping.", log_f)
-                    continue
+            # One streaming pass; only the lookup is kept
+            with metrics.phase('normalize'), workspace.open_rows(consolidated_names_file) as (consolidated_header, consolidated_rows):
+                for row in (dict(zip(consolidated_header, values)) for values in consolidated_rows):
+                    first_name = row.get('First Name','').strip()
+                    last_name = row.get('Last Name','').strip()
+                    pulse_label = row.get('Pulse Label','').strip()
+
+                    if not first_name or not last_name or not pulse_label:
+                        log.sample('Consolidated row missing data', f"  Warning: Skipping row in consolidated file due to missing data: {row}")
+                        continue
+
+                    normalized_key = create_full_name_key(first_name, last_name)
+                    lookup_tuple = (normalized_key, pulse_label)
+
+                    if lookup_tuple in name_split_lookup:
+                         log.sample('Duplicate consolidated name', f"  Warning: Duplicate entry found in consolidated file for key {lookup_tuple}. Overwriting previous entry.")
+                    name_split_lookup[lookup_tuple] = {'first': first_name, 'last': last_name}
+
+            log.info(f"Successfully loaded {len(name_split_lookup)} entries into name split lookup.")
+
+        except FileNotFoundError:
+            log.error(f"FATAL ERROR: Consolidated names file not found at {consolidated_names_file}")
+            return False
+        except Exception as e:
+            log.error(f"FATAL ERROR reading consolidated names file: {e}")
+            return False
+
+        if not name_split_lookup:
+            log.error("FATAL ERROR: No data loaded from consolidated names file. Exiting.")
+            return False
 
+        # --- Step 2: Stream each Pulse file through the split (chunks of a file run in parallel) ---
+        files_to_process = [get_source(key) for key in PULSE_SOURCE_KEYS]
+
+        for file_info in files_to_process:
+            input_file_path = file_info['path']
+            original_name_col_header = file_info['full_name_col']
+            chunk_logs = []
+            file_state = {'header_read': False}
+
+            log.info(f"\nProcessing file: {input_file_path}")
+
+            if not workspace.has_table(input_file_path):
+                log.info(f"  Error: File not found at {input_file_path}. Skipping.")
+                continue
+
+            def split_rows(header, rows):
+                file_state['header_read'] = True
                 # Find original name column index
                 try:
                     name_col_idx = header.index(original_name_col_header)
                 except ValueError:
-                    write_log(f"  Error: Column '{original_name_col_header}' not found in header of {input_file_path}. Header: {header}. Skipping file.", log_f)
-                    continue
+                    file_state['skip_message'] = f"  Error: Column '{original_name_col_header}' not found in header of {input_file_path}. Header: {header}. Skipping file."
+                    raise
 
                 # Create new header
                 new_header = header[:name_col_idx] + ['First Name', 'Last Name'] + header[name_col_idx+1:]
-                output_rows.append(new_header)
-                
-                # Process data rows
-                for i, row in enumerate(reader):
-                    if name_col_idx >= len(row):
-                        write_log(f"  Warning: Row {i+2} in {input_file_path} is shorter than expected. Skipping name split. Row: {row}", log_f)
-                        # Pad row if necessary to match new header length before appending
-                        padded_row = row[:name_col_idx] + ['', ''] + row[name_col_idx+1:]
-                        while len(padded_row) < len(new_header):
-                            padded_row.append('')
-                        output_rows.append(padded_row)
-                        continue
-
-                    full_name_str = row[name_col_idx].strip()
-                    normalized_lookup_key = normalize_full_name_key(full_name_str)
-                    lookup_tuple = (normalized_lookup_key, current_pulse_label)
-                    
-                    first_name_to_insert = ''
-                    last_name_to_insert = ''
-                    
-                    # Look up in the consolidated data
-                    if lookup_tuple in name_split_lookup:
-                        split_data = name_split_lookup[lookup_tuple]
-                        first_name_to_insert = split_data['first']
-                        last_name_to_insert = split_data['last']
-                    else:
-                        not_found_count += 1
-                        write_log(f"  Warning: Row {i+2} - Name '{full_name_str}' (Label: {current_pulse_label}, NormKey: {normalized_lookup_key}) not found in consolidated lookup. Attempting basic split.", log_f)
-                        # Fallback: Basic split on first space
-                        parts = full_name_str.split(' ', 1)
-                        first_name_to_insert = parts[0]
-                        if len(parts) > 1:
-                            last_name_to_insert = parts[1]
-                        else:
-                            last_name_to_insert = '' # Or handle single names differently?
-                            write_log(f"    -> Could only find single name part '{first_name_to_insert}' during basic split.", log_f)
-
-                    # Create the new row structure
-                    new_row = row[:name_col_idx] + [first_name_to_insert, last_name_to_insert] + row[name_col_idx+1:]
-                    output_rows.append(new_row)
-            
-            # Write the updated rows back to the same file
-            with open(input_file_path, 'w', newline='', encoding='utf-8') as f_out:
-                writer = csv.writer(f_out)
-                writer.writerows(output_rows)
-            
-            write_log(f"  Finished processing {input_file_path}.", log_f)
+                tasks = (
+                    (input_file_path, file_info['pulse_label'], name_col_idx, len(new_header), start, chunk)
+                    for start, chunk in iter_chunks(rows)
+                )
+
+                def split_chunks():
+                    for chunk_output, task_log in iter_task_results(split_name_rows, tasks, shared=name_split_lookup, jobs=jobs):
+                        chunk_logs.append(task_log)
+                        task_log.replay(log)
+                        yield from chunk_output
+
+                return new_header, split_chunks()
+
+            # Rows stream from the file through the split into a temp file (or through the
+            # workspace's copy if an earlier stage holds it); the file is untouched on any error
+            try:
+                with metrics.phase('match'):
+                    rows_written = workspace.rewrite_table(input_file_path, split_rows)
+            except ValueError as e:
+                if 'skip_message' in file_state: # No full-name column
+                    log.info(file_state['skip_message'])
+                    continue
+                if not file_state['header_read']: # Handle empty file
+                    log.info(f"  Warning: File {input_file_path} is empty. Skipping.")
+                    continue
+                log.error(f"FATAL ERROR splitting Pulse names in {input_file_path}: {e}")
+                return False
+            except Exception as e:
+                log.error(f"FATAL ERROR splitting Pulse names in {input_file_path}: {e}")
+                import traceback
+                log.error(traceback.format_exc())
+                return False
+
+            chunk_counters = merge_counters(chunk_logs)
+            not_found_count = chunk_counters.get('not_found', 0)
+            metrics.count('rows_in', rows_written)
+            metrics.count('rows_out', rows_written)
+            metrics.record_lookups('consolidated_name', chunk_counters.get('found', 0), not_found_count)
+
+            log.info(f"  Finished processing {input_file_path}.")
             if not_found_count > 0:
-                 write_log(f"  NOTE: {not_found_count} names were not found in the consolidated list and used a basic split fallback.", log_f)
+                 log.info(f"  NOTE: {not_found_count} names were not found in the consolidated list and used a basic split fallback.")
             else:
-                 write_log(f"  Successfully split names based on consolidated list.", log_f)
+                 log.info(f"  Successfully split names based on consolidated list.")
 
-        except Exception as e:
-            write_log(f"  Error processing file {input_file_path}: {e}", log_f)
-            import traceback
-            write_log(traceback.format_exc(), log_f)
+        log.info("\n--- Script split_pulse_names.py finished ---")
+        return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split the Pulse full-name columns into First/Last Name.")
+    parser.add_argument('--jobs', type=int, default=default_jobs(), help="Worker processes (default: one per core; 1 runs serially).")
+    args = parser.parse_args(argv)
+
+    workspace = ProviderWorkspace()
+    if not run(workspace, jobs=args.jobs):
+        sys.exit(1)
+    workspace.flush(log=print)
 
-    write_log("\n--- Script split_pulse_names.py finished ---", log_f) 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
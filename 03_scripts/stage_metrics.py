@@ -0,0 +1,132 @@
+"""
+Per-stage run metrics, written as JSON next to the stage's *_log.txt.
+
+The log summaries give row counts but no timings, so nothing showed which reconciliation
+step slows down as the roster grows. A StageMetrics object collects:
+
+- phase timers:  `with metrics.phase('match'): ...` (wall seconds and call count per phase;
+  the usual phases are load, normalize, match and write)
+- counters:      metrics.count('rows_in', n), metrics.count('rows_out', n)
+- lookup stats:  metrics.lookup('northshore_name', hit) for hits and misses of a lookup or cache,
+  and metrics.record_cache('name_noise_pattern', some_lru_cached_function) for lru_caches
+
+and writes them on exit:
+
+    with ScriptLog(log_file_path) as log, StageMetrics('update_pulse_labels', log_file_path) as metrics:
+        with metrics.phase('load'):
+            table = workspace.read_table(path)
+        metrics.count('rows_in', len(table))
+
+update_pulse_labels_log.txt gets an update_pulse_labels_metrics.json beside it with the
+stage name, start time, total wall seconds, per-phase seconds, counters, hit rates and
+rows_in per second. The files are rewritten each run (and not committed); copy them aside
+to compare runs over time.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+LOG_FILE_SUFFIX = '_log.txt'
+METRICS_FILE_SUFFIX = '_metrics.json'
+
+
+def metrics_path_for(log_file_path):
+    """update_pulse_labels_log.txt -> update_pulse_labels_metrics.json (same directory)."""
+    base = log_file_path[:-len(LOG_FILE_SUFFIX)] if log_file_path.endswith(LOG_FILE_SUFFIX) else os.path.splitext(log_file_path)[0]
+    return base + METRICS_FILE_SUFFIX
+
+
+class StageMetrics:
+    """Timers, counters and lookup hit rates of one stage run; written as JSON by write() or on exit."""
+
+    def __init__(self, stage, log_file_path=None, path=None):
+        self.stage = stage
+        self.path = path or (metrics_path_for(log_file_path) if log_file_path else None)
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._phases = {}   # name -> [seconds, calls]
+        self._counters = {}
+        self._lookups = {}  # name -> [hits, misses]
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.count('failed')
+        if self.path:
+            self.write()
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        """Add the wall time of the `with` block to phase `name` (phases may repeat, e.g. once per file)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - started)
+
+    def record_phase(self, name, seconds):
+        """Add `seconds` timed elsewhere (e.g. a stage run on a worker thread) to phase `name`."""
+        with self._lock:
+            totals = self._phases.setdefault(name, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def lookup(self, name, hit):
+        """Record one probe of lookup `name` (hit=True if it found an entry)."""
+        with self._lock:
+            totals = self._lookups.setdefault(name, [0, 0])
+            totals[0 if hit else 1] += 1
+
+    def record_lookups(self, name, hits, misses):
+        """Add hit/miss totals counted elsewhere (e.g. by pool workers) to lookup `name`."""
+        with self._lock:
+            totals = self._lookups.setdefault(name, [0, 0])
+            totals[0] += hits
+            totals[1] += misses
+
+    def record_cache(self, name, cached_function):
+        """Copy the hit/miss totals of a functools.lru_cache-wrapped function into lookup `name`."""
+        info = cached_function.cache_info()
+        with self._lock:
+            self._lookups[name] = [info.hits, info.misses]
+
+    def to_dict(self):
+        wall_seconds = time.perf_counter() - self._started
+        with self._lock:
+            rows_in = self._counters.get('rows_in', 0)
+            return {
+                'stage': self.stage,
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'wall_seconds': round(wall_seconds, 6),
+                'rows_per_second': round(rows_in / wall_seconds, 1) if rows_in and wall_seconds > 0 else None,
+                'phases': {
+                    name: {'seconds': round(seconds, 6), 'calls': calls}
+                    for name, (seconds, calls) in self._phases.items()
+                },
+                'counters': dict(self._counters),
+                'lookups': {
+                    name: {'hits': hits, 'misses': misses, 'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None}
+                    for name, (hits, misses) in self._lookups.items()
+                },
+            }
+
+    def write(self, path=None):
+        """Write the metrics as JSON (temp file + os.replace). Returns the path written."""
+        path = path or self.path
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f_metrics:
+            json.dump(self.to_dict(), f_metrics, indent=2)
+            f_metrics.write('\n')
+        os.replace(temp_path, path)
+        return path
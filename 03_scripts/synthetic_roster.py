@@ -0,0 +1,344 @@
+"""
+Seeded synthetic provider rosters for benchmarking the pipeline at scale.
+
+The checked-in data is a few hundred providers, which says nothing about how a stage behaves
+at 100k or 1M. generate_roster() writes a complete, realistic-looking input tree - the same
+relative paths the scripts read - for any number of providers:
+
+    python 03_scripts/synthetic_roster.py /tmp/roster_100k --providers 100000 --seed 7
+
+- One population of providers (first/last name, NPI with a valid check digit, credential)
+  is spread over the Pulse BHI/Counseling/MM files, Northshore, the guidebook and the legacy
+  Airtable export in roughly the real proportions; providers not in Pulse or Northshore
+  become the unmatched list, and the legacy providers form the old name/NPI truth file.
+- The Pulse files are in their raw shape (one full-name column, split by split_pulse_names),
+  with credentials and pronouns in some names, nicknames (Jon for Jonathan), typos,
+  `;#` multi-values, mangled age ranges ("Dec-65") and multiline notes.
+- Some NPIs are blank or fail the check digit; legacy bios are multi-paragraph.
+- The reference data (Salesforce picklists, nickname aliases) is copied from this repo so
+  name cleaning and nickname matching behave as on the real data.
+
+The same seed and size always give byte-identical files.
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import uuid
+
+from npi_validation import npi_check_digit
+
+# Shares of the population in each source (a provider can be in several)
+PULSE_SHARES = {'BHI': 0.10, 'Counseling': 0.35, 'MM': 0.30}
+NORTHSHORE_SHARE = 0.10
+LEGACY_SHARE = 0.85
+
+# Noise rates in the Pulse full-name cells
+NICKNAME_RATE = 0.10
+CREDENTIAL_IN_NAME_RATE = 0.25
+PRONOUNS_IN_NAME_RATE = 0.03
+TYPO_RATE = 0.02
+# NPI quality in the legacy/unmatched sources
+BLANK_NPI_RATE = 0.05
+BAD_CHECK_DIGIT_RATE = 0.01
+
+# Reference data copied into every generated tree
+REFERENCE_DIRS = [
+    '02_salesforce_picklist',
+    os.path.join('05_airtable_and_mapping', '05_name_aliases'),
+]
+
+PULSE_FILES = {
+    'BHI': os.path.join('00_source_data', 'pulse_data', 'pulse_bhi', 'pulse_bhi.csv'),
+    'Counseling': os.path.join('00_source_data', 'pulse_data', 'pulse_counseling', 'pulse_counseling.csv'),
+    'MM': os.path.join('00_source_data', 'pulse_data', 'pulse_mm', 'pulse_mm.csv'),
+}
+CONSOLIDATED_NAMES_FILE = os.path.join('05_airtable_and_mapping', '02_pulse', 'pulse_consolidated_names.csv')
+NORTHSHORE_NAMES_FILE = os.path.join('05_airtable_and_mapping', '03_northshore', 'northshore_names.csv')
+GUIDEBOOK_FILE = os.path.join('00_source_data', 'guidebook', 'guidebook.csv')
+UNMATCHED_FILE = os.path.join('05_airtable_and_mapping', '04_not_in_pulse_or_northshore', 'unmatched_providers.csv')
+OLD_TRUTH_FILE = os.path.join('05_airtable_and_mapping', '01_name_npi_airtable', 'provider_ids_for_mapping.csv')
+PROVIDERS_WITH_UIDS_FILE = os.path.join('01_processed_data', 'main_provider_table', '01_providers_with_uids.csv')
+LEGACY_AIRTABLE_FILE = os.path.join('00_source_data', 'airtable_monolithic', 'Providers-All Providers.csv')
+
+PULSE_HEADERS = {
+    'BHI': ['Title', 'Availability', 'Provider Name', 'Therapist Gender', 'EEMG Practice', 'Credentials',
+            'Patient Facing Number', 'Services Offered', 'Ages', 'Specialities/Preference', 'Do Not Refer',
+            'Other Considerations'],
+    'Counseling': ['Title', 'Availability', 'Location', 'CT Gender ID', 'Therapist Name', 'Credentials', 'Ages',
+                   'Specialties/Preferences', 'DO NOT Refer', 'Other Considerations', 'Link to Website'],
+    'MM': ['Title', 'Availability', 'Location', 'Gender', 'Provider Name', 'Credentials', 'Soonest Availability',
+           'Ages', 'Eval Info', 'Insurance Restrictions', 'Specialties', 'Do NOT Refer', 'Other Considerations',
+           'Link to Website'],
+}
+GUIDEBOOK_HEADER = ['Last Name', 'First Name', 'Internal Label', 'Provider Name (hyperlink to Practice Brochure)',
+                    'Dept Code', 'Location', 'Ages', 'Status', 'New Patient Slot(s)', 'Specialized Services Offered',
+                    'Modality', 'Visit Type (1st Appt)', 'Visit Type (Ongoing)', 'Last Name']
+LEGACY_HEADER = [
+    'National Provider Identifier (NPI)', 'Provider Full Name', 'First Name', 'Last Name', 'Credentials',
+    'Legacy Region', 'Gender', 'Pronouns', 'Languages', 'Personal Interests', 'Hospital Affiliation', 'Video',
+    'Headshot', 'Email Address', 'Phone Number', 'Web Specialty', 'Provider Type', 'Ages Seen',
+    'Level(s) of Care - BHSL List', 'Building Name 1', 'Location Address 1', 'Building Name 2',
+    'Location Address 2', 'Start Date', 'Bio - Legacy Sites', 'My Endeavor Statement', 'Care Philosophy',
+    'Clinical Interests - Legacy Sites', 'Clinical Focus', 'Conditions Treated', 'Treatment Modalities',
+    'Board Specialties', 'Research Focus', 'Psychiatrist - Education (Med School)',
+    'Psychiatrist - Year Graduated (Med School)', 'Therapist - Education', 'Therapist - Year Graduated',
+    'Residency', 'Residency - Year Completed', 'Fellowship', 'Fellowship - Year Completed',
+    'Board Certification - Name', 'Board Certification - Year Received', 'Awards and Honors',
+    'Professional Titles', 'Profile Link - Legacy Site', 'LOMG Grid - Label', 'LOMG Grid - Location',
+    'LOMG Grid - Availability', 'LOMG Grid - Soonest Availability', 'LOMG Grid - Ages Treated',
+    'LOMG Grid - Eval Info', 'LOMG Grid - Insurance Restrictions', 'LOMG Grid - Specialties',
+    'LOMG Grid - Do NOT Refer', 'LOMG Grid - Other Considerations',
+]
+
+FIRST_NAMES = [
+    'Aaron', 'Abigail', 'Adam', 'Adrienne', 'Alexander', 'Alexandra', 'Alicia', 'Amy', 'Andrea', 'Andrew',
+    'Angela', 'Anna', 'Anthony', 'Ashley', 'Barbara', 'Benjamin', 'Beth', 'Bryce', 'Catherine', 'Charles',
+    'Christina', 'Christine', 'Christopher', 'Colleen', 'Cynthia', 'Daniel', 'David', 'Deborah', 'Donald',
+    'Douglas', 'Edward', 'Elena', 'Elizabeth', 'Emily', 'Erin', 'Eun Sun', 'Frederick', 'Grace', 'Gregory',
+    'Jacqueline', 'James', 'Jennifer', 'Jeffrey', 'Jessica', 'Jonathan', 'Joseph', 'Julia', 'Katherine',
+    'Kathryn', 'Laura', 'Leslie', 'Lia', 'Margaret', 'Maria', 'Martha', 'Matthew', 'Michael', 'Michelle',
+    'Nicholas', 'Nina', 'Patricia', 'Rebecca', 'Robert', 'Samantha', 'Sarah', 'Stephanie', 'Susan', 'Thomas',
+    'Tiffany', 'Victoria', 'William', 'Zachary',
+]
+NICKNAMES = {
+    'Alexander': ['Alex'], 'Alexandra': ['Alex', 'Lexie'], 'Andrew': ['Andy', 'Drew'], 'Anthony': ['Tony'],
+    'Benjamin': ['Ben'], 'Catherine': ['Cathy', 'Kate'], 'Christopher': ['Chris'], 'Daniel': ['Dan'],
+    'David': ['Dave'], 'Deborah': ['Deb'], 'Edward': ['Ed'], 'Elizabeth': ['Beth', 'Liz'], 'Jennifer': ['Jen'],
+    'Jeffrey': ['Jeff'], 'Jonathan': ['Jon'], 'Joseph': ['Joe'], 'Katherine': ['Kate', 'Katie'],
+    'Matthew': ['Matt'], 'Michael': ['Mike'], 'Nicholas': ['Nick'], 'Robert': ['Bob', 'Rob'],
+    'Samantha': ['Sam'], 'Susan': ['Sue'], 'Thomas': ['Tom'], 'William': ['Bill', 'Will'],
+}
+LAST_NAME_SYLLABLES = [
+    'ad', 'al', 'an', 'bar', 'ber', 'bo', 'bram', 'chen', 'da', 'del', 'dun', 'el', 'fen', 'gar', 'gi', 'hal',
+    'her', 'ka', 'kin', 'lap', 'le', 'lin', 'ma', 'mer', 'mon', 'na', 'nel', 'o', 'pa', 'ral', 'ro', 'san',
+    'sha', 'sil', 'son', 'stein', 'ta', 'ton', 'ver', 'wick',
+]
+CREDENTIALS = ['LCSW', 'LCPC', 'LPC', 'LMFT', 'PsyD', 'PhD', 'MD', 'DO', 'APRN', 'PMHNP-BC', 'NP', 'LSW']
+PRONOUNS = ['(she/her)', '(he/him)', '(they/them)']
+GENDERS = ['Female', 'Male', 'Non-Binary']
+LOCATIONS = ['Naperville', 'Addison', 'Deerfield', 'Evanston', 'Glenview', 'Skokie', 'Highland Park', 'Virtual']
+AGE_RANGES = ['Children (5-12)', 'Adolescents (13-17)', 'Young Adults (18-25)', 'Middle Age (26-64)', 'Seniors 65+']
+MM_AGES = ['Dec-65', '18-65', '5-17', 'Jun-18', '18+', '13-25']
+SPECIALTIES = ['Anxiety', 'ADHD', 'Bipolar', 'Depression', 'Eating Disorder', 'Grief & Loss', 'OCD', 'Parenting',
+               'Perinatal', 'Psychosis', 'PTSD/Trauma', 'Relationship Issues', 'Sleep Issues', 'Substance Use']
+DO_NOT_REFER = ['Adoption', 'ASD/Intellectual Disorders', 'Couples Counseling', 'Dementia/Neurocognitive',
+                'Domestic Violence/Abuse', 'Family Therapy', 'Gender Identity', 'Sexual Dysfunction/Addiction']
+MODALITIES = ['Acceptance and Commitment Therapy', 'Cognitive Behavioral Therapy', 'Dialectical Behavior Therapy',
+              'EMDR', 'Motivational Interviewing', 'Solution-Focused Brief Therapy', 'Mindfulness-Based Therapy']
+MODALITY_ABBREVIATIONS = ['ACT', 'CBT', 'DBT', 'EMDR', 'MI', 'SFBT', 'MBCT']
+AVAILABILITY = ['accepting referrals', 'open to bhi referrals', 'Closed to Referrals', 'accepting oars referrals']
+SCHOOLS = ['Adler University', 'Loyola University Chicago', 'Northwestern University', 'University of Illinois']
+
+
+class Provider:
+    """One synthetic provider and the sources they appear in."""
+
+    __slots__ = ('index', 'first', 'last', 'npi', 'credential', 'gender', 'sources')
+
+    def __init__(self, index, first, last, npi, credential, gender):
+        self.index = index
+        self.first = first
+        self.last = last
+        self.npi = npi
+        self.credential = credential
+        self.gender = gender
+        self.sources = set()
+
+
+def random_last_name(rng):
+    syllables = ''.join(rng.choice(LAST_NAME_SYLLABLES) for _ in range(rng.choice((2, 2, 3, 3, 4))))
+    last = syllables.capitalize()
+    if rng.random() < 0.05: # Hyphenated double surname
+        last += '-' + ''.join(rng.choice(LAST_NAME_SYLLABLES) for _ in range(2)).capitalize()
+    return last
+
+def random_npi(rng):
+    prefix = str(rng.choice((1, 2))) + ''.join(str(rng.randrange(10)) for _ in range(8))
+    return prefix + npi_check_digit(prefix)
+
+def with_typo(rng, name):
+    """Swap two adjacent letters or drop one."""
+    if len(name) < 4:
+        return name
+    i = rng.randrange(1, len(name) - 2)
+    if rng.random() < 0.5:
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name[:i] + name[i + 1:]
+
+def multi_value(rng, choices, low=1, high=4):
+    return ';#'.join(rng.sample(choices, rng.randint(low, min(high, len(choices)))))
+
+def pulse_display_name(rng, provider):
+    """The provider's name as typed into a Pulse grid: nicknames, credentials, pronouns and typos."""
+    first = provider.first
+    if first in NICKNAMES and rng.random() < NICKNAME_RATE:
+        first = rng.choice(NICKNAMES[first])
+    last = with_typo(rng, provider.last) if rng.random() < TYPO_RATE else provider.last
+    display = f"{first} {last}"
+    if rng.random() < CREDENTIAL_IN_NAME_RATE:
+        display += f", {provider.credential}"
+    if rng.random() < PRONOUNS_IN_NAME_RATE:
+        display += f" {rng.choice(PRONOUNS)}"
+    return first, last, display
+
+def source_npi(rng, provider):
+    """The NPI as a legacy source stores it: mostly right, sometimes blank or with a bad check digit."""
+    roll = rng.random()
+    if roll < BLANK_NPI_RATE:
+        return ''
+    if roll < BLANK_NPI_RATE + BAD_CHECK_DIGIT_RATE:
+        return provider.npi[:-1] + str((int(provider.npi[-1]) + 1) % 10)
+    return provider.npi
+
+def multiline_notes(rng):
+    modalities = ', '.join(rng.sample(MODALITY_ABBREVIATIONS, 3))
+    return f"Experience with {modalities}.\nPrefers {rng.choice(SPECIALTIES).lower()} referrals.\nNo walk-ins."
+
+def legacy_bio(rng, provider):
+    modalities = rng.sample(MODALITIES, 2)
+    abbreviation = rng.choice(MODALITY_ABBREVIATIONS)
+    return (
+        f"{provider.first} {provider.last} graduated from {rng.choice(SCHOOLS)} and is a {provider.credential} "
+        f"working with adults and adolescents.\n\n"
+        f"{provider.first} uses {modalities[0]} and {modalities[1]}, and is trained in {abbreviation}, "
+        f"with a focus on {rng.choice(SPECIALTIES).lower()} and {rng.choice(SPECIALTIES).lower()}.\n\n"
+        f"Outside of work, {provider.first} enjoys hiking and time with family."
+    )
+
+def make_population(rng, providers):
+    population = []
+    for index in range(providers):
+        first = rng.choice(FIRST_NAMES)
+        provider = Provider(index, first, random_last_name(rng), random_npi(rng), rng.choice(CREDENTIALS), rng.choice(GENDERS))
+        for label, share in PULSE_SHARES.items():
+            if rng.random() < share:
+                provider.sources.add(label)
+        if rng.random() < NORTHSHORE_SHARE:
+            provider.sources.add('Northshore')
+        if rng.random() < LEGACY_SHARE:
+            provider.sources.add('Legacy')
+        population.append(provider)
+    return population
+
+def _write_csv(root, relative_path, header, rows, encoding='utf-8'):
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding=encoding) as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+def pulse_row(rng, label, provider, display):
+    ages = multi_value(rng, AGE_RANGES, 1, 3)
+    specialties = multi_value(rng, SPECIALTIES, 2, 6)
+    do_not_refer = multi_value(rng, DO_NOT_REFER, 0, 4)
+    notes = multiline_notes(rng)
+    if label == 'BHI':
+        return ['BHIC II', rng.choice(AVAILABILITY), display, provider.gender, f"EMG {rng.choice(LOCATIONS)}",
+                provider.credential, f"630-{rng.randrange(200, 999)}-{rng.randrange(10000):04d}", 'Individual',
+                ages, specialties, do_not_refer, notes]
+    if label == 'Counseling':
+        return ['CT2', rng.choice(AVAILABILITY), rng.choice(LOCATIONS), provider.gender, display, provider.credential,
+                ages, specialties, do_not_refer, notes, f"https://example.org/providers/{provider.index}"]
+    return ['APRN', multi_value(rng, AVAILABILITY, 1, 2), rng.choice(LOCATIONS), provider.gender, display,
+            provider.credential, rng.choice(['May', 'June', 'ASAP', '']), rng.choice(MM_AGES),
+            "1 EVAL/DAY - (Mon, Tues, Wed- Office/Virtual)\nEVALS MUST BE IN PERSON", '', specialties, do_not_refer,
+            notes, f"https://example.org/providers/{provider.index}"]
+
+def legacy_row(rng, provider):
+    row = dict.fromkeys(LEGACY_HEADER, '')
+    row.update({
+        'National Provider Identifier (NPI)': source_npi(rng, provider),
+        'Provider Full Name': f"{provider.first} {provider.last}",
+        'First Name': provider.first,
+        'Last Name': provider.last,
+        'Credentials': provider.credential,
+        'Legacy Region': rng.choice(['EEH/LOMG', 'NS', 'Swedish']),
+        'Gender': provider.gender,
+        'Languages': 'English',
+        'Email Address': f"{provider.first}.{provider.last}@example.org".replace(' ', ''),
+        'Phone Number': f"(630) {rng.randrange(200, 999)}-{rng.randrange(10000):04d}",
+        'Ages Seen': ','.join(rng.sample(['Children', 'Adolescents', 'Young Adults', 'Adults', 'Older Adults'], 3)),
+        'Start Date': f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(2005, 2024)}",
+        'Bio - Legacy Sites': legacy_bio(rng, provider),
+        'Conditions Treated': ','.join(rng.sample(SPECIALTIES, 3)),
+        'Treatment Modalities': ','.join(rng.sample(MODALITIES, 3)),
+        'Therapist - Education': rng.choice(SCHOOLS),
+        'Profile Link - Legacy Site': f"https://legacy.example.org/find-a-provider/{provider.index}" if rng.random() < 0.7 else '',
+        'LOMG Grid - Ages Treated': ', '.join(rng.sample(AGE_RANGES, 2)),
+        'LOMG Grid - Specialties': ','.join(rng.sample(SPECIALTIES, 2)),
+        'LOMG Grid - Other Considerations': ', '.join(rng.sample(MODALITY_ABBREVIATIONS, 3)),
+    })
+    return [row[column] for column in LEGACY_HEADER]
+
+def generate_roster(root, providers=1000, seed=0, reference_root='.'):
+    """Write a full synthetic input tree for `providers` providers under `root`. Returns the file row counts."""
+    rng = random.Random(seed)
+    population = make_population(rng, providers)
+    counts = {}
+
+    consolidated_rows = []
+    for label, relative_path in PULSE_FILES.items():
+        rows = []
+        for provider in population:
+            if label in provider.sources:
+                first, last, display = pulse_display_name(rng, provider)
+                rows.append(pulse_row(rng, label, provider, display))
+                consolidated_rows.append([first, last, label])
+        _write_csv(root, relative_path, PULSE_HEADERS[label], rows)
+        counts[relative_path] = len(rows)
+    _write_csv(root, CONSOLIDATED_NAMES_FILE, ['First Name', 'Last Name', 'Pulse Label'], consolidated_rows)
+    counts[CONSOLIDATED_NAMES_FILE] = len(consolidated_rows)
+
+    northshore = [provider for provider in population if 'Northshore' in provider.sources]
+    _write_csv(root, NORTHSHORE_NAMES_FILE, ['First Name', 'Last Name', 'Internal Label'],
+               [[provider.first, provider.last, 'Medication Management'] for provider in northshore])
+    counts[NORTHSHORE_NAMES_FILE] = len(northshore)
+    guidebook_rows = [
+        [provider.last, provider.first, 'Medication Management', f" {provider.first} {provider.last}", '62102',
+         rng.choice(LOCATIONS) + ' ', f"Ages {rng.randint(3, 18)}-{rng.randint(19, 99)}", rng.choice(['Open', 'Closed']),
+         '', '', '', 'Virtual Visit New', 'Virtual Visit Established', provider.last]
+        for provider in northshore
+    ]
+    _write_csv(root, GUIDEBOOK_FILE, GUIDEBOOK_HEADER, guidebook_rows, encoding='utf-8-sig')
+    counts[GUIDEBOOK_FILE] = len(guidebook_rows)
+
+    legacy = [provider for provider in population if 'Legacy' in provider.sources]
+    _write_csv(root, LEGACY_AIRTABLE_FILE, LEGACY_HEADER, [legacy_row(rng, provider) for provider in legacy], encoding='utf-8-sig')
+    counts[LEGACY_AIRTABLE_FILE] = len(legacy)
+    _write_csv(root, OLD_TRUTH_FILE, ['First Name', 'Last Name', 'National Provider Identifier (NPI)'],
+               [[provider.first, provider.last, source_npi(rng, provider)] for provider in legacy])
+    counts[OLD_TRUTH_FILE] = len(legacy)
+    _write_csv(root, PROVIDERS_WITH_UIDS_FILE,
+               ['uiud', 'National Provider Identifier (NPI)', 'Provider Full Name', 'First Name', 'Last Name', 'Credentials'],
+               [[str(uuid.UUID(int=rng.getrandbits(128), version=4)), source_npi(rng, provider),
+                 f"{provider.first} {provider.last}", provider.first, provider.last, provider.credential]
+                for provider in legacy])
+    counts[PROVIDERS_WITH_UIDS_FILE] = len(legacy)
+
+    unmatched = [provider for provider in legacy if not provider.sources & {'BHI', 'Counseling', 'MM', 'Northshore'}]
+    _write_csv(root, UNMATCHED_FILE, ['National Provider Identifier (NPI)', 'First Name', 'Last Name'],
+               [[source_npi(rng, provider), provider.first, provider.last] for provider in unmatched])
+    counts[UNMATCHED_FILE] = len(unmatched)
+
+    for relative_dir in REFERENCE_DIRS:
+        shutil.copytree(os.path.join(reference_root, relative_dir), os.path.join(root, relative_dir), dirs_exist_ok=True)
+    os.makedirs(os.path.join(root, '03_scripts'), exist_ok=True) # Stages write their logs here
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic provider roster (all pipeline inputs).")
+    parser.add_argument('output_dir', help="Root of the generated tree (created if missing).")
+    parser.add_argument('--providers', type=int, default=1000, help="Number of distinct providers (default: 1000).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args(argv)
+
+    counts = generate_roster(args.output_dir, args.providers, args.seed)
+    for relative_path, rows in counts.items():
+        print(f"{rows:>9} rows  {relative_path}")
+
+if __name__ == "__main__":
+    main()
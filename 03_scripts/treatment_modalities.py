@@ -0,0 +1,185 @@
+"""
+Salesforce treatment modalities mentioned in the legacy export's free text.
+
+    python 03_scripts/treatment_modalities.py     # writes PROVIDER_MODALITIES_FILE
+
+The legacy 'Treatment Modalities', 'Clinical Interests - Legacy Sites', 'Clinical Focus' and
+'Bio - Legacy Sites' columns name modalities in prose ("trained in Acceptance and Commitment
+Therapy and Dialectical Behavioral Therapy (DBT)"). ModalityExtractor compiles the phrases
+for every modality into one aho_corasick.AhoCorasick automaton over words:
+
+    the picklist names and crosswalk aliases   case-insensitive; 'Couples', 'Family',
+                                               'Expressive' and 'Eclectic' only through
+                                               their aliases, as bare words they are prose
+    MODALITY_ALIASES_FILE (Modality, Alias)    case-insensitive, except aliases written in
+                                               capitals (ACT, MI, CBT-I), which must appear
+                                               exactly so ("act" and "mi" are words)
+
+Text is split into words (case-folded, WORD_VARIANTS applied so 'Behavioral'/'Behavior' and
+'therapies'/'therapy' agree), and each cell is scanned once, left to right, with overlapping
+phrases resolved leftmost-longest ("Cognitive Behavioral Therapy for Insomnia" is not also
+CBT). main() streams the projected columns row by row and writes one row per provider and
+modality, with the columns it was found in and its number of mentions.
+"""
+import csv
+import functools
+import os
+import re
+import time
+
+from aho_corasick import AhoCorasick, leftmost_longest
+from atomic_csv import AtomicCsvWriter
+from picklist_crosswalk import PicklistCrosswalk, normalize_picklist_value
+
+MODALITY_ALIASES_FILE = os.path.join('05_airtable_and_mapping', '07_modality_aliases', 'modality_aliases.csv')
+COL_MODALITY = "Modality"
+COL_ALIAS = "Alias"
+PROVIDER_MODALITIES_FILE = os.path.join('01_processed_data', 'provider_modalities.csv')
+
+# Legacy columns scanned for modality mentions
+MODALITY_SOURCE_KEY = 'legacy_airtable'
+MODALITY_TEXT_COLUMNS = ['Treatment Modalities', 'Clinical Interests - Legacy Sites', 'Clinical Focus', 'Bio - Legacy Sites']
+PROVIDER_MODALITIES_HEADER = ['National Provider Identifier (NPI)', 'First Name', 'Last Name', 'Modality', 'Found In', 'Mentions']
+
+# Picklist names that are ordinary words in prose ("time with family"); matched only through aliases
+AMBIGUOUS_IN_PROSE = {'Couples', 'Family', 'Expressive', 'Eclectic'}
+WORD_VARIANTS = {'behavioral': 'behavior', 'behavioural': 'behavior', 'therapies': 'therapy',
+                 'evaluations': 'evaluation', 'assessments': 'assessment'}
+WORD = re.compile(r"[^\W_]+")
+
+
+def load_modality_aliases(path=MODALITY_ALIASES_FILE):
+    """(modality, alias) pairs of the alias table. Returns [] if the file is missing."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f_aliases:
+        return [(row[COL_MODALITY].strip(), row[COL_ALIAS].strip()) for row in csv.DictReader(f_aliases)
+                if row.get(COL_MODALITY, '').strip() and row.get(COL_ALIAS, '').strip()]
+
+def _words(text):
+    """Word matches of `text` and their case-folded, variant-normalized forms."""
+    spans = list(WORD.finditer(text))
+    words = [match.group().casefold() for match in spans]
+    return spans, [WORD_VARIANTS.get(word, word) for word in words]
+
+def _is_abbreviation(alias):
+    return alias == alias.upper() and any(ch.isalpha() for ch in alias)
+
+
+class ModalityExtractor:
+    """Word automaton over every phrase of the treatment-modalities picklist."""
+
+    def __init__(self, phrases, modalities=None):
+        """
+        `phrases`: (phrase, modality) pairs; phrases written in capitals must match exactly.
+        `modalities` sets the output order (default: order of first phrase).
+        """
+        patterns = []
+        for phrase, modality in phrases:
+            _, words = _words(phrase)
+            patterns.append((words, (modality, phrase if _is_abbreviation(phrase) else None)))
+        self.modalities = list(modalities or dict.fromkeys(modality for _, modality in phrases))
+        self._automaton = AhoCorasick(patterns)
+
+    def __len__(self):
+        return len(self._automaton)
+
+    @classmethod
+    def load(cls, crosswalk=None, aliases_path=MODALITY_ALIASES_FILE):
+        crosswalk = crosswalk or PicklistCrosswalk.load()
+        picklist = crosswalk.picklists['treatment_modality']
+        phrases = [(name, name) for name in picklist if name not in AMBIGUOUS_IN_PROSE]
+        # Reviewed/cached spellings of whole cells (already normalized, so never abbreviations)
+        ambiguous = {normalize_picklist_value(name) for name in AMBIGUOUS_IN_PROSE}
+        phrases += [(spelling, modality) for spelling, modality in crosswalk.aliases('treatment_modality').items()
+                    if spelling not in ambiguous]
+        phrases += [(alias, modality) for modality, alias in load_modality_aliases(aliases_path) if modality in picklist]
+        return cls(phrases, picklist)
+
+    def mentions(self, text):
+        """Modality of every mention in `text`, in the order they appear (repeats included)."""
+        if not isinstance(text, str):
+            return []
+        spans, words = _words(text)
+
+        def accept(start, end, value):
+            exact = value[1]
+            return exact is None or text[spans[start].start():spans[end - 1].end()] == exact
+
+        return [value[0] for _, _, value in leftmost_longest(self._automaton.matches(words), accept)]
+
+    def extract(self, text):
+        """Distinct modalities mentioned in `text`, in order of first mention."""
+        return list(dict.fromkeys(self.mentions(text)))
+
+    def extract_series(self, series):
+        """List of modalities per cell of a column; each distinct cell is scanned once."""
+        distinct = series.dropna().unique()
+        modalities = {value: self.extract(value) for value in distinct}
+        return series.map(lambda value: modalities.get(value, []) if isinstance(value, str) else [])
+
+
+def provider_modality_rows(rows, extractor, text_columns=MODALITY_TEXT_COLUMNS):
+    """
+    Output rows for an iterable of (npi, first, last, {column: text}) providers: one per provider
+    and modality, in picklist order, with the columns it was found in and its mention count.
+    """
+    mentions_of = functools.lru_cache(maxsize=None)(extractor.mentions) # Repeated cells (tag lists) are scanned once
+    order = {modality: position for position, modality in enumerate(extractor.modalities)}
+    for npi, first, last, texts in rows:
+        found = {}
+        for column in text_columns:
+            for modality in mentions_of(texts.get(column)):
+                columns, count = found.get(modality, ([], 0))
+                if column not in columns:
+                    columns.append(column)
+                found[modality] = (columns, count + 1)
+        for modality in sorted(found, key=order.__getitem__):
+            columns, count = found[modality]
+            yield [npi, first, last, modality, '; '.join(columns), count]
+
+def main():
+    from name_cleaning import clean_and_split_full_name_series
+    from source_registry import get_source, read_source, uses_split_name_columns
+
+    started = time.perf_counter()
+    source = get_source(MODALITY_SOURCE_KEY)
+    try:
+        df = read_source(MODALITY_SOURCE_KEY, roles=('names', 'npi'), columns=MODALITY_TEXT_COLUMNS)
+    except FileNotFoundError:
+        print(f"ERROR: Source file not found: {source['path']}")
+        return
+    text_columns = [column for column in MODALITY_TEXT_COLUMNS if column in df.columns]
+    print(f"Loaded {len(df)} providers from {source['path']} (scanning: {', '.join(text_columns)})")
+
+    extractor = ModalityExtractor.load()
+    print(f"Compiled {len(extractor)} phrases for {len(extractor.modalities)} modalities.")
+
+    if uses_split_name_columns(source, df.columns):
+        firsts, lasts = df[source['first_col']].fillna(''), df[source['last_col']].fillna('')
+    else:
+        firsts, lasts = clean_and_split_full_name_series(df[source['full_name_col']])
+    npis = df[source['npi_col']].fillna('') if source['npi_col'] in df.columns else [''] * len(df)
+    # One pass over the rows; each cell is tokenized and scanned once
+    rows = (
+        (npi, first, last, dict(zip(text_columns, texts)))
+        for npi, first, last, *texts in zip(npis, firsts, lasts, *(df[column].fillna('') for column in text_columns))
+    )
+    providers = set()
+    modality_counts = {}
+    with AtomicCsvWriter(PROVIDER_MODALITIES_FILE) as writer:
+        writer.writerow(PROVIDER_MODALITIES_HEADER)
+        for row in provider_modality_rows(rows, extractor, text_columns):
+            writer.writerow(row)
+            providers.add((row[0], row[1], row[2]))
+            modality_counts[row[3]] = modality_counts.get(row[3], 0) + 1
+
+    print(f"Found {sum(modality_counts.values())} provider modalities for {len(providers)} of {len(df)} providers "
+          f"in {time.perf_counter() - started:.2f}s.")
+    for modality in extractor.modalities:
+        if modality in modality_counts:
+            print(f"  {modality}: {modality_counts[modality]}")
+    print(f"Saved {PROVIDER_MODALITIES_FILE}")
+
+if __name__ == "__main__":
+    main()